@@ -0,0 +1,64 @@
+# benchmarks/bench_alns.py
+"""
+ALNS ana döngüsü: iterasyon/sn, tepe bellek ve GC duraklamaları.
+
+    python -m benchmarks.bench_alns --sizes 100 300 --vehicles 1 4 --iters 400
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import numpy as np
+
+from services.alns_solver import alns_optimize
+
+def euclid_instance(n, V, seed=0):
+    rng = np.random.default_rng(seed)
+    P = rng.random((n + V, 2)) * 1000.0
+    M = np.ascontiguousarray(np.linalg.norm(P[:, None] - P[None], axis=2))
+    return M, list(range(V)), list(range(V, V + n))
+
+class _GcWatch:
+    """gc.callbacks ile toplama sayısı ve toplam duraklama süresi."""
+    def __init__(self):
+        self.count, self.pause, self._t = 0, 0.0, None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._t = time.perf_counter()
+        elif self._t is not None:
+            self.count += 1
+            self.pause += time.perf_counter() - self._t
+
+def run(sizes, vehicles, iters, seed):
+    print(f"{'n':>6}{'V':>4}{'iter/sn':>10}{'tepe MB':>10}{'gc':>6}{'gc ms':>8}{'makespan':>12}")
+    for n in sizes:
+        for V in vehicles:
+            M, depots, stops = euclid_instance(n, V, seed)
+            # süre ve GC: izlemesiz koşu
+            random.seed(seed)
+            watch = _GcWatch()
+            gc.collect()
+            gc.callbacks.append(watch)
+            t = time.perf_counter()
+            _, cost = alns_optimize(M, depots, stops, iters=iters)
+            dt = time.perf_counter() - t
+            gc.callbacks.remove(watch)
+            # tepe bellek: aynı tohumla tracemalloc altında
+            random.seed(seed)
+            tracemalloc.start()
+            alns_optimize(M, depots, stops, iters=iters)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{n:>6}{V:>4}{iters / dt:>10.1f}{peak / 1e6:>10.2f}{watch.count:>6}"
+                  f"{watch.pause * 1e3:>8.1f}{cost:>12.1f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 300])
+    ap.add_argument("--vehicles", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--iters", type=int, default=400)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    run(a.sizes, a.vehicles, a.iters, a.seed)
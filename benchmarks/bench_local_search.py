@@ -0,0 +1,44 @@
+# benchmarks/bench_local_search.py
+"""
+2-opt / 3-opt: tam tarama ile aday listeli (k-NN + don't-look) aramanın karşılaştırması.
+
+    python -m benchmarks.bench_local_search --sizes 200 500 1000 --k 10 20
+"""
+import argparse
+import time
+import numpy as np
+
+from services.local_search import two_opt, three_opt
+from services.matrix import route_cost
+
+def euclid_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    P = rng.random((n + 1, 2)) * 1000.0
+    return np.ascontiguousarray(np.linalg.norm(P[:, None] - P[None], axis=2))
+
+def run(sizes, ks, three_opt_max, max_iter, seed):
+    print(f"{'op':<6}{'n':>6}{'k':>6}{'sn':>10}{'maliyet':>14}{'hız':>8}")
+    for n in sizes:
+        M = euclid_matrix(n, seed)
+        rng = np.random.default_rng(seed + 1)
+        r = [int(x) for x in rng.permutation(np.arange(1, n + 1))]
+        ops = [("2opt", two_opt)] + ([("3opt", three_opt)] if n <= three_opt_max else [])
+        for name, fn in ops:
+            base = None
+            for k in [None] + list(ks):
+                t = time.perf_counter()
+                out = fn([r], M, [0], max_iter=max_iter, neighbors=k)
+                dt = time.perf_counter() - t
+                base = dt if k is None else base
+                print(f"{name:<6}{n:>6}{('tam' if k is None else k):>6}{dt:>10.3f}"
+                      f"{route_cost(M, 0, out[0]):>14.1f}{base / dt:>7.1f}x")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[200, 500, 1000])
+    ap.add_argument("--k", type=int, nargs="+", default=[10, 20])
+    ap.add_argument("--three-opt-max", type=int, default=200, help="3-opt bu boyuta kadar koşulur")
+    ap.add_argument("--max-iter", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    run(a.sizes, a.k, a.three_opt_max, a.max_iter, a.seed)
@@ -0,0 +1,100 @@
+# benchmarks/instances.py
+"""
+Kıyaslama örnekleri (OSRM yok; süreler düzlem uzaklığından).
+
+Örnek sözlüğü: name, matrix (n x n), depots, stops (matris indeksleri),
+demands (durak sırasıyla), capacity (None olabilir).
+
+- euclid_instance    : birim karede düzgün dağılım (x1000)
+- clustered_instance : kümeler etrafında normal dağılım
+- load_cvrplib       : CVRPLIB/TSPLIB .vrp (EUC_2D, NODE_COORD/DEMAND/DEPOT_SECTION)
+- load_solomon       : Solomon VRPTW metni (zaman pencereleri yok sayılır)
+"""
+import os
+import numpy as np
+
+def _matrix(P, rounded=False):
+    M = np.linalg.norm(P[:, None] - P[None], axis=2)
+    if rounded:
+        M = np.rint(M)
+    return np.ascontiguousarray(M)
+
+def _instance(name, P, V, demands=None, capacity=None, rounded=False):
+    n = len(P) - V
+    return {
+        "name": name,
+        "matrix": _matrix(P, rounded),
+        "depots": list(range(V)),
+        "stops": list(range(V, V + n)),
+        "demands": [1.0] * n if demands is None else [float(d) for d in demands],
+        "capacity": capacity,
+    }
+
+def euclid_instance(n, V=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return _instance(f"euclid-n{n}-v{V}-s{seed}", rng.random((n + V, 2)) * 1000.0, V)
+
+def clustered_instance(n, V=1, clusters=None, spread=40.0, seed=0):
+    """Depolar düzgün, duraklar ~sqrt(n) küme merkezinin çevresinde."""
+    rng = np.random.default_rng(seed)
+    k = clusters or max(2, int(round(np.sqrt(n) / 2)))
+    centers = rng.random((k, 2)) * 1000.0
+    pts = centers[rng.integers(0, k, n)] + rng.normal(0.0, spread, (n, 2))
+    P = np.vstack([rng.random((V, 2)) * 1000.0, np.clip(pts, 0.0, 1000.0)])
+    return _instance(f"clustered-n{n}-v{V}-k{k}-s{seed}", P, V)
+
+def load_cvrplib(path):
+    """
+    .vrp dosyası. EUC_2D süreleri CVRPLIB geleneğiyle tam sayıya yuvarlanır.
+    Depolar matrisin başına alınır.
+    """
+    head, coords, demand, depots = {}, {}, {}, []
+    section = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line == "EOF":
+                continue
+            if line.endswith("_SECTION"):
+                section = line
+                continue
+            if ":" in line and section is None:
+                key, val = line.split(":", 1)
+                head[key.strip().upper()] = val.strip().strip('"')
+                continue
+            parts = line.split()
+            if section == "NODE_COORD_SECTION":
+                coords[int(parts[0])] = (float(parts[1]), float(parts[2]))
+            elif section == "DEMAND_SECTION":
+                demand[int(parts[0])] = float(parts[1])
+            elif section == "DEPOT_SECTION":
+                if int(parts[0]) >= 0:
+                    depots.append(int(parts[0]))
+    if head.get("EDGE_WEIGHT_TYPE", "EUC_2D") != "EUC_2D":
+        raise ValueError("yalnızca EUC_2D destekleniyor: " + path)
+    depots = depots or [min(coords)]
+    custs = [i for i in sorted(coords) if i not in depots]
+    P = np.asarray([coords[i] for i in depots + custs], dtype=np.float64)
+    cap = head.get("CAPACITY")
+    return _instance(head.get("NAME", os.path.basename(path)), P, len(depots),
+                     demands=[demand.get(i, 1.0) for i in custs],
+                     capacity=None if cap is None else float(cap), rounded=True)
+
+def load_solomon(path):
+    """Solomon biçimi: 0 numaralı müşteri depodur; kapasite VEHICLE bloğundan."""
+    with open(path) as f:
+        lines = [ln.split() for ln in f if ln.strip()]
+    name = " ".join(lines[0])
+    capacity, rows = None, []
+    for k, parts in enumerate(lines):
+        if parts[0].upper() == "NUMBER" and k + 1 < len(lines):
+            capacity = float(lines[k + 1][1])
+        elif parts[0].isdigit() and len(parts) >= 7:
+            rows.append(parts)
+    rows.sort(key=lambda r: int(r[0]))
+    P = np.asarray([(float(r[1]), float(r[2])) for r in rows], dtype=np.float64)
+    return _instance(name, P, 1, demands=[float(r[3]) for r in rows[1:]], capacity=capacity)
+
+def load_file(path):
+    """Uzantıya göre: .vrp -> CVRPLIB, diğerleri -> Solomon."""
+    return load_cvrplib(path) if path.lower().endswith(".vrp") else load_solomon(path)
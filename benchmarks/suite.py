@@ -0,0 +1,157 @@
+# benchmarks/suite.py
+"""
+Tüm çözücüler için boyut taraması: duvar süresi, iterasyon/sn, tepe bellek,
+makespan ve aynı örnekteki en iyi yönteme göre fark (gap, %).
+
+    python -m benchmarks.suite --sizes 10 50 200 1000 2000 --kinds euclid clustered \\
+        --methods greedy alns aco aco_mmas ortools greedy+2opt greedy+3opt \\
+        --time-limit-ms 10000 --out results.json --csv results.csv
+    python -m benchmarks.suite --files A-n32-k5.vrp C101.txt --out new.json --compare old.json
+
+Yöntem: çözücü adı, isteğe bağlı "+2opt"/"+3opt" ile (çözücü çıktısına local
+search; iki aşamaya ayrı ayrı time_limit_ms). ortools_optimize tek araçlıdır,
+birden çok depolu örneklerde atlanır. Kapasite ve talepler bu düzeyde yok sayılır.
+Tepe bellek ikinci (tracemalloc altında) bir koşudan; C++ (OR-Tools)
+ayırmaları görünmez. iter/sn yalnızca iterasyon sayısını bildiren ALNS için.
+"""
+import argparse
+import csv
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+
+from services.greedy_solver import greedy_optimize
+from services.alns_solver import alns_optimize
+from services.aco_solver import aco_optimize, aco_mmas_optimize
+from services.ortools_solver import ortools_optimize
+from services.local_search import two_opt, three_opt
+from services.matrix import makespan
+from services.neighbors import DEFAULT_K
+from benchmarks.instances import euclid_instance, clustered_instance, load_file
+
+SOLVERS = {
+    "greedy": greedy_optimize,
+    "alns": alns_optimize,
+    "aco": aco_optimize,
+    "aco_mmas": aco_mmas_optimize,
+    "ortools": ortools_optimize,
+}
+IMPROVERS = {"2opt": two_opt, "3opt": three_opt}
+GENERATORS = {"euclid": euclid_instance, "clustered": clustered_instance}
+FIELDS = ["instance", "n", "V", "method", "seconds", "iters_per_s", "peak_mb", "makespan", "gap_pct"]
+
+def run_method(inst, method, time_limit_ms, seed):
+    """Dönüş: (rotalar, saniye, iterasyon ya da None)."""
+    base, _, imp = method.partition("+")
+    M, depots, stops = inst["matrix"], inst["depots"], inst["stops"]
+    random.seed(seed)
+    np.random.seed(seed)
+    stats = {} if base == "alns" else None
+    t = time.perf_counter()
+    if stats is not None:
+        routes, _ = alns_optimize(M, depots, stops, stats=stats, time_limit_ms=time_limit_ms)
+    else:
+        routes, _ = SOLVERS[base](M, depots, stops, time_limit_ms=time_limit_ms)
+    if imp:
+        routes = IMPROVERS[imp](routes, M, depots, neighbors=DEFAULT_K, time_limit_ms=time_limit_ms)
+    return routes, time.perf_counter() - t, None if stats is None else stats.get("iterations")
+
+def bench(inst, methods, time_limit_ms, seed, memory=True):
+    rows = []
+    for method in methods:
+        base, _, imp = method.partition("+")
+        if base not in SOLVERS or (imp and imp not in IMPROVERS):
+            raise SystemExit("bilinmeyen yöntem: " + method)
+        if base == "ortools" and len(inst["depots"]) > 1:
+            continue
+        routes, dt, iters = run_method(inst, method, time_limit_ms, seed)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            run_method(inst, method, time_limit_ms, seed)
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        rows.append({
+            "instance": inst["name"], "n": len(inst["stops"]), "V": len(inst["depots"]),
+            "method": method, "seconds": dt, "iters_per_s": None if iters is None else iters / dt,
+            "peak_mb": peak, "makespan": float(makespan(inst["matrix"], inst["depots"], routes)),
+        })
+    best = min((r["makespan"] for r in rows), default=0.0)
+    for r in rows:
+        r["gap_pct"] = 100.0 * (r["makespan"] - best) / best if best > 0 else 0.0
+    return rows
+
+def instances(sizes, kinds, vehicles, files, seed):
+    for path in files:
+        yield load_file(path)
+    for n in sizes:
+        for kind in kinds:
+            for V in vehicles:
+                yield GENERATORS[kind](n, V, seed=seed)
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(rows, old_rows, slower=1.2, worse=1.01):
+    """Aynı (örnek, yöntem) için eski sonuca göre oranlar; eşiği aşanlar işaretlenir."""
+    old = {(r["instance"], r["method"]): r for r in old_rows}
+    print(f"\n{'örnek':<28}{'yöntem':<14}{'süre x':>8}{'makespan x':>12}")
+    for r in rows:
+        o = old.get((r["instance"], r["method"]))
+        if o is None:
+            continue
+        ts = r["seconds"] / o["seconds"] if o["seconds"] else float("inf")
+        ms = r["makespan"] / o["makespan"] if o["makespan"] else 1.0
+        flag = "  <-- gerileme" if ts > slower or ms > worse else ""
+        print(f"{r['instance']:<28}{r['method']:<14}{ts:>8.2f}{ms:>12.4f}{flag}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="*", default=[10, 50, 200, 1000])
+    ap.add_argument("--kinds", nargs="+", default=["euclid", "clustered"], choices=sorted(GENERATORS))
+    ap.add_argument("--vehicles", type=int, nargs="+", default=[1])
+    ap.add_argument("--files", nargs="*", default=[], help="CVRPLIB .vrp ya da Solomon dosyaları")
+    ap.add_argument("--methods", nargs="+",
+                    default=["greedy", "greedy+2opt", "greedy+3opt", "alns", "aco", "aco_mmas", "ortools"])
+    ap.add_argument("--time-limit-ms", type=float, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-memory", action="store_true", help="tracemalloc koşusunu atla")
+    ap.add_argument("--out", help="JSON çıktı")
+    ap.add_argument("--csv", help="CSV çıktı")
+    ap.add_argument("--compare", help="önceki JSON çıktısı (gerileme karşılaştırması)")
+    a = ap.parse_args(argv)
+
+    print(f"{'örnek':<28}{'yöntem':<14}{'sn':>9}{'iter/sn':>9}{'tepe MB':>9}{'makespan':>12}{'gap %':>8}")
+    rows = []
+    for inst in instances(a.sizes, a.kinds, a.vehicles, a.files, a.seed):
+        for r in bench(inst, a.methods, a.time_limit_ms, a.seed, memory=not a.no_memory):
+            rows.append(r)
+            ips = "-" if r["iters_per_s"] is None else f"{r['iters_per_s']:.1f}"
+            mb = "-" if r["peak_mb"] is None else f"{r['peak_mb']:.2f}"
+            print(f"{r['instance']:<28}{r['method']:<14}{r['seconds']:>9.3f}{ips:>9}{mb:>9}"
+                  f"{r['makespan']:>12.1f}{r['gap_pct']:>8.2f}")
+
+    if a.out:
+        meta = {"git": _git_rev(), "python": platform.python_version(), "numpy": np.__version__,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "time_limit_ms": a.time_limit_ms, "seed": a.seed}
+        with open(a.out, "w") as f:
+            json.dump({"meta": meta, "results": rows}, f, indent=1)
+    if a.csv:
+        with open(a.csv, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=FIELDS)
+            w.writeheader()
+            w.writerows(rows)
+    if a.compare:
+        with open(a.compare) as f:
+            compare(rows, json.load(f)["results"])
+
+if __name__ == "__main__":
+    main()
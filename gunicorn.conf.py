@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+"""
+gunicorn ayarları (ortam değişkenleriyle):
+
+  PORT                    dinlenen port (8080)
+  WEB_CONCURRENCY         işçi süreç sayısı (1)
+  GUNICORN_THREADS        işçi başına iş parçacığı (8)
+  GUNICORN_TIMEOUT        yanıt vermeyen işçinin öldürülme süresi, sn (300)
+  GRACEFUL_TIMEOUT        kapanışta süren isteklere tanınan süre, sn (120)
+  JOB_DRAIN_S             kapanışta çalışan işe tanınan süre, sn (60)
+
+Varsayılan tek süreç + çok iş parçacığıdır: çözücüler SOLVER_ISOLATE ile
+ayrı süreç havuzunda koştuğundan istek iş parçacıkları (/ping dahil) CPU
+beklemez; matris önbelleği, plan deposu ve iş kuyruğu da tek süreçte
+paylaşılır. WEB_CONCURRENCY > 1'de /jobs id'leri yalnızca onu alan süreçte
+bilinir (yapışkan yönlendirme gerekir).
+
+CPU: her istek en fazla SOLVER_MAX_WORKERS_PER_REQUEST havuz işçisi
+(varsayılan havuzun yarısı) ve bir çözüm yuvası kullanır (SOLVE_SLOTS);
+böylece büyük bir çözüm diğerlerini aç bırakmaz.
+"""
+import os
+
+_cpus = os.cpu_count() or 1
+# services.parallel içe aktarılmadan (preload) önce
+os.environ.setdefault("SOLVER_ISOLATE", "1")
+os.environ.setdefault("SOLVER_MAX_WORKERS_PER_REQUEST", str(max(1, _cpus // 2)))
+
+bind = "0.0.0.0:%s" % os.environ.get("PORT", "8080")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 120))
+keepalive = 5
+preload_app = True
+accesslog = "-"
+
+JOB_DRAIN_S = float(os.environ.get("JOB_DRAIN_S", 60))
+
+def worker_exit(server, worker):
+    """Süren istekler bitti; kuyruktaki işleri boşalt, çözücü havuzunu kapat."""
+    from services.jobs import drain_job_queue
+    from services.parallel import shutdown_pool
+    if not drain_job_queue(JOB_DRAIN_S):
+        server.log.warning("iş kuyruğu %.0f sn içinde boşalmadı; çalışan iş iptal edildi", JOB_DRAIN_S)
+    shutdown_pool()
@@ -1,12 +1,22 @@
 # routes/alns_routes.py
-from flask import Blueprint, request, jsonify, render_template
-from math import isfinite
-from services.osrm_service import osrm_table, osrm_trip
-from services.alns_solver import alns_optimize
-from services.greedy_solver import greedy_optimize
-from services.aco_solver import aco_optimize
-from services.local_search import two_opt, three_opt, route_cost
-from services.ortools_solver import ortools_optimize
+import json
+import queue
+import threading
+from flask import Blueprint, Response, request, jsonify, render_template, stream_with_context
+from services.matrix_cache import get_matrix_cache
+from services.solution_store import get_solution_store
+from services.planner import PlanError, parse_request, run_plan
+from services.jobs import QueueFull, get_job_queue
+from services.batch import parse_batch, run_batch
+from services.reoptimize import PlanNotFound, parse_reoptimize, run_reoptimize
+from services.parallel import Busy, SOLVE_SLOT_WAIT_S, acquire_slot, release_slot, cpu_slot, cancellable_slot
+from services import metrics
+
+# SSE: bu kadar saniye olay gelmezse yorum satırı gönderilir (proxy boşta
+# kalma zaman aşımlarına karşı)
+KEEPALIVE_S = 15
+JOB_RETRY_AFTER_S = 5  # kuyruk doluyken Retry-After
+BUSY = ({"error": "sunucu meşgul, tekrar deneyin"}, 503, {"Retry-After": str(int(SOLVE_SLOT_WAIT_S))})
 
 # ---- Blueprint ----
 alns_bp = Blueprint("alns", __name__, template_folder="../templates")
@@ -21,196 +31,163 @@ def index():
 def ping():
     return jsonify({"ok": True})
 
-# ---- Yardımcılar ----
-def _ok_point(p):
-    return (
-        isinstance(p, (list, tuple))
-        and len(p) == 2
-        and isinstance(p[0], (int, float))
-        and isinstance(p[1], (int, float))
-    )
-
-def _ok_num(x):
-    return isinstance(x, (int, float)) and isfinite(x)
-
-def _makespan_by_vehicle(trips_json):
-    """Aynı araç birden çok alt-trip yapabilir. Araç sürelerini topla, sonra maksimumu al."""
-    if not trips_json:
-        return 0
-    per = {}
-    for t in trips_json:
-        v = int(t["vehicle"])
-        dur = t["trip"]["trips"][0]["duration"]
-        per[v] = per.get(v, 0) + dur
-    return max(per.values()) if per else 0
-
-def _totals_from_trips(trips_json):
-    if not trips_json:
-        return {"duration": 0, "distance": 0}
-    return {
-        "duration": sum(t["trip"]["trips"][0]["duration"] for t in trips_json),
-        "distance": sum(t["trip"]["trips"][0]["distance"] for t in trips_json),
-    }
-
-def _nn_order(mat, start, nodes):
-    """Nearest-neighbor sırası."""
-    rem = set(nodes)
-    if not rem:
-        return []
-    cur = min(rem, key=lambda x: mat[start][x])
-    seq = [cur]
-    rem.remove(cur)
-    while rem:
-        nxt = min(rem, key=lambda x: mat[cur][x])
-        seq.append(nxt)
-        rem.remove(nxt)
-        cur = nxt
-    return seq
-
-def _assign_customers_to_depots(mat, depot_idxs, stop_idxs, demands, depot_stock):
-    """Stoğa saygılı en yakın depo ataması. Bölünmüş teslimat yok."""
-    V = len(depot_idxs)
-    choices = []
-    for k, j in enumerate(stop_idxs):
-        row = sorted(range(V), key=lambda v: mat[depot_idxs[v]][j])
-        choices.append(row)
-
-    stock = depot_stock[:]
-    assign = [[] for _ in range(V)]
-    for k, j in enumerate(stop_idxs):
-        need = demands[k]
-        placed = False
-        for v in choices[k]:
-            if stock[v] >= need:
-                stock[v] -= need
-                assign[v].append(j)
-                placed = True
-                break
-        if not placed:
-            return None
-    return assign
+# ---- Matris önbelleği istatistikleri ----
+@alns_bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(dict(get_matrix_cache().stats(), solutions=get_solution_store().stats(),
+                        jobs=get_job_queue().stats()))
+
+# ---- Prometheus metrikleri ----
+@alns_bp.route("/metrics", methods=["GET"])
+def metrics_export():
+    """Süreç geneli sayaçlar, aşama süresi özetleri, önbellek ve kuyruk durumu."""
+    cache, jobs = get_matrix_cache().stats(), get_job_queue().stats()
+    gauges = [("matrix_cache_" + k, {}, cache[k]) for k in ("hits", "disk_hits", "misses", "fetches", "mem_pairs")]
+    gauges.append(("jobs_queued", {}, jobs["queued"]))
+    gauges += [("jobs", {"status": st}, n) for st, n in sorted(jobs["jobs"].items())]
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
 
 # ---- Ana çözüm uç noktası ----
 @alns_bp.route("/solve", methods=["POST"])
 def solve():
     try:
-        data = request.get_json(silent=True) or {}
-        depots = data.get("depots", [])
-        stops = data.get("stops", [])
-        demands = data.get("demands", [])
-        depot_stock = data.get("depot_stock", [])
-        vehicle_caps = data.get("vehicle_caps", [])
-        method = str(data.get("method", "alns")).lower()
-        improve = data.get("improve")  # "", None, "2opt", "3opt"
-
-        # --- doğrulamalar ---
-        if not isinstance(depots, list) or not isinstance(stops, list):
-            return jsonify({"error": "depots ve stops list olmalı"}), 400
-        if len(depots) == 0:
-            return jsonify({"error": "En az bir depo gerekir"}), 400
-        if not all(_ok_point(p) for p in depots):
-            return jsonify({"error": "depots elemanları [enlem, boylam] olmalı"}), 400
-        if not all(_ok_point(p) for p in stops):
-            return jsonify({"error": "stops elemanları [enlem, boylam] olmalı"}), 400
-
-        N, V = len(stops), len(depots)
-        if demands and len(demands) != N:
-            return jsonify({"error": "demands uzunluğu stops ile aynı olmalı"}), 400
-        if depot_stock and len(depot_stock) != V:
-            return jsonify({"error": "depot_stock uzunluğu depots ile aynı olmalı"}), 400
-        if vehicle_caps and len(vehicle_caps) != V:
-            return jsonify({"error": "vehicle_caps uzunluğu depots ile aynı olmalı"}), 400
-
-        # varsayılanlar
-        if not demands:
-            demands = [1.0] * N
-        if not depot_stock:
-            depot_stock = [sum(demands)] * V
-        if not vehicle_caps:
-            vehicle_caps = [sum(demands)] * V
-
-        if any((not _ok_num(x) or x < 0) for x in demands + depot_stock + vehicle_caps):
-            return jsonify({"error": "negatif olmayan sayısal değerler beklenir"}), 400
-
-        all_coords = depots + stops
-        depot_idxs = list(range(V))
-        stop_idxs = [V + i for i in range(N)]
-
-        # 1) OSRM TABLE
-        mat = osrm_table(all_coords)
-
-        # 2) Talep–stok uyumlu depo ataması
-        assign = _assign_customers_to_depots(mat, depot_idxs, stop_idxs, demands, depot_stock)
-        if assign is None:
-            return jsonify({"error": "stok yetersiz. talepler depolara dağıtılamadı"}), 400
-
-        # 3) Depo başına kapasiteye göre alt-turlar
-        routed_groups = []  # (vehicle_index, [global_stop_idx,...])
-        for v in range(V):
-            custs = assign[v]
-            cur_load = 0.0
-            cur_group = []
-            for j in _nn_order(mat, depot_idxs[v], custs):
-                dem = demands[j - V]
-                if cur_group and cur_load + dem > vehicle_caps[v]:
-                    routed_groups.append((v, cur_group))
-                    cur_group, cur_load = [], 0.0
-                cur_group.append(j)
-                cur_load += dem
-            if cur_group:
-                routed_groups.append((v, cur_group))
-
-        # 4) Her grup için iç sıralama + local search
-        groups_by_vehicle = {v: [] for v in range(V)}  # v -> [seq1, seq2, ...]
-        for v, grp in routed_groups:
-            if method == "greedy":
-                sub_routes, _ = greedy_optimize(mat, [depot_idxs[v]], grp)
-            elif method == "aco":
-                sub_routes, _ = aco_optimize(mat, [depot_idxs[v]], grp)
-            elif method == "ortools":
-                sub_routes, _ = ortools_optimize(mat, [depot_idxs[v]], grp)
-            else:
-                sub_routes, _ = alns_optimize(mat, [depot_idxs[v]], grp)
-
-            seq = sub_routes[0] if sub_routes else []
-            if improve == "2opt":
-                seq = two_opt([seq], mat, [depot_idxs[v]])[0]
-            elif improve == "3opt":
-                seq = three_opt([seq], mat, [depot_idxs[v]])[0]
-            groups_by_vehicle[v].append(seq)
-
-        # 5) OSRM TRIP ve metrikler
-        base_trips = []
-        final_routes = [[] for _ in range(V)]
-        for v in range(V):
-            for seq in groups_by_vehicle[v]:
-                if not seq:
-                    continue
-                stop_coords = [all_coords[j] for j in seq]
-                base_trips.append({"vehicle": v, "trip": osrm_trip(depots[v], stop_coords)})
-                final_routes[v].extend(seq)
-
-        # Araç bazında toplam sürelerden makespan
-        base_mk_real = _makespan_by_vehicle(base_trips)
-        base_mk_matrix = max(
-            (sum(route_cost(mat, depot_idxs[v], seq) for seq in groups_by_vehicle[v]) for v in range(V)),
-            default=0,
-        )
-        totals = _totals_from_trips(base_trips)
-
-        return jsonify({
-            "method": method,
-            "improve": improve,
-            "improve_accepted": True,
-            "routes": final_routes,
-            "assign": {str(v): assign[v] for v in range(V)},
-            "groups": {str(v): groups_by_vehicle[v] for v in range(V)},
-            "makespan_real": base_mk_real,
-            "makespan_matrix": base_mk_matrix,
-            "trips": base_trips,
-            "totals": totals,
-            "vehicle_caps": vehicle_caps,
-        })
+        req = parse_request(request.get_json(silent=True) or {})
+        with cpu_slot():
+            return jsonify(run_plan(req))
+    except PlanError as e:
+        return jsonify({"error": str(e)}), 400
+    except Busy:
+        return BUSY
+    except Exception as e:
+        return jsonify({"error": "internal_error", "message": str(e)}), 500
 
+# ---- Artımlı yeniden iyileştirme ----
+@alns_bp.route("/reoptimize", methods=["POST"])
+def reoptimize():
+    """
+    {"plan_id" | "plan", "add", "add_demands", "remove", ...} -> /solve yanıtı
+    + stops, demands, changed (ayrıntı: services/reoptimize.py).
+    """
+    try:
+        base, prev, opts = parse_reoptimize(request.get_json(silent=True) or {})
+        with cpu_slot():
+            return jsonify(run_reoptimize(base, prev, opts))
+    except PlanNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except PlanError as e:
+        return jsonify({"error": str(e)}), 400
+    except Busy:
+        return BUSY
     except Exception as e:
         return jsonify({"error": "internal_error", "message": str(e)}), 500
+
+# ---- Toplu çözüm ----
+@alns_bp.route("/solve_batch", methods=["POST"])
+def solve_batch():
+    """
+    {"instances": [/solve gövdesi, ...], ortak alanlar..., "workers": n}
+    -> {"results": [...giriş sırasıyla...], "count", "failed"}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        workers = data.get("workers")
+        if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 1):
+            raise PlanError("workers pozitif tam sayı olmalı")
+        reqs = parse_batch(data)
+        with cpu_slot():
+            results = run_batch(reqs, workers)
+        return jsonify({"results": results, "count": len(results),
+                        "failed": sum(1 for r in results if "error" in r)})
+    except PlanError as e:
+        return jsonify({"error": str(e)}), 400
+    except Busy:
+        return BUSY
+    except Exception as e:
+        return jsonify({"error": "internal_error", "message": str(e)}), 500
+
+# ---- Akışlı çözüm (Server-Sent Events) ----
+def _sse(event, payload):
+    return "event: %s\ndata: %s\n\n" % (event, json.dumps(payload))
+
+@alns_bp.route("/solve_stream", methods=["POST"])
+def solve_stream():
+    """
+    /solve ile aynı gövde; yanıt text/event-stream. Olaylar: matrix, group,
+    makespan, trip; sonda result (/solve yanıtı) ya da error.
+    """
+    try:
+        req = parse_request(request.get_json(silent=True) or {})
+    except PlanError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        acquire_slot()  # yanıt başlamadan: meşgulse 503
+    except Busy:
+        return BUSY
+
+    events = queue.Queue()
+
+    def work():
+        try:
+            events.put(("result", run_plan(req, emit=lambda ev, data: events.put((ev, data)))))
+        except PlanError as e:
+            events.put(("error", {"error": str(e)}))
+        except Exception as e:
+            events.put(("error", {"error": "internal_error", "message": str(e)}))
+        finally:
+            release_slot()
+
+    threading.Thread(target=work, daemon=True).start()
+
+    def gen():
+        while True:
+            try:
+                event, payload = events.get(timeout=KEEPALIVE_S)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event, payload)
+            if event in ("result", "error"):
+                return
+
+    return Response(stream_with_context(gen()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---- Asenkron işler ----
+def _run_job(req, emit):
+    """
+    Kuyruktaki iş yuvasını süresiz bekler (geri basınç kuyruğun kendisinde);
+    beklerken iptal edilirse run_plan hiç çağrılmaz.
+    """
+    with cancellable_slot():
+        return run_plan(req, emit=emit)
+
+@alns_bp.route("/jobs", methods=["POST"])
+def job_submit():
+    """/solve gövdesi kuyruğa alınır; 202 + iş id'si (GET ile yoklanır)."""
+    try:
+        req = parse_request(request.get_json(silent=True) or {})
+    except PlanError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        job = get_job_queue().submit(_run_job, req)
+    except QueueFull:
+        return jsonify({"error": "kuyruk dolu"}), 429, {"Retry-After": str(JOB_RETRY_AFTER_S)}
+    return jsonify({"id": job.id, "status": job.status}), 202, {"Location": "/alns/jobs/" + job.id}
+
+@alns_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "iş bulunamadı"}), 404
+    return jsonify(job.to_dict())
+
+@alns_bp.route("/jobs/<job_id>", methods=["DELETE"])
+def job_cancel(job_id):
+    """
+    Bekleyen işi iptal eder, bitmiş işin kaydını siler (200); çalışan işe
+    iptal isteği gönderir (202: çözücü bir sonraki kontrol noktasında durur).
+    """
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "iş bulunamadı"}), 404
+    return jsonify({"id": job.id, "status": job.status}), 202 if job.status == "running" else 200
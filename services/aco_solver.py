@@ -1,85 +1,201 @@
 import random
-import math
+import numpy as np
+from services.matrix import as_matrix
+from services.neighbors import knn_index
+from services.local_search import two_opt
+from services.budget import deadline_after, time_up, remaining_ms
 
-def route_cost(matrix, start_idx, stop_idxs):
-    if not stop_idxs:
-        return 0
-    c = matrix[start_idx][stop_idxs[0]]
-    for i in range(len(stop_idxs)-1):
-        c += matrix[stop_idxs[i]][stop_idxs[i+1]]
-    return c
+def _construct(P, D, V, n_stops, ants, rng):
+    """
+    Tüm koloniyi birlikte kurar (yerel indekslerle; 0..V-1 depolar).
+    Araçlar sırayla birer durak alır. P: tau**alpha * eta**beta.
+    Dönüş: (steps (ants, n_stops) yerel düğümler, costs (ants, V)).
+    """
+    L = P.shape[0]
+    rows = np.arange(ants)
+    visited = np.zeros((ants, L), dtype=bool)
+    visited[:, :V] = True
+    cur = np.tile(np.arange(V), (ants, 1))      # araç başına son düğüm
+    costs = np.zeros((ants, V))
+    steps = np.empty((ants, n_stops), dtype=np.intp)
+    for s in range(n_stops):
+        v = s % V
+        c = cur[:, v]
+        w = np.where(visited, 0.0, P[c])
+        cum = np.cumsum(w, axis=1)
+        total = cum[:, -1]
+        # maskeli kümülatif toplam üzerinde rulet seçimi
+        r = rng.random(ants) * total
+        j = (cum <= r[:, None]).sum(axis=1)
+        dead = total <= 0  # tüm ağırlıklar sıfır: rastgele ziyaret edilmemiş düğüm
+        if dead.any():
+            for a in np.flatnonzero(dead):
+                j[a] = rng.choice(np.flatnonzero(~visited[a]))
+        j = np.minimum(j, L - 1)
+        visited[rows, j] = True
+        costs[:, v] += D[c, j]
+        cur[:, v] = j
+        steps[:, s] = j
+    return steps, costs
 
-def aco_optimize(matrix, depot_idxs, stop_idxs, ants=20, iterations=50, alpha=1.0, beta=2.0, rho=0.5):
+def aco_optimize(matrix, depot_idxs, stop_idxs, ants=20, iterations=50, alpha=1.0, beta=2.0, rho=0.5,
+                 time_limit_ms=None):
     """
     Ant Colony Optimization ile çoklu araç rotalama (çok basitleştirilmiş).
     Varsayılan hedef: makespan (en uzun rota süresini minimize et).
+    Grup matrisi (depolar + duraklar) üzerinde, koloni toplu olarak kurulur.
+    time_limit_ms dolunca (en az bir iterasyondan sonra) en iyi çözüm döner.
     """
+    deadline = deadline_after(time_limit_ms)
 
-    n = len(matrix)
-    pheromone = [[1.0 for _ in range(n)] for _ in range(n)]
+    matrix = as_matrix(matrix)
+    V = len(depot_idxs)
+    if not stop_idxs:
+        return [[] for _ in depot_idxs], 0.0
+
+    nodes = np.asarray(list(depot_idxs) + list(stop_idxs), dtype=np.intp)
+    D = matrix[np.ix_(nodes, nodes)]
+    eta_b = (1.0 / (D + 1e-6)) ** beta          # sezgisel matris bir kez
+    tau = np.ones_like(D)
+    rng = np.random.default_rng(random.getrandbits(32))
+    n_stops = len(stop_idxs)
+    vehicle = np.arange(n_stops) % V
 
     best_routes, best_cost = None, float("inf")
 
     for _ in range(iterations):
-        all_routes = []
-        all_costs = []
-
-        for _ in range(ants):
-            # her karınca için rotaları oluştur
-            routes = [[] for _ in depot_idxs]
-            unvisited = set(stop_idxs)
-
-            while unvisited:
-                for v in range(len(depot_idxs)):
-                    if not unvisited:
-                        break
-                    current = depot_idxs[v] if not routes[v] else routes[v][-1]
-
-                    # seçim olasılıklarını hesapla
-                    probs = []
-                    denom = 0
-                    for j in unvisited:
-                        tau = pheromone[current][j] ** alpha
-                        eta = (1.0 / (matrix[current][j] + 1e-6)) ** beta
-                        val = tau * eta
-                        denom += val
-                        probs.append((j, val))
-
-                    if denom == 0:
-                        j = random.choice(list(unvisited))
-                    else:
-                        r = random.random()
-                        cum = 0
-                        j = None
-                        for node, val in probs:
-                            cum += val / denom
-                            if r <= cum:
-                                j = node
-                                break
-                        if j is None:
-                            j = probs[-1][0]
-
-                    routes[v].append(j)
-                    unvisited.remove(j)
-
-            # cost = makespan
-            costs = [route_cost(matrix, depot_idxs[v], routes[v]) for v in range(len(routes))]
-            cost = max(costs) if costs else 0
-            all_routes.append(routes)
-            all_costs.append(cost)
-
-            if cost < best_cost:
-                best_cost, best_routes = cost, routes
-
-        # feromon güncelleme
-        for i in range(n):
-            for j in range(n):
-                pheromone[i][j] *= (1 - rho)
-
-        for routes, cost in zip(all_routes, all_costs):
-            for v in range(len(routes)):
-                seq = [depot_idxs[v]] + routes[v]
-                for a, b in zip(seq[:-1], seq[1:]):
-                    pheromone[a][b] += 1.0 / (1.0 + cost)
+        if best_routes is not None and time_up(deadline):
+            break
+        P = tau ** alpha * eta_b if alpha != 1.0 else tau * eta_b
+        steps, costs = _construct(P, D, V, n_stops, ants, rng)
+        mk = costs.max(axis=1)
+
+        a = int(mk.argmin())
+        if mk[a] < best_cost:
+            best_cost = float(mk[a])
+            best_routes = [nodes[steps[a, vehicle == v]].tolist() for v in range(V)]
+
+        # feromon güncelleme: yerinde buharlaşma + toplu bırakma
+        tau *= (1 - rho)
+        prev = np.empty_like(steps)
+        h = min(V, n_stops)
+        prev[:, :h] = np.arange(h)
+        prev[:, h:] = steps[:, :-V] if n_stops > V else steps[:, :0]
+        amount = np.repeat(1.0 / (1.0 + mk), n_stops)
+        np.add.at(tau, (prev.ravel(), steps.ravel()), amount)
 
     return best_routes, best_cost
+
+
+# -------- Aday listeli MAX-MIN Ant System --------
+def _construct_nl(P, D, nn, V, n_stops, ants, rng):
+    """
+    _construct gibi, ancak seçim önce aday listesiyle (nn[cur]) sınırlı;
+    listede ziyaret edilmemiş düğüm kalmayan karıncalar tüm kümeden seçer.
+    """
+    L = P.shape[0]
+    rows = np.arange(ants)
+    visited = np.zeros((ants, L), dtype=bool)
+    visited[:, :V] = True
+    cur = np.tile(np.arange(V), (ants, 1))
+    costs = np.zeros((ants, V))
+    steps = np.empty((ants, n_stops), dtype=np.intp)
+    for s in range(n_stops):
+        v = s % V
+        c = cur[:, v]
+        cand = nn[c]                                   # (ants, k)
+        w = np.where(visited[rows[:, None], cand], 0.0, P[c[:, None], cand])
+        cum = np.cumsum(w, axis=1)
+        total = cum[:, -1] if cand.shape[1] else np.zeros(ants)
+        r = rng.random(ants) * total
+        pick = np.minimum((cum <= r[:, None]).sum(axis=1), max(cand.shape[1] - 1, 0))
+        j = cand[rows, pick] if cand.shape[1] else np.zeros(ants, dtype=np.intp)
+        for a in np.flatnonzero(total <= 0):
+            # aday listesi tükendi: tüm ziyaret edilmemiş düğümler
+            free = np.flatnonzero(~visited[a])
+            wf = P[c[a], free]
+            tf = wf.sum()
+            j[a] = free[np.searchsorted(np.cumsum(wf), rng.random() * tf, side="right").clip(max=len(free) - 1)] \
+                if tf > 0 else rng.choice(free)
+        visited[rows, j] = True
+        costs[:, v] += D[c, j]
+        cur[:, v] = j
+        steps[:, s] = j
+    return steps, costs
+
+def _tau_bounds(best_cost, rho, n, p_best):
+    """MMAS feromon sınırları (Stützle & Hoos)."""
+    t_max = 1.0 / (rho * max(best_cost, 1e-9))
+    root = p_best ** (1.0 / max(n, 1))
+    avg = max(n / 2.0, 1.0)
+    t_min = t_max * (1 - root) / ((avg - 1) * root) if avg > 1 else t_max / 2
+    return min(t_min, t_max), t_max
+
+def aco_mmas_optimize(matrix, depot_idxs, stop_idxs, ants=20, iterations=50, alpha=1.0, beta=2.0,
+                      rho=0.02, candidates=15, p_best=0.05, local_search=True, time_limit_ms=None):
+    """
+    Büyük gruplar için ACO: MAX-MIN Ant System + aday listesi.
+    - Grup matrisi (depolar + duraklar) üzerinde çalışır; bellek O(grup²).
+    - Her adımda yalnızca en yakın `candidates` komşu değerlendirilir.
+    - Yalnızca iterasyonun en iyisi feromon bırakır; tau [t_min, t_max] aralığında.
+    - local_search=True: iterasyonun en iyi karıncasına aday listeli 2-opt.
+    Hedef: makespan. time_limit_ms dolunca en iyi çözüm döner.
+    """
+    deadline = deadline_after(time_limit_ms)
+    matrix = as_matrix(matrix)
+    V = len(depot_idxs)
+    if not stop_idxs:
+        return [[] for _ in depot_idxs], 0.0
+
+    nodes = np.asarray(list(depot_idxs) + list(stop_idxs), dtype=np.intp)
+    D = np.ascontiguousarray(matrix[np.ix_(nodes, nodes)])
+    L = len(nodes)
+    n_stops = len(stop_idxs)
+    nn = knn_index(D, candidates)
+    eta_b = (1.0 / (D + 1e-6)) ** beta
+    rng = np.random.default_rng(random.getrandbits(32))
+    vehicle = np.arange(n_stops) % V
+    local_depots = list(range(V))
+
+    tau = None
+    best_local, best_cost = None, float("inf")
+
+    for _ in range(iterations):
+        if best_local is not None and time_up(deadline):
+            break
+        if tau is None:
+            P = eta_b
+        else:
+            P = tau ** alpha * eta_b if alpha != 1.0 else tau * eta_b
+        steps, costs = _construct_nl(P, D, nn, V, n_stops, ants, rng)
+        mk = costs.max(axis=1)
+        a = int(mk.argmin())
+        it_routes = [steps[a, vehicle == v].tolist() for v in range(V)]
+        it_cost = float(mk[a])
+        if local_search:
+            it_routes = two_opt(it_routes, D, local_depots, neighbors=candidates,
+                                time_limit_ms=remaining_ms(deadline))
+            it_cost = max(_local_cost(D, v, r) for v, r in enumerate(it_routes))
+
+        if it_cost < best_cost:
+            best_local, best_cost = [list(r) for r in it_routes], it_cost
+        t_min, t_max = _tau_bounds(best_cost, rho, L, p_best)
+        if tau is None:
+            tau = np.full((L, L), t_max)
+
+        # buharlaşma + yalnızca iterasyon en iyisinin bırakması + sınırlar
+        tau *= (1 - rho)
+        for v, r in enumerate(it_routes):
+            if r:
+                seq = np.asarray([v] + r, dtype=np.intp)
+                tau[seq[:-1], seq[1:]] += 1.0 / max(it_cost, 1e-9)
+        np.clip(tau, t_min, t_max, out=tau)
+
+    best_routes = [nodes[r].tolist() if r else [] for r in best_local]
+    return best_routes, best_cost
+
+def _local_cost(D, v, r):
+    if not r:
+        return 0.0
+    seq = np.asarray([v] + r, dtype=np.intp)
+    return float(D[seq[:-1], seq[1:]].sum())
@@ -0,0 +1,310 @@
+# services/alns_operators.py
+"""
+ALNS yıkım/onarım operatörleri ve uyarlamalı seçim.
+
+Yıkım  : destroy(sol, k) -> çıkarılan düğümler (sol yerinde değişir)
+Onarım : repair(sol, removed, cache)        (sol yerinde değişir)
+
+Yeni operatör eklemek için register_destroy / register_repair kullanılır.
+"""
+import random
+import time
+import numpy as np
+
+# ---------------- Ekleme maliyeti ----------------
+def insertion_deltas(matrix, start, r, node):
+    """node'un r'deki her konuma eklenme maliyeti: m[a][node] + m[node][b] - m[a][b]."""
+    return _path_deltas(matrix, np.asarray([start]+r, dtype=np.intp), node)
+
+def _path_deltas(matrix, p, node):
+    d = matrix[p, node]
+    d[:-1] += matrix[node, p[1:]] - matrix[p[:-1], p[1:]]
+    return d
+
+class InsertionCache:
+    """
+    Rota başına {düğüm: (delta, konum)} en iyi ekleme önbelleği.
+    Bir rota değişince yalnızca o rotanın girdileri silinir (invalidate).
+    """
+    def __init__(self, matrix, depot_idxs):
+        self.matrix = matrix
+        self.depot_idxs = depot_idxs
+        self.by_route = [{} for _ in depot_idxs]
+
+    def best(self, sol, v, node):
+        hit = self.by_route[v].get(node)
+        if hit is None:
+            d = _path_deltas(self.matrix, sol.path(v), node)
+            pos = int(d.argmin())
+            hit = self.by_route[v][node] = (float(d[pos]), pos)
+        return hit
+
+    def invalidate(self, v):
+        self.by_route[v].clear()
+
+# ---------------- Yıkım ----------------
+DESTROY_OPERATORS = {}
+REPAIR_OPERATORS = {}
+
+def register_destroy(name):
+    def deco(fn):
+        DESTROY_OPERATORS[name] = fn
+        return fn
+    return deco
+
+def register_repair(name):
+    def deco(fn):
+        REPAIR_OPERATORS[name] = fn
+        return fn
+    return deco
+
+def _removal_gains(sol, v):
+    """v rotasındaki her durak çıkarılınca kazanılan süre."""
+    m = sol.matrix
+    p, F = sol.prefix(v)
+    g = np.diff(F)
+    g[:-1] += m[p[1:-1], p[2:]] - m[p[:-2], p[2:]]
+    return g
+
+def _remove_node(sol, node):
+    for v, r in enumerate(sol.routes):
+        if node in r:
+            return sol.remove(v, r.index(node))
+
+@register_destroy("random")
+def remove_nodes(sol, k):
+    """Rastgele k durağı çözümden (yerinde) çıkarır."""
+    removed=[]
+    while k>0:
+        nonempty = [i for i,r in enumerate(sol.routes) if r]
+        if not nonempty: break
+        v = random.choice(nonempty)
+        pos = random.randrange(len(sol.routes[v]))
+        removed.append(sol.remove(v,pos)); k-=1
+    return removed
+
+@register_destroy("worst")
+def worst_removal(sol, k, p=3):
+    """En pahalı durakları çıkarır; p ile rastgeleleştirilmiş (Ropke & Pisinger)."""
+    gains = {v: _removal_gains(sol, v) for v, r in enumerate(sol.routes) if r}
+    removed = []
+    while len(removed) < k and gains:
+        vs = list(gains)
+        g = np.concatenate([gains[v] for v in vs])
+        owner = np.repeat(np.arange(len(vs)), [len(gains[v]) for v in vs])
+        # azalan sıradaki idx. eleman
+        idx = int(len(g) * random.random() ** p)
+        t = int(np.argpartition(-g, idx)[idx])
+        v = vs[owner[t]]
+        pos = t - int(np.searchsorted(owner, owner[t]))
+        removed.append(sol.remove(v, pos))
+        # yalnızca değişen rotanın kazançları yeniden hesaplanır
+        if sol.routes[v]:
+            gains[v] = _removal_gains(sol, v)
+        else:
+            del gains[v]
+    return removed
+
+@register_destroy("shaw")
+def shaw_removal(sol, k, p=6):
+    """Birbirine yakın (ilişkili) durakları birlikte çıkarır."""
+    nodes = [j for r in sol.routes for j in r]
+    if not nodes:
+        return []
+    m = sol.matrix
+    removed = [_remove_node(sol, random.choice(nodes))]
+    while len(removed) < k:
+        rest = [j for r in sol.routes for j in r]
+        if not rest:
+            break
+        ref = random.choice(removed)
+        rel = m[ref, rest] + m[rest, ref]
+        order = np.argsort(rel)
+        idx = int(len(rest) * random.random() ** p)
+        removed.append(_remove_node(sol, rest[int(order[idx])]))
+    return removed
+
+@register_destroy("route")
+def route_removal(sol, k):
+    """
+    Rastgele bir rotayı boşaltır. Rota 2k'dan uzunsa yalnızca
+    k uzunlukta rastgele bir ardışık segment çıkarılır.
+    """
+    nonempty = [v for v, r in enumerate(sol.routes) if r]
+    if not nonempty:
+        return []
+    v = random.choice(nonempty)
+    n = len(sol.routes[v])
+    if n <= 2 * k:
+        start, cnt = 0, n
+    else:
+        start, cnt = random.randrange(n - k + 1), k
+    return [sol.remove(v, start) for _ in range(cnt)]
+
+# ---------------- Onarım ----------------
+def best_insert(matrix, depot_idxs, sol, node, cache=None):
+    if cache is None: cache = InsertionCache(matrix, depot_idxs)
+    best_v, best_pos, best_delta = None, None, float("inf")
+    for v in range(len(sol.routes)):
+        delta, pos = cache.best(sol, v, node)
+        if delta < best_delta: best_v,best_pos,best_delta=v,pos,delta
+    sol.insert(best_v,best_pos,node)
+    cache.invalidate(best_v)
+
+def greedy_repair(matrix,depot_idxs,sol,removed,cache=None):
+    """Çıkarılan düğümleri en ucuz konumlarına (yerinde) geri ekler."""
+    for n in removed: best_insert(matrix,depot_idxs,sol,n,cache)
+
+@register_repair("greedy")
+def _greedy(sol, removed, cache):
+    random.shuffle(removed)
+    greedy_repair(sol.matrix, sol.depot_idxs, sol, removed, cache)
+
+@register_repair("balanced")
+def balanced_repair(sol, removed, cache):
+    """
+    Makespan odaklı ekleme: düğüm, eklendikten sonraki rota süresi
+    (costs[v] + delta) en küçük olan rotaya konur; uzun rotalar yük almaz.
+    """
+    random.shuffle(removed)
+    for node in removed:
+        best_v, best_pos, best_key = None, None, None
+        for v in range(len(sol.routes)):
+            delta, pos = cache.best(sol, v, node)
+            key = (sol.costs[v] + delta, delta)
+            if best_key is None or key < best_key:
+                best_v, best_pos, best_key = v, pos, key
+        sol.insert(best_v, best_pos, node)
+        cache.invalidate(best_v)
+
+def _insertion_column(sol, v, nodes):
+    """nodes'un v rotasına en iyi ekleme (delta, konum) dizileri (vektörel)."""
+    m = sol.matrix
+    p = sol.path(v)
+    d = m[np.ix_(p, nodes)]
+    d[:-1] += m[np.ix_(nodes, p[1:])].T - m[p[:-1], p[1:]][:, None]
+    pos = d.argmin(axis=0)
+    return d[pos, np.arange(len(nodes))], pos
+
+def _update_column(sol, v, q, nodes, delta, pos):
+    """
+    x, v rotasının q konumuna eklendikten sonra sütunu günceller:
+    yalnızca (a, b) kenarı (a, x), (x, b) ile değişti. Eski en iyisi
+    tam da bu kenar olan düğümler için sütun baştan hesaplanır.
+    """
+    m, r = sol.matrix, sol.routes[v]
+    x = r[q]
+    a = sol.depot_idxs[v] if q == 0 else r[q - 1]
+    lost = pos == q
+    pos[pos > q] += 1
+    c1 = m[a, nodes] + m[nodes, x] - m[a, x]
+    c2 = m[x, nodes].copy()
+    if q + 1 < len(r):
+        b = r[q + 1]
+        c2 += m[nodes, b] - m[x, b]
+    for c, at in ((c1, q), (c2, q + 1)):
+        better = ~lost & (c < delta)
+        delta[better], pos[better] = c[better], at
+    if lost.any():
+        delta[lost], pos[lost] = _insertion_column(sol, v, nodes[lost])
+
+def regret_repair(sol, removed, cache, k=2):
+    """
+    Regret-k ekleme: her adımda, en iyi k rotadaki ekleme maliyetleri
+    arasındaki fark (pişmanlık) en büyük olan düğüm önce eklenir.
+    Bekleyen düğümlerin rota başına en iyi ekleme maliyeti bir tabloda
+    tutulur; ekleme sonrası yalnızca değişen kenar yeniden puanlanır.
+    """
+    if not removed:
+        return
+    nodes = np.asarray(removed, dtype=np.intp)
+    V = len(sol.routes)
+    delta = np.empty((len(nodes), V))
+    pos = np.empty((len(nodes), V), dtype=np.intp)
+    for v in range(V):
+        delta[:, v], pos[:, v] = _insertion_column(sol, v, nodes)
+    alive = np.ones(len(nodes), dtype=bool)
+    kk = min(k, V)
+    for _ in range(len(nodes)):
+        live = np.flatnonzero(alive)
+        srt = np.sort(delta[live], axis=1) if kk > 1 else delta[live]
+        regret = (srt[:, 1:kk] - srt[:, :1]).sum(axis=1)
+        # en büyük pişmanlık; eşitlikte en ucuz ekleme
+        t = live[np.lexsort((srt[:, :kk].min(axis=1), -regret))[0]]
+        v = int(delta[t].argmin())
+        q = int(pos[t, v])
+        sol.insert(v, q, int(nodes[t]))
+        cache.invalidate(v)
+        alive[t] = False
+        if alive.any():
+            live = np.flatnonzero(alive)
+            d, ps = delta[live, v], pos[live, v]
+            _update_column(sol, v, q, nodes[live], d, ps)
+            delta[live, v], pos[live, v] = d, ps
+
+@register_repair("regret2")
+def _regret2(sol, removed, cache):
+    regret_repair(sol, removed, cache, k=2)
+
+@register_repair("regret3")
+def _regret3(sol, removed, cache):
+    regret_repair(sol, removed, cache, k=3)
+
+# ---------------- Uyarlamalı seçim ----------------
+SIGMA_BEST, SIGMA_BETTER, SIGMA_ACCEPTED = 33.0, 9.0, 13.0
+
+class AdaptiveWeights:
+    """
+    Rulet tekerleği seçimi + segment bazlı ağırlık güncellemesi:
+    w <- (1 - r) * w + r * (segment puanı / segment kullanımı).
+    Operatör başına çağrı, süre ve başarı istatistikleri tutulur.
+    """
+    def __init__(self, names, reaction=0.1):
+        self.names = list(names)
+        self.reaction = reaction
+        self.weights = {n: 1.0 for n in self.names}
+        self._score = {n: 0.0 for n in self.names}
+        self._uses = {n: 0 for n in self.names}
+        self.stats = {n: {"calls": 0, "time_ms": 0.0, "best": 0, "improved": 0, "accepted": 0}
+                      for n in self.names}
+
+    def pick(self):
+        return random.choices(self.names, weights=[self.weights[n] for n in self.names])[0]
+
+    def record(self, name, seconds, outcome):
+        """outcome: "best" | "improved" | "accepted" | None (reddedildi)."""
+        s = self.stats[name]
+        s["calls"] += 1
+        s["time_ms"] += seconds * 1e3
+        self._uses[name] += 1
+        if outcome is not None:
+            s[outcome] += 1
+            self._score[name] += {"best": SIGMA_BEST, "improved": SIGMA_BETTER,
+                                  "accepted": SIGMA_ACCEPTED}[outcome]
+
+    def end_segment(self):
+        r = self.reaction
+        for n in self.names:
+            if self._uses[n]:
+                self.weights[n] = (1 - r) * self.weights[n] + r * self._score[n] / self._uses[n]
+            self._score[n], self._uses[n] = 0.0, 0
+
+    def report(self):
+        return {n: dict(self.stats[n], weight=round(self.weights[n], 4)) for n in self.names}
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+def merge_stats(into, stats):
+    """Grup bazlı ALNS istatistiklerini (çağrı/süre/başarı) toplar."""
+    into["iterations"] = into.get("iterations", 0) + stats.get("iterations", 0)
+    for kind in ("destroy", "repair"):
+        dst = into.setdefault(kind, {})
+        for name, s in stats.get(kind, {}).items():
+            d = dst.setdefault(name, {"calls": 0, "time_ms": 0.0, "best": 0, "improved": 0, "accepted": 0})
+            for key in ("calls", "time_ms", "best", "improved", "accepted"):
+                d[key] += s[key]
+            d["time_ms"] = round(d["time_ms"], 3)
+    return into
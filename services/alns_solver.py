@@ -1,73 +1,66 @@
-import random, math, copy
-
-def route_cost(matrix, start_idx, stop_idxs):
-    if not stop_idxs: return 0
-    c = matrix[start_idx][stop_idxs[0]]
-    for i in range(len(stop_idxs)-1):
-        c += matrix[stop_idxs[i]][stop_idxs[i+1]]
-    return c
+import random, math
+import numpy as np
+from services.matrix import as_matrix, makespan
+from services.solution import Solution
+from services.budget import deadline_after, time_up
+from services.alns_operators import (
+    DESTROY_OPERATORS, REPAIR_OPERATORS, AdaptiveWeights, InsertionCache, timed,
+)
 
 def total_cost(matrix, depot_idxs, routes):
     """Amaç fonksiyonu: en uzun rota süresini minimize et (makespan)."""
-    if not routes:
-        return 0
-    costs = [route_cost(matrix, depot_idxs[v], routes[v]) for v in range(len(routes))]
-    return max(costs) if costs else 0
+    return makespan(matrix, depot_idxs, routes)
 
 
 def nearest_init(matrix, depot_idxs, stop_idxs):
     V = len(depot_idxs)
     routes = [[] for _ in range(V)]
-    for j in stop_idxs:
-        best_i, best = 0, float("inf")
-        for i in range(V):
-            d = matrix[depot_idxs[i]][j]
-            if d < best:
-                best, best_i = d, i
-        routes[best_i].append(j)
+    if stop_idxs:
+        nearest = matrix[np.ix_(depot_idxs, stop_idxs)].argmin(axis=0)
+        for j, i in zip(stop_idxs, nearest.tolist()):
+            routes[i].append(j)
     return routes
 
-def remove_nodes(routes, k):
-    rs = copy.deepcopy(routes); removed=[]
-    while k>0:
-        nonempty = [i for i,r in enumerate(rs) if r]
-        if not nonempty: break
-        v = random.choice(nonempty)
-        pos = random.randrange(len(rs[v]))
-        removed.append(rs[v][pos]); rs[v].pop(pos); k-=1
-    return rs, removed
-
-def best_insert(matrix, depot_idxs, routes, node):
-    best_v, best_pos, best_delta = None, None, float("inf")
-    for v in range(len(routes)):
-        r = routes[v]
-        if not r:
-            delta = matrix[depot_idxs[v]][node]
-            if delta < best_delta: best_v, best_pos, best_delta = v,0,delta
-        else:
-            for pos in range(len(r)+1):
-                r2 = r[:pos]+[node]+r[pos:]
-                delta = route_cost(matrix,depot_idxs[v],r2)-route_cost(matrix,depot_idxs[v],r)
-                if delta < best_delta: best_v,best_pos,best_delta=v,pos,delta
-    routes[best_v].insert(best_pos,node)
-
-def greedy_repair(matrix,depot_idxs,routes,removed):
-    rs=copy.deepcopy(routes)
-    for n in removed: best_insert(matrix,depot_idxs,rs,n)
-    return rs
-
-def alns_optimize(matrix,depot_idxs,stop_idxs,iters=400):
-    routes=nearest_init(matrix,depot_idxs,stop_idxs)
-    best=copy.deepcopy(routes); best_cost=total_cost(matrix,depot_idxs,best)
-    cur=copy.deepcopy(best); cur_cost=best_cost
+def alns_optimize(matrix,depot_idxs,stop_idxs,iters=200,destroy=None,repair=None,
+                  segment=100,reaction=0.1,stats=None,time_limit_ms=None):
+    """
+    Uyarlamalı ALNS: her turda bir yıkım ve bir onarım operatörü rulet
+    tekerleğiyle seçilir; ağırlıklar her `segment` turda puanlara göre güncellenir.
+    destroy/repair: kullanılacak operatör adları (varsayılan: kayıtlı olanların hepsi).
+    stats verilirse operatör bazlı çağrı/süre/başarı istatistikleri yazılır.
+    time_limit_ms dolunca (iters'e ulaşılmasa da) o ana kadarki en iyi döner.
+    """
+    deadline=deadline_after(time_limit_ms)
+    matrix=as_matrix(matrix)
+    sol=Solution(matrix,depot_idxs,nearest_init(matrix,depot_idxs,stop_idxs))
+    best=sol.snapshot(); best_cost=sol.makespan()
+    cur_cost=best_cost
     T=best_cost*0.05 if best_cost>0 else 1
-    for _ in range(iters):
-        k=max(1,int(len(stop_idxs)*0.2))
-        rs,removed=remove_nodes(cur,k)
-        repaired=greedy_repair(matrix,depot_idxs,rs,removed)
-        c=total_cost(matrix,depot_idxs,repaired)
+    cache=InsertionCache(matrix,depot_idxs)
+    D=AdaptiveWeights(destroy or DESTROY_OPERATORS,reaction)
+    R=AdaptiveWeights(repair or REPAIR_OPERATORS,reaction)
+    k=max(1,int(len(stop_idxs)*0.2))
+    done=0
+    for it in range(1,iters+1):
+        if time_up(deadline): break
+        d_name,r_name=D.pick(),R.pick()
+        mark=sol.mark()
+        removed,d_t=timed(DESTROY_OPERATORS[d_name],sol,k)
+        for v in sol.touched: cache.invalidate(v)
+        _,r_t=timed(REPAIR_OPERATORS[r_name],sol,removed,cache)
+        c=sol.makespan()
+        outcome=None
         if c<cur_cost or random.random()<math.exp(-(c-cur_cost)/T):
-            cur,cur_cost=repaired,c
-            if c<best_cost: best,best_cost=copy.deepcopy(repaired),c
-        T*=0.995
+            outcome="improved" if c<cur_cost else "accepted"
+            sol.commit(); cur_cost=c
+            if c<best_cost: best,best_cost,outcome=sol.snapshot(),c,"best"
+        else:
+            # reddedildi: geri al; bu turda dokunulan rotaların önbelleği geçersiz
+            sol.rollback(mark)
+            for v in sol.touched: cache.invalidate(v)
+        D.record(d_name,d_t,outcome); R.record(r_name,r_t,outcome)
+        if it%segment==0: D.end_segment(); R.end_segment()
+        T*=0.995; done=it
+    if stats is not None:
+        stats.update(iterations=done,destroy=D.report(),repair=R.report())
     return best,best_cost
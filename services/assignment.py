@@ -0,0 +1,117 @@
+# services/assignment.py
+"""
+/solve adım 2-3 çekirdekleri: depo ataması ve sefer sırası.
+
+- nearest_assign : en yakın depoya stoğa saygılı atama. Depo sıraları
+                   depo x durak alt matrisinden tek argsort ile; stok tüm
+                   en yakın seçimlere yetiyorsa atama tek adımda (döngüsüz).
+- regret_assign  : pişmanlık (en iyi ile ikinci en iyi uygun depo farkı)
+                   sırasıyla atama; en yakın ataması stokta tıkandığında da
+                   çoğu zaman uygun dağılım bulur.
+- assign_stops   : yöntem seçimi; "nearest" başarısızsa "regret" denenir.
+- nn_order       : nearest-neighbor sırası, matris satırında maskeli argmin.
+
+Bölünmüş teslimat yok; her durak tek depoya gider. Dönüş: depo başına
+durak listesi (matris indeksleri, durak sırasıyla) ya da dağıtılamıyorsa None.
+"""
+import numpy as np
+
+ASSIGNMENTS = ("nearest", "regret")
+
+def _arrays(mat, depot_idxs, stop_idxs, demands, depot_stock):
+    D = mat[np.ix_(np.asarray(depot_idxs, dtype=np.intp), np.asarray(stop_idxs, dtype=np.intp))]
+    return (np.asarray(D, dtype=np.float64), np.asarray(demands, dtype=np.float64),
+            np.array(depot_stock, dtype=np.float64))
+
+def _lists(stop_idxs, owner, V):
+    """owner[k]: k. durağın deposu -> depo başına durak listesi (durak sırası korunur)."""
+    stops = np.asarray(stop_idxs, dtype=np.intp)
+    return [stops[owner == v].tolist() for v in range(V)]
+
+def nearest_assign(mat, depot_idxs, stop_idxs, demands, depot_stock):
+    """Duraklar sırayla, stoğu yeten en yakın depoya."""
+    V, N = len(depot_idxs), len(stop_idxs)
+    if N == 0:
+        return [[] for _ in range(V)]
+    D, dem, stock = _arrays(mat, depot_idxs, stop_idxs, demands, depot_stock)
+    order = np.argsort(D, axis=0, kind="stable")  # (V, N): durak başına depo sırası
+    first = order[0]
+    if (np.bincount(first, weights=dem, minlength=V) <= stock).all():
+        return _lists(stop_idxs, first, V)
+    owner = np.empty(N, dtype=np.intp)
+    cols = order.T.tolist()
+    stock = stock.tolist()
+    for k, need in enumerate(dem.tolist()):
+        for v in cols[k]:
+            if stock[v] >= need:
+                stock[v] -= need
+                owner[k] = v
+                break
+        else:
+            return None
+    return _lists(stop_idxs, owner, V)
+
+def regret_assign(mat, depot_idxs, stop_idxs, demands, depot_stock):
+    """
+    Kalan duraklar pişmanlığa göre (eşitlikte büyük talep önce) sıralanır ve
+    en iyi uygun depoya atanır. Bir durağın en iyi deposu dolduğunda ya da bir
+    deponun stoğu kalan en büyük talebin altına indiğinde (uygunluk değişebilir)
+    pişmanlıklar yeniden hesaplanır; eşit taleplerde bu en fazla V kez olur.
+    """
+    V, N = len(depot_idxs), len(stop_idxs)
+    if N == 0:
+        return [[] for _ in range(V)]
+    D, dem, stock = _arrays(mat, depot_idxs, stop_idxs, demands, depot_stock)
+    if dem.sum() > stock.sum():
+        return None
+    owner = np.full(N, -1, dtype=np.intp)
+    rem = np.arange(N)
+    while rem.size:
+        need = dem[rem]
+        C = np.where(stock[:, None] >= need[None, :], D[:, rem], np.inf)
+        best_v = C.argmin(axis=0)
+        best = C[best_v, np.arange(rem.size)]
+        if not np.isfinite(best).all():
+            return None  # bir durağa yetecek stok hiçbir depoda kalmadı
+        second = np.partition(C, 1, axis=0)[1] if V > 1 else np.full(rem.size, np.inf)
+        regret = second - best  # tek uygun depo: inf (önce)
+        dmax = need.max()
+        done = 0
+        for t in np.lexsort((-need, -regret)).tolist():
+            k, v = rem[t], best_v[t]
+            if stock[v] < dem[k]:
+                break
+            stock[v] -= dem[k]
+            owner[k] = v
+            done += 1
+            if stock[v] < dmax:
+                break
+        rem = rem[owner[rem] < 0]
+        if done == 0:
+            return None
+    return _lists(stop_idxs, owner, V)
+
+def assign_stops(mat, depot_idxs, stop_idxs, demands, depot_stock, method="nearest"):
+    """method: "nearest" (tıkanırsa regret) ya da "regret"."""
+    if method == "nearest":
+        assign = nearest_assign(mat, depot_idxs, stop_idxs, demands, depot_stock)
+        if assign is not None:
+            return assign
+    return regret_assign(mat, depot_idxs, stop_idxs, demands, depot_stock)
+
+def nn_order(mat, start, nodes):
+    """Nearest-neighbor sırası: her adımda mevcut düğümün satırında ziyaret edilmemiş en yakın."""
+    if not nodes:
+        return []
+    ids = np.asarray(nodes, dtype=np.intp)
+    seen = np.zeros(ids.size, dtype=bool)
+    seq = []
+    cur = start
+    for _ in range(ids.size):
+        row = np.asarray(mat[cur, ids], dtype=np.float64)
+        row[seen] = np.inf
+        t = int(row.argmin())
+        seen[t] = True
+        cur = int(ids[t])
+        seq.append(cur)
+    return seq
@@ -0,0 +1,118 @@
+# services/batch.py
+"""
+Çok sayıda bağımsız örneğin tek istekte çözümü (/solve_batch).
+
+- Her örnek bir /solve gövdesidir; üst düzeydeki ortak alanlar (method,
+  improve, ...) örnekte yoksa varsayılan olarak kullanılır.
+- Geçerli örneklerin koordinatları tekilleştirilir ve birleşim matrisi tek
+  istekle alınır (önbellekli). Birleşim BATCH_MAX_UNION noktayı aşarsa
+  örnekler giriş sırasıyla parçalara bölünür (parça başına bir istek).
+- Örnek matrisi birleşimden np.ix_ ile kesilir. solve_plan süreç havuzunda
+  örnek başına tek işçiyle koşar; OSRM trip ve plan deposu ana süreçte.
+- Sonuçlar giriş sırasıyla; geçersiz ya da başarısız örnek {"error": ...}.
+  Bir parçanın matrisi alınamazsa (OSRM hatası) yalnızca o parçanın
+  örnekleri {"error": "matrix_error", ...} olur; diğer parçalar çözülür.
+"""
+import os
+import numpy as np
+
+from services.matrix import as_matrix
+from services.matrix_cache import cached_osrm_table, coord_key
+from services.parallel import pool_map
+from services.budget import deadline_after
+from services.planner import PlanError, parse_request, prior_plan, solve_plan, finish_plan
+from services import metrics
+
+BATCH_MAX_INSTANCES = int(os.environ.get("BATCH_MAX_INSTANCES", 500))
+BATCH_MAX_UNION = int(os.environ.get("BATCH_MAX_UNION", 400))  # birleşim matrisi nokta sınırı
+SHARED_FIELDS = ("method", "improve", "geometry", "neighbors", "time_limit_ms", "warm_start", "reuse", "assignment")
+
+def parse_batch(data):
+    """Dönüş: örnek başına parse_request çıktısı ya da PlanError (toplu hata: PlanError)."""
+    instances = data.get("instances")
+    if not isinstance(instances, list) or not instances:
+        raise PlanError("instances boş olmayan bir list olmalı")
+    if len(instances) > BATCH_MAX_INSTANCES:
+        raise PlanError("en fazla %d örnek gönderilebilir" % BATCH_MAX_INSTANCES)
+    shared = {k: data[k] for k in SHARED_FIELDS if k in data}
+    reqs = []
+    for inst in instances:
+        if not isinstance(inst, dict):
+            reqs.append(PlanError("örnek bir nesne olmalı"))
+            continue
+        body = dict(shared, **inst)
+        body["workers"] = 1  # paralellik örnekler arasında
+        try:
+            reqs.append(parse_request(body))
+        except PlanError as e:
+            reqs.append(e)
+    return reqs
+
+def _chunks(reqs, idxs, limit=BATCH_MAX_UNION):
+    """Örnekleri, tekil koordinat birleşimi limit'i aşmayan parçalara böler."""
+    chunks, cur, keys = [], [], {}
+    for i in idxs:
+        coords = reqs[i]["depots"] + reqs[i]["stops"]
+        new = {coord_key(c): c for c in coords if coord_key(c) not in keys}
+        if cur and len(keys) + len(new) > limit:
+            chunks.append((cur, keys))
+            cur, keys = [], {}
+            new = {coord_key(c): c for c in coords}
+        cur.append(i)
+        keys.update(new)
+    if cur:
+        chunks.append((cur, keys))
+    return chunks
+
+def _solve_one(req, mat, prior):
+    """Havuz işçisi: (plan, None, kayıt) ya da (None, hata, kayıt)."""
+    with metrics.recording() as rec:
+        try:
+            plan, err = solve_plan(req, mat, prior, deadline_after(req["time_limit_ms"])), None
+        except PlanError as e:
+            plan, err = None, {"error": str(e)}
+        except Exception as e:
+            plan, err = None, {"error": "internal_error", "message": str(e)}
+    return plan, err, rec.snapshot()
+
+def run_batch(reqs, workers=None):
+    """parse_batch çıktısını çözer; giriş sırasıyla /solve yanıtları ya da hatalar."""
+    results = [None] * len(reqs)
+    valid = []
+    for i, req in enumerate(reqs):
+        if isinstance(req, PlanError):
+            results[i] = {"error": str(req)}
+        else:
+            valid.append(i)
+
+    for idxs, keys in _chunks(reqs, valid):
+        # 1) Birleşim matrisi (parça başına tek istek)
+        # alınamazsa yalnızca bu parçanın örnekleri hatalı döner
+        pos = {k: p for p, k in enumerate(keys)}
+        try:
+            with metrics.stage("matrix"):
+                union = as_matrix(cached_osrm_table(list(keys.values())))
+        except Exception as e:
+            for i in idxs:
+                results[i] = {"error": "matrix_error", "message": str(e)}
+            continue
+        tasks = []
+        for i in idxs:
+            ids = np.asarray([pos[coord_key(c)] for c in reqs[i]["depots"] + reqs[i]["stops"]], dtype=np.intp)
+            sub = np.ascontiguousarray(union[np.ix_(ids, ids)])
+            tasks.append((reqs[i], sub, prior_plan(reqs[i], sub)))
+
+        # 2-4b) havuzda; 5) biten örnek ana süreçte hemen tamamlanır
+        def done(k, out):
+            i, (plan, err, snap) = idxs[k], out
+            metrics.merge(snap)
+            if err is None:
+                try:
+                    results[i] = finish_plan(reqs[i], tasks[k][1], plan)
+                except Exception as e:
+                    err = {"error": "internal_error", "message": str(e)}
+            if err is not None:
+                results[i] = err
+
+        pool_map(_solve_one, tasks, workers, on_result=done)
+    return results
@@ -0,0 +1,60 @@
+# services/budget.py
+"""
+Duvar saati bütçeleri.
+
+Çözücüler time_limit_ms alır, deadline_after ile mutlak bir son ana
+çevirir ve döngülerinde time_up ile kontrol eder. Süre dolunca o ana
+kadarki en iyi çözüm döner (anytime). None = sınırsız.
+
+İptal: iş parçacığına set_cancel_check ile bir kontrol bağlanırsa time_up
+iptal edildiğinde de True döner; çözücüler böylece kendi döngülerinde
+(süre dolmuş gibi) durur. Aşamalar arasında check_cancelled kullanılır.
+"""
+import time
+import threading
+
+_local = threading.local()
+
+class Cancelled(Exception):
+    """İş iptal edildi."""
+
+def set_cancel_check(check):
+    """Bu iş parçacığı için iptal kontrolü (argümansız çağrılabilir); None: kaldır."""
+    _local.check = check
+
+def cancelled():
+    check = getattr(_local, "check", None)
+    return check is not None and bool(check())
+
+def check_cancelled():
+    if cancelled():
+        raise Cancelled()
+
+def deadline_after(time_limit_ms):
+    """time_limit_ms -> monotonic son an (saniye); None ise None."""
+    if time_limit_ms is None:
+        return None
+    return time.monotonic() + max(0.0, float(time_limit_ms)) / 1000.0
+
+def time_up(deadline):
+    return (deadline is not None and time.monotonic() >= deadline) or cancelled()
+
+def remaining_ms(deadline):
+    """Kalan süre (ms, >= 0); deadline None ise None."""
+    if deadline is None:
+        return None
+    return max(0.0, (deadline - time.monotonic()) * 1000.0)
+
+def split_budget(total_ms, sizes, workers=1):
+    """
+    total_ms'yi gruplara boyutlarıyla orantılı böler. Gruplar `workers`
+    paralel işçide koştuğundan toplam pay total_ms * min(workers, grup sayısı);
+    tek bir grubun payı total_ms'yi aşmaz.
+    """
+    if total_ms is None:
+        return [None] * len(sizes)
+    if not sizes:
+        return []
+    lanes = max(1, min(int(workers), len(sizes)))
+    weight = float(sum(sizes)) or float(len(sizes))
+    return [min(total_ms, total_ms * lanes * (s or 1) / weight) for s in sizes]
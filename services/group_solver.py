@@ -0,0 +1,75 @@
+# services/group_solver.py
+"""
+Tek bir alt-tur grubunun (tek depo, kapasiteye sığan duraklar) çözümü.
+
+Gruplar birbirinden bağımsızdır; bu fonksiyon hem istek iş parçacığında
+hem de süreç havuzundaki işçilerde (services/parallel.py) aynen çalışır.
+"""
+from services.alns_solver import alns_optimize
+from services.greedy_solver import greedy_optimize
+from services.aco_solver import aco_optimize, aco_mmas_optimize
+from services.ortools_solver import ortools_optimize
+from services.local_search import two_opt, three_opt
+from services.budget import deadline_after, remaining_ms
+from services import metrics
+
+SOLVER_SHARE = 0.7  # local search istendiğinde bütçenin çözücüye ayrılan kısmı
+WARM_SHARE = 0.3    # warm_start="alns" için çözücü bütçesinden ayrılan kısım
+
+def solve_group(mat, method, depot_idx, grp, improve=None, neighbors=0, time_limit_ms=None,
+                warm_start=None, initial=None):
+    """
+    Dönüş: (seq, stats). seq grubun durak sırası; stats yalnızca ALNS için
+    operatör istatistikleri, diğer yöntemlerde None.
+    time_limit_ms: grubun toplam bütçesi; 2opt/3opt istenirse SOLVER_SHARE'i
+    çözücüye, kalanı local search'e gider.
+    OR-Tools için başlangıç çözümü: initial (önceki plandan sıra) varsa o,
+    yoksa warm_start ("greedy" | "alns") ile üretilen rota.
+    """
+    deadline = deadline_after(time_limit_ms)
+    limit = time_limit_ms
+    if limit is not None and improve in ("2opt", "3opt"):
+        limit = limit * SOLVER_SHARE
+    stats = None
+    with metrics.stage("solver"):
+        if method == "greedy":
+            sub_routes, _ = greedy_optimize(mat, [depot_idx], grp, time_limit_ms=limit)
+        elif method == "aco":
+            sub_routes, _ = aco_optimize(mat, [depot_idx], grp, time_limit_ms=limit)
+        elif method == "aco_mmas":
+            sub_routes, _ = aco_mmas_optimize(mat, [depot_idx], grp, time_limit_ms=limit)
+        elif method == "ortools":
+            solver_deadline = deadline_after(limit)
+            init = _warm_route(mat, depot_idx, grp, warm_start, initial, limit)
+            sub_routes, _ = ortools_optimize(mat, [depot_idx], grp, time_limit_ms=remaining_ms(solver_deadline),
+                                             initial_routes=init)
+        else:
+            stats = {}
+            sub_routes, _ = alns_optimize(mat, [depot_idx], grp, stats=stats, time_limit_ms=limit)
+
+    if stats:
+        metrics.count("solver_iterations", stats.get("iterations", 0), method=method)
+        metrics.count("solver_accepted", sum(s["accepted"] for s in stats.get("destroy", {}).values()),
+                      method=method)
+
+    seq = sub_routes[0] if sub_routes else []
+    seq = improve_seq(mat, depot_idx, seq, improve, neighbors, remaining_ms(deadline))
+    return seq, stats
+
+def improve_seq(mat, depot_idx, seq, improve, neighbors=0, time_limit_ms=None):
+    """Tek seferlik rota üzerinde 2opt/3opt (improve başka bir değerse aynen döner)."""
+    fn = {"2opt": two_opt, "3opt": three_opt}.get(improve)
+    if fn is None:
+        return seq
+    with metrics.stage("local_search"):
+        return fn([seq], mat, [depot_idx], neighbors=neighbors, time_limit_ms=time_limit_ms)[0]
+
+def _warm_route(mat, depot_idx, grp, warm_start, initial, limit):
+    if initial:
+        return [list(initial)]
+    if warm_start == "greedy":
+        return greedy_optimize(mat, [depot_idx], grp)[0]
+    if warm_start == "alns":
+        return alns_optimize(mat, [depot_idx], grp,
+                             time_limit_ms=None if limit is None else limit * WARM_SHARE)[0]
+    return None
@@ -0,0 +1,191 @@
+# services/inter_route.py
+"""
+Rotalar arası local search (makespan dengeleme).
+
+Hamleler, darboğaz aracın rotalarından diğer rotalara doğru aranır:
+- relocate : tek durağı başka rotaya taşı
+- or-opt   : 2..max_seg uzunlukta ardışık segmenti başka rotaya taşı
+- swap     : iki rotadan birer durağı değiştir
+- cross    : iki rotadan birer segmenti değiştir (cross-exchange)
+
+Rota maliyetleri, yükler ve araç toplamları ortak RoutePlan'de hamle başına
+artımlı güncellenir; darboğaz araç yığından bulunur.
+Her hamle araç kapasitesine (rota yükü) ve depo stoğuna (araç toplam yükü)
+göre kontrol edilir. Amaç: (makespan, toplam süre) sözlük sıralı.
+"""
+import numpy as np
+from services.matrix import as_matrix
+from services.solution import RoutePlan
+from services.budget import deadline_after, time_up
+
+def _eps(x):
+    return 1e-9 * max(1.0, abs(x))
+
+def _col(x):
+    return x[:, None]
+
+class _State(RoutePlan):
+    """Ortak rota planı + kapasite/stok sınırları."""
+
+    def __init__(self, routes, M, starts, owner, dem, caps, stock):
+        super().__init__(M, starts, routes, dem, owner)
+        self.M = M
+        self.caps = caps
+        self.stock = stock
+
+    def path(self, k):
+        """(p, F, Q): p=[start]+rota, F maliyet öneki, Q talep öneki (p üzerinde)."""
+        p, F = self.prefix(k)
+        return p, F, self.load_prefix(k)
+
+    def rest_max(self, oa, ob):
+        """oa ve ob dışındaki araçların en büyük toplamı."""
+        return self.makespan_without(oa, ob)
+
+def _pick(mk, tot, eps):
+    """Aday ızgarasından (makespan, toplam) sözlük sıralı en iyisinin düz indeksi."""
+    m = mk.min()
+    cand = np.flatnonzero(mk <= m + eps)
+    return int(cand[tot.ravel()[cand].argmin()])
+
+def _new_makespan(st, oa, ob, rest, dA, dB):
+    if oa == ob:
+        return np.maximum(rest, st.own_cost[oa] + dA + dB)
+    return np.maximum(np.maximum(rest, st.own_cost[oa] + dA), st.own_cost[ob] + dB)
+
+def _search_moves(st, a, max_seg, best):
+    """
+    a rotasından çıkan tüm hamleleri puanla; best = [mk, tot, move] yerinde güncellenir.
+    (l1, b, l2) sabitken segment başlangıçları i x j ızgarada vektörel değerlendirilir.
+    """
+    M = st.M
+    pA, FA, QA = st.path(a)
+    nA = len(pA) - 1
+    oa = st.owner[a]
+    total = st.total()
+    eps = _eps(best[0])
+    tol = 1e-9
+    c = _col
+    for l1 in range(1, min(max_seg, nA) + 1):
+        I = np.arange(0, nA - l1 + 1)
+        prevA, a0, al = pA[I], pA[I + 1], pA[I + l1]
+        hasA = I + l1 < nA
+        nextA = pA[np.minimum(I + l1 + 1, nA)]
+        segA = FA[I + l1] - FA[I + 1]
+        qA = QA[I + l1] - QA[I]
+        # segment çıkarılınca a'daki değişim (eksi işaretli)
+        remA = M[prevA, a0] + segA + np.where(hasA, M[al, nextA] - M[prevA, nextA], 0.0)
+        for b in range(len(st.routes)):
+            if b == a:
+                continue
+            ob = st.owner[b]
+            pB, FB, QB = st.path(b)
+            nB = len(pB) - 1
+            rest = st.rest_max(oa, ob)
+
+            # --- relocate / or-opt: segmenti b'de pB[j] ile pB[j+1] arasına taşı ---
+            ok = st.loads[b] + qA <= st.caps[b] + tol
+            if oa != ob:
+                ok &= st.own_load[ob] + qA <= st.stock[ob] + tol
+            if ok.any():
+                dB = M[pB[None, :], c(a0)] + c(segA)
+                if nB:
+                    dB[:, :-1] += M[c(al), pB[None, 1:]] - M[pB[:-1], pB[1:]][None, :]
+                dA = -c(remA)
+                new_mk = np.where(c(ok), _new_makespan(st, oa, ob, rest, dA, dB), np.inf)
+                k = _pick(new_mk, total + dA + dB, eps)
+                i, j = divmod(k, new_mk.shape[1])
+                if _better(new_mk[i, j], total - remA[i] + dB[i, j], best, eps):
+                    kind = "relocate" if l1 == 1 else "or_opt"
+                    best[:] = [float(new_mk[i, j]), float(total - remA[i] + dB[i, j]),
+                               (kind, a, int(I[i]), l1, b, j, 0)]
+
+            # --- swap / cross-exchange: segmentleri değiştir ---
+            for l2 in range(1, min(max_seg, nB) + 1):
+                J = np.arange(0, nB - l2 + 1)[None, :]
+                prevB, b0, bl = pB[J], pB[J + 1], pB[J + l2]
+                hasB = J + l2 < nB
+                nextB = pB[np.minimum(J + l2 + 1, nB)]
+                segB = FB[J + l2] - FB[J + 1]
+                qB = QB[J + l2] - QB[J]
+                dA = (M[c(prevA), b0] + segB - c(M[prevA, a0] + segA)
+                      + np.where(c(hasA), M[bl, c(nextA)] - c(M[al, nextA]), 0.0))
+                dB = (M[prevB, c(a0)] + c(segA) - M[prevB, b0] - segB
+                      + np.where(hasB, M[c(al), nextB] - M[bl, nextB], 0.0))
+                ok = (st.loads[a] - c(qA) + qB <= st.caps[a] + tol) & (st.loads[b] - qB + c(qA) <= st.caps[b] + tol)
+                if oa != ob:
+                    ok &= st.own_load[oa] - c(qA) + qB <= st.stock[oa] + tol
+                    ok &= st.own_load[ob] - qB + c(qA) <= st.stock[ob] + tol
+                if not ok.any():
+                    continue
+                new_mk = np.where(ok, _new_makespan(st, oa, ob, rest, dA, dB), np.inf)
+                new_tot = total + dA + dB
+                k = _pick(new_mk, new_tot, eps)
+                i, j = divmod(k, new_mk.shape[1])
+                if _better(new_mk[i, j], new_tot[i, j], best, eps):
+                    kind = "swap" if l1 == 1 and l2 == 1 else "cross"
+                    best[:] = [float(new_mk[i, j]), float(new_tot[i, j]),
+                               (kind, a, int(I[i]), l1, b, j, l2)]
+
+def _better(mk, tot, best, eps):
+    if mk < best[0] - eps:
+        return True
+    return mk <= best[0] + eps and tot < best[1] - eps
+
+def _apply(st, move):
+    kind, a, i, l1, b, j, l2 = move
+    A, B = st.routes[a], st.routes[b]
+    segA = A[i:i + l1]
+    if kind in ("relocate", "or_opt"):
+        newA = A[:i] + A[i + l1:]
+        newB = B[:j] + segA + B[j:]
+    else:
+        segB = B[j:j + l2]
+        newA = A[:i] + segB + A[i + l1:]
+        newB = B[:j] + segA + B[j + l2:]
+    st.set_route(a, newA)
+    st.set_route(b, newB)
+
+def inter_route_search(routes, matrix, start_idxs, route_owner=None, node_demand=None,
+                       route_caps=None, owner_stock=None, max_iter=200, max_seg=3, stats=None,
+                       time_limit_ms=None):
+    """
+    routes[k] rotası start_idxs[k]'dan başlar ve route_owner[k] aracına aittir
+    (aynı aracın alt-turları ardışık koşulur; araç süresi = rotalarının toplamı).
+    node_demand: global düğüm indeksine göre talep dizisi.
+    route_caps[k]: rotanın kapasitesi; owner_stock[o]: aracın deposundaki stok.
+    time_limit_ms dolunca o ana kadar uygulanmış hamlelerle döner.
+    Dönüş: yeni rota listesi (aynı sıra ve uzunlukta).
+    """
+    deadline = deadline_after(time_limit_ms)
+    M = as_matrix(matrix)
+    R = len(routes)
+    if R < 2:
+        return [list(r) for r in routes]
+    owner = list(range(R)) if route_owner is None else list(route_owner)
+    dem = np.zeros(M.shape[0]) if node_demand is None else np.asarray(node_demand, dtype=np.float64)
+    caps = [float("inf")] * R if route_caps is None else [float(c) for c in route_caps]
+    n_own = max(owner) + 1
+    stock = [float("inf")] * n_own if owner_stock is None else [float(s) for s in owner_stock]
+
+    st = _State(routes, M, start_idxs, owner, dem, caps, stock)
+    counts = {"relocate": 0, "or_opt": 0, "swap": 0, "cross": 0}
+    it = 0
+    while it < max_iter and not time_up(deadline):
+        it += 1
+        mk = st.makespan()
+        o_star = st.longest()
+        best = [mk, st.total(), None]
+        for a in range(R):
+            if st.owner[a] == o_star and st.routes[a]:
+                _search_moves(st, a, max_seg, best)
+        if best[2] is None:
+            break
+        _apply(st, best[2])
+        counts[best[2][0]] += 1
+
+    if stats is not None:
+        stats.update(counts)
+        stats["iterations"] = it
+        stats["makespan"] = st.makespan()
+    return st.routes
@@ -0,0 +1,201 @@
+# services/jobs.py
+"""
+Uzun süren çözümler için süreç içi iş kuyruğu (harici aracı yok).
+
+- Sınırlı kuyruk: bekleyen (iptal edilmemiş) iş sayısı JOB_QUEUE_SIZE'a
+  ulaşınca submit QueueFull yükseltir (HTTP 429, geri basınç). Kuyruktayken
+  iptal edilen iş hemen yer açar.
+- Sabit sayıda iş parçacığı işleri sırayla çalıştırır; istek iş parçacıkları
+  (/ping, hızlı greedy istekleri) bloklanmaz.
+- İptal işbirlikçidir: işin iptal olayı budget.set_cancel_check ile iş
+  parçacığına bağlanır; çözücüler time_up ile, aşamalar Cancelled ile durur.
+- Biten işler JOB_RETENTION adede kadar (en eskisi atılarak) saklanır.
+- Kapanış (drain): yeni iş alınmaz, bekleyenler iptal edilir, çalışan işe
+  süre tanınır; süre dolarsa o da iptal edilir.
+- Kuyruk süreç başınadır: çok süreçli sunucuda iş id'si yalnızca onu alan
+  süreçte bilinir.
+"""
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+
+from services.budget import Cancelled, set_cancel_check
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 16))
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 256))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class QueueFull(Exception):
+    """Kuyrukta yer yok."""
+
+class Job:
+    def __init__(self, fn, args):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.status = QUEUED
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = None
+        self.result = None
+        self.error = None
+
+    def emit(self, event, payload):
+        """run_plan ilerleme olayı: yalnızca özet (geometri saklanmaz)."""
+        self.progress = {"event": event}
+        for k in ("index", "total", "size", "stage", "makespan_matrix"):
+            if k in payload:
+                self.progress[k] = payload[k]
+
+    def to_dict(self):
+        out = {"id": self.id, "status": self.status, "created_at": self.created_at,
+               "started_at": self.started_at, "finished_at": self.finished_at}
+        if self.progress is not None:
+            out["progress"] = self.progress
+        if self.status == DONE:
+            out["result"] = self.result
+        elif self.error is not None:
+            out["error"] = self.error
+        return out
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, size=JOB_QUEUE_SIZE, retention=JOB_RETENTION):
+        self.retention = retention
+        self.size = size
+        self._queue = queue.Queue()  # iptal edilenler de işçi alana dek burada
+        self._pending = 0            # kuyruktaki QUEUED iş sayısı (kapasite buna göre)
+        self._jobs = OrderedDict()  # id -> Job (eklenme sırası)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._closed = False
+        for k in range(max(1, workers)):
+            threading.Thread(target=self._loop, name="job-worker-%d" % k, daemon=True).start()
+
+    def submit(self, fn, *args):
+        """fn(*args, emit=job.emit) kuyruğa alınır; dönüş Job. Kuyruk doluysa QueueFull."""
+        job = Job(fn, args)
+        with self._lock:
+            if self._closed or self._pending >= self.size:
+                raise QueueFull()
+            self._queue.put_nowait(job)
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Bekleyen iş hemen iptal edilir; çalışan işe iptal isteği gider (çözücü
+        bir sonraki kontrol noktasında durur). Bitmiş iş kayıttan silinir.
+        Dönüş: Job ya da None (bilinmeyen id).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in FINISHED:
+                del self._jobs[job_id]
+                return job
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self._dequeued(job, CANCELLED)
+            return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"queued": self._pending, "capacity": self.size, "jobs": counts}
+
+    def drain(self, timeout=None):
+        """
+        Kapanış: yeni iş reddedilir (QueueFull), bekleyenler iptal edilir,
+        çalışanlar timeout saniye beklenir; bitmezlerse iptal istenir.
+        Dönüş: süre içinde boşaldıysa True.
+        """
+        with self._lock:
+            self._closed = True
+            for job in self._jobs.values():
+                if job.status == QUEUED:
+                    job.cancel_event.set()
+                    self._dequeued(job, CANCELLED)
+            idle = self._idle.wait_for(lambda: not any(j.status == RUNNING for j in self._jobs.values()),
+                                       timeout)
+            if not idle:
+                for job in self._jobs.values():
+                    if job.status == RUNNING:
+                        job.cancel_event.set()
+            return idle
+
+    def _dequeued(self, job, status):
+        """QUEUED işi kuyruk sayımından düşer (kilit altında)."""
+        self._pending -= 1
+        job.status = status
+        if status == CANCELLED:
+            job.finished_at = time.time()
+            job.fn = job.args = None
+        else:
+            job.started_at = time.time()
+
+    def _trim(self):
+        """Saklama sınırını aşan en eski bitmiş işleri atar (kilit altında)."""
+        extra = len(self._jobs) - self.retention
+        if extra <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.status in FINISHED][:extra]:
+            del self._jobs[job_id]
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status != QUEUED:  # kuyruktayken iptal edildi
+                    continue
+                self._dequeued(job, RUNNING)
+            set_cancel_check(job.cancel_event.is_set)
+            try:
+                result, status, error = job.fn(*job.args, emit=job.emit), DONE, None
+            except Cancelled:
+                result, status, error = None, CANCELLED, None
+            except Exception as e:
+                result, status, error = None, FAILED, {"type": type(e).__name__, "message": str(e)}
+            finally:
+                set_cancel_check(None)
+            if status == DONE and job.cancel_event.is_set():
+                status = CANCELLED  # son aşamada iptal: sonuç eksik olabilir
+                result = None
+            with self._lock:
+                job.result, job.status, job.error = result, status, error
+                job.finished_at = time.time()
+                job.fn = job.args = None
+                self._trim()
+                self._idle.notify_all()
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+def get_job_queue():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue()
+        return _jobs
+
+def drain_job_queue(timeout=None):
+    """Kuyruk hiç kurulmadıysa bir şey yapmaz (kapanış kancaları için)."""
+    with _jobs_lock:
+        jobs = _jobs
+    return True if jobs is None else jobs.drain(timeout)
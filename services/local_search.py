@@ -1,122 +1,312 @@
 # services/local_search.py
-from copy import deepcopy
+"""
+Rota içi 2-opt / 3-opt (makespan odaklı).
 
-def route_cost(matrix, start_idx, stop_idxs):
-    """Tek bir aracın rota maliyeti (süre/mesafe matrisine göre)."""
-    if not stop_idxs:
-        return 0.0
-    c = matrix[start_idx][stop_idxs[0]]
-    for i in range(len(stop_idxs) - 1):
-        c += matrix[stop_idxs[i]][stop_idxs[i + 1]]
-    return float(c)
+Rotalar ortak RoutePlan'de tutulur: en uzun rota ve diğerlerinin en büyüğü
+yığından O(log V), önek toplamları (F ileri, Bk ters yön) rota değişene
+kadar önbellekte. Segment (x..y) ileri = F[y]-F[x], ters = Bk[y]-Bk[x].
+Kabul edilen hamlenin maliyeti deltadan bilinir; rota yeniden yürünmez.
+Puanlanan aday ve kabul edilen hamle sayıları metrics sayaçlarına yazılır.
+"""
+import numpy as np
+from services.matrix import as_matrix
+from services.neighbors import knn_index
+from services.solution import RoutePlan
+from services.budget import deadline_after, time_up
+from services import metrics
 
-def _route_costs(matrix, depot_idxs, routes):
-    return [route_cost(matrix, depot_idxs[v], routes[v]) for v in range(len(routes))]
+def _eps(mk):
+    """Kayan nokta gürültüsüyle sonsuz döngüye girmemek için eşik."""
+    return 1e-9 * max(1.0, abs(mk))
 
-def _makespan(costs):
-    return max(costs) if costs else 0.0
+def _longest(plan):
+    """(en uzun rota, makespan, diğer rotaların en büyüğü)."""
+    v = plan.longest()
+    return v, plan.makespan(), plan.makespan_without(v)
 
-def _accept_if_safe(old_costs, new_costs):
-    """Hamleyi sadece yeni makespan eski makespan'den küçükse kabul et."""
-    old_mk = _makespan(old_costs)
-    new_mk = _makespan(new_costs)
-    return new_mk < old_mk
+def _tally(kind, evals, moves):
+    metrics.count("local_search_evals", evals, kind=kind)
+    metrics.count("local_search_moves", moves, kind=kind)
+
+def _paths(plan, v):
+    p, F = plan.prefix(v)
+    return p, F, plan.reverse_prefix(v)
+
+def _neighbor_lists(matrix, start, r, k):
+    """
+    Rota düğümleri (depo dahil) arasında k-en yakın komşu listesi.
+    Dönüş: (row_of, nn) -> düğüm x'in komşuları nn[row_of[x]].
+    """
+    nodes = sorted(set(r) | {start})
+    nn = knn_index(matrix, k, nodes)
+    row_of = np.full(matrix.shape[0], -1, dtype=np.intp)
+    row_of[nodes] = np.arange(len(nodes))
+    return row_of, nn
+
+def _positions(matrix, p):
+    pos = np.full(matrix.shape[0], -1, dtype=np.intp)
+    pos[p] = np.arange(len(p))
+    return pos
 
 # -------- 2-OPT (global makespan odaklı) --------
-def two_opt(routes, matrix, depot_idxs, max_iter=200):
+def _two_opt_deltas(matrix, p, F, Bk, I, J):
     """
-    En uzun rota üzerinde 2-opt uygular.
-    Hamle, makespan'i küçültüyorsa kabul edilir. 
-    İyileşme yoksa durur.
+    r[i:j] tersine çevirme deltası (I, J dizileri, yayınlanabilir).
+    p = [start] + r üzerinde: kaldırılan (p_i,p_{i+1}), (p_j,p_{j+1});
+    eklenen (p_i,p_j), (p_{i+1},p_{j+1}); ters segment farkı önek toplamından.
     """
-    cur = deepcopy(routes)
-    it = 0
-    while it < max_iter:
+    pi, pi1, pj, pj1 = p[I], p[I + 1], p[J], p[J + 1]
+    return (matrix[pi, pj] + matrix[pi1, pj1] - matrix[pi, pi1] - matrix[pj, pj1]
+            + (Bk[J] - Bk[I + 1]) - (F[J] - F[I + 1]))
+
+def _best_two_opt(matrix, p, F, Bk):
+    """Tüm (i, j) çiftleri arasında en iyi 2-opt hamlesi: (delta, i, j, puanlanan)."""
+    n = len(p) - 1
+    I = np.arange(1, n - 1)[:, None]          # r indeksi i
+    J = np.arange(n)[None, :]                 # r indeksi j (segment r[i..j-1])
+    valid = (J >= I + 2) & (J <= n - 1)
+    delta = _two_opt_deltas(matrix, p, F, Bk, I, np.minimum(J, n - 1))
+    delta = np.where(valid, delta, np.inf)
+    b = int(delta.argmin())
+    bi, bj = divmod(b, delta.shape[1])
+    return float(delta[bi, bj]), bi + 1, bj, (n - 2) * (n - 3) // 2
+
+def _two_opt_nl(plan, matrix, max_iter, k, deadline=None):
+    """
+    Aday listeli 2-opt: yalnızca yeni kenarı k-en yakın komşuya giden hamleler.
+    Don't-look bitleri: iyileşme bulamayan düğüm, komşuluğu değişene kadar atlanır.
+    """
+    dont_look = set()
+    nbrs = {}
+    it = evals = moves = 0
+    while it < max_iter and not time_up(deadline):
         it += 1
-        if not cur:
+        v_long, base_mk, others = _longest(plan)
+        eps = _eps(base_mk)
+
+        r = plan.routes[v_long]
+        n = len(r)
+        if n < 4 or others >= base_mk - eps:
             break
+        if v_long not in nbrs:
+            nbrs[v_long] = _neighbor_lists(matrix, plan.starts[v_long], r, k)
+        row_of, nn = nbrs[v_long]
+        p, F, Bk = _paths(plan, v_long)
 
-        costs = _route_costs(matrix, depot_idxs, cur)
-        v_long = max(range(len(cur)), key=lambda v: costs[v]) if costs else 0
-        base_mk = _makespan(costs)
+        T = np.asarray([t for t in range(1, n + 1) if int(p[t]) not in dont_look], dtype=np.intp)
+        if len(T) == 0:
+            break
+        PC = _positions(matrix, p)[nn[row_of[p[T]]]]      # komşuların rotadaki konumu
+        TT = np.broadcast_to(T[:, None], PC.shape)
+        owner = np.broadcast_to(np.arange(len(T))[:, None], PC.shape)
+        # yeni kenar (a, c): a=p_i, c=p_j
+        m1 = (TT <= n - 2) & (PC >= TT + 2) & (PC <= n - 1)
+        # yeni kenar (c, a): c=p_{i+1}, a=p_{j+1}
+        m2 = (PC >= 2) & (PC + 1 <= TT - 1)
+        I = np.concatenate((TT[m1], PC[m2] - 1))
+        J = np.concatenate((PC[m1], TT[m2] - 1))
+        own = np.concatenate((owner[m1], owner[m2]))
 
-        r = cur[v_long]
-        if len(r) < 3:
-            break  # 2-opt için yeterli düğüm yok
+        best = np.full(len(T), np.inf)
+        evals += len(I)
+        if len(I):
+            d = _two_opt_deltas(matrix, p, F, Bk, I, J)
+            np.minimum.at(best, own, d)
+        # iyileşme bulamayan düğümlere don't-look biti
+        dont_look.update(p[T[best >= -eps]].tolist())
+        if not len(I) or d.min() >= -eps:
+            break
+        b = int(d.argmin())
+        i, j = int(I[b]), int(J[b])
+        for x in (p[i], p[i + 1], p[j], p[j + 1]):
+            dont_look.discard(int(x))
+        plan.set_route(v_long, r[:i] + r[i:j][::-1] + r[j:], plan.costs[v_long] + float(d[b]))
+        moves += 1
 
-        best_route = r
-        best_mk = base_mk
-        improved = False
+    _tally("2opt", evals, moves)
+    return plan.routes
 
-        for i in range(1, len(r) - 1):
-            for j in range(i + 1, len(r)):
-                if j - i == 1:
-                    continue
-                cand = r[:i] + r[i:j][::-1] + r[j:]
-                new_costs = costs[:]
-                new_costs[v_long] = route_cost(matrix, depot_idxs[v_long], cand)
+def two_opt(routes, matrix, depot_idxs, max_iter=200, neighbors=None, time_limit_ms=None):
+    """
+    En uzun rota üzerinde 2-opt uygular.
+    Hamle, makespan'i küçültüyorsa kabul edilir.
+    İyileşme yoksa ya da time_limit_ms dolunca durur.
+    Hamleler kenar farkıyla (O(1)) puanlanır; yalnızca kabul edilen hamle kurulur.
+    neighbors=K verilirse aday listeli + don't-look bitli arama yapılır.
+    """
+    matrix = as_matrix(matrix)
+    if not routes:
+        return []
+    plan = RoutePlan(matrix, depot_idxs, routes)
+    deadline = deadline_after(time_limit_ms)
+    if neighbors:
+        return _two_opt_nl(plan, matrix, max_iter, neighbors, deadline)
+    it = evals = moves = 0
+    while it < max_iter and not time_up(deadline):
+        it += 1
+        v_long, base_mk, others = _longest(plan)
 
-                if _accept_if_safe(costs, new_costs) and _makespan(new_costs) < best_mk:
-                    best_mk = _makespan(new_costs)
-                    best_route = cand
-                    improved = True
+        r = plan.routes[v_long]
+        if len(r) < 4:
+            break  # 2-opt için yeterli düğüm yok
 
-        if improved:
-            cur[v_long] = best_route
+        delta, i, j, ev = _best_two_opt(matrix, *_paths(plan, v_long))
+        evals += ev
+        new_cost = plan.costs[v_long] + delta
+        if max(others, new_cost) < base_mk - _eps(base_mk):
+            plan.set_route(v_long, r[:i] + r[i:j][::-1] + r[j:], new_cost)
+            moves += 1
         else:
             break
 
-    return cur
+    _tally("2opt", evals, moves)
+    return plan.routes
 
 # -------- 3-OPT (global makespan odaklı) --------
-def three_opt(routes, matrix, depot_idxs, max_iter=100):
+def _three_opt_deltas(matrix, p, F, Bk, i, n, J=None):
     """
-    En uzun rota üzerinde basit 3-opt uygular.
-    Hamle, makespan'i küçültüyorsa kabul edilir.
-    İyileşme yoksa durur.
+    Sabit i için tüm (j, k) çiftlerinde 5 yeniden bağlamanın deltası: (5, J, K).
+    p = [start] + r; A=r[:i], B=r[i:j], C=r[j:k], D=r[k:].
+    p üzerinde a=p_i, B=p_{i+1..j}, C=p_{j+1..k}, D0=p_{k+1}.
+    Izgara j = i+1.. (ya da verilen J), k = i+2.. ile başlar; geçersiz (k <= j) hücreler inf.
     """
-    cur = deepcopy(routes)
-    it = 0
-    while it < max_iter:
+    J = (np.arange(i + 1, n - 1) if J is None else np.asarray(J))[:, None]
+    K = np.arange(i + 2, n)[None, :]
+    valid = K >= J + 1
+    a, B0, Bl, C0, Cl, D0 = p[i], p[i + 1], p[J], p[J + 1], p[K], p[K + 1]
+    fB, rB = F[J] - F[i + 1], Bk[J] - Bk[i + 1]
+    fC, rC = F[K] - F[J + 1], Bk[K] - Bk[J + 1]
+    m = matrix
+    old = m[a, B0] + fB + m[Bl, C0] + fC + m[Cl, D0]
+    cands = np.stack([
+        m[a, Bl] + rB + m[B0, C0] + fC + m[Cl, D0],   # A B' C D
+        m[a, B0] + fB + m[Bl, Cl] + rC + m[C0, D0],   # A B C' D
+        m[a, C0] + fC + m[Cl, B0] + fB + m[Bl, D0],   # A C B D
+        m[a, Cl] + rC + m[C0, B0] + fB + m[Bl, D0],   # A C' B D
+        m[a, Bl] + rB + m[B0, Cl] + rC + m[C0, D0],   # A B' C' D
+    ]) - old
+    return np.where(valid, cands, np.inf)
+
+def _apply_three_opt(r, i, j, k, c):
+    A, B, C, D = r[:i], r[i:j], r[j:k], r[k:]
+    if c == 0:
+        return A + B[::-1] + C + D
+    if c == 1:
+        return A + B + C[::-1] + D
+    if c == 2:
+        return A + C + B + D
+    if c == 3:
+        return A + C[::-1] + B + D
+    return A + B[::-1] + C[::-1] + D
+
+def _best_three_opt(matrix, p, F, Bk, deadline=None):
+    """Dönüş: (delta, (i, j, k, c) ya da None, puanlanan ızgara hücresi)."""
+    n = len(p) - 1
+    best = (np.inf, None)
+    evals = 0
+    for i in range(0, n - 2):
+        if best[1] is not None and best[0] < 0 and time_up(deadline):
+            break
+        d = _three_opt_deltas(matrix, p, F, Bk, i, n)
+        evals += d.size
+        b = int(d.argmin())
+        if d.flat[b] < best[0]:
+            best = (float(d.flat[b]), (i,) + np.unravel_index(b, d.shape))
+    if best[1] is None:
+        return np.inf, None, evals
+    i, c, j, k = best[1]
+    return best[0], (i, i + 1 + int(j), i + 2 + int(k), int(c)), evals
+
+def _three_opt_nl(plan, matrix, max_iter, k, deadline=None):
+    """
+    Aday listeli 3-opt: a=p_i için j, a'nın komşusu B'nin sonu (p_j) ya da
+    C'nin başı (p_{j+1}) olacak şekilde seçilir; k ekseni vektörel taranır.
+    Don't-look bitleri 2-opt'taki gibi.
+    """
+    dont_look = set()
+    nbrs = {}
+    it = evals = moves = 0
+    while it < max_iter and not time_up(deadline):
         it += 1
-        if not cur:
+        v_long, base_mk, others = _longest(plan)
+        eps = _eps(base_mk)
+
+        r = plan.routes[v_long]
+        n = len(r)
+        if n < 4 or others >= base_mk - eps:
             break
+        if v_long not in nbrs:
+            nbrs[v_long] = _neighbor_lists(matrix, plan.starts[v_long], r, k)
+        row_of, nn = nbrs[v_long]
+        p, F, Bk = _paths(plan, v_long)
+        pos = _positions(matrix, p)
 
-        costs = _route_costs(matrix, depot_idxs, cur)
-        v_long = max(range(len(cur)), key=lambda v: costs[v]) if costs else 0
-        base_mk = _makespan(costs)
+        best, move = -eps, None
+        for i in range(0, n - 2):
+            if move is not None and time_up(deadline):
+                break
+            a = int(p[i])
+            if a in dont_look:
+                continue
+            pc = pos[nn[row_of[a]]]
+            J = np.unique(np.concatenate((pc, pc - 1)))
+            J = J[(J >= i + 1) & (J <= n - 2)]
+            if len(J):
+                d = _three_opt_deltas(matrix, p, F, Bk, i, n, J)
+                evals += d.size
+                b = int(d.argmin())
+                if d.flat[b] < best:
+                    c, jj, kk = np.unravel_index(b, d.shape)
+                    best, move = float(d.flat[b]), (i, int(J[jj]), i + 2 + int(kk), int(c))
+                    continue
+                if d.flat[b] < -eps:
+                    continue
+            dont_look.add(a)
+
+        if move is None:
+            break
+        i, j, kk, _ = move
+        for x in (p[i], p[i + 1], p[j], p[j + 1], p[kk], p[kk + 1]):
+            dont_look.discard(int(x))
+        plan.set_route(v_long, _apply_three_opt(r, *move), plan.costs[v_long] + best)
+        moves += 1
+
+    _tally("3opt", evals, moves)
+    return plan.routes
+
+def three_opt(routes, matrix, depot_idxs, max_iter=100, neighbors=None, time_limit_ms=None):
+    """
+    En uzun rota üzerinde basit 3-opt uygular.
+    Hamle, makespan'i küçültüyorsa kabul edilir.
+    İyileşme yoksa ya da time_limit_ms dolunca durur; süre tarama ortasında
+    dolarsa o ana kadar bulunan en iyi hamle uygulanır.
+    Segment yeniden bağlama deltaları önek toplamlarıyla hesaplanır.
+    neighbors=K verilirse aday listeli + don't-look bitli arama yapılır.
+    """
+    matrix = as_matrix(matrix)
+    if not routes:
+        return []
+    plan = RoutePlan(matrix, depot_idxs, routes)
+    deadline = deadline_after(time_limit_ms)
+    if neighbors:
+        return _three_opt_nl(plan, matrix, max_iter, neighbors, deadline)
+    it = evals = moves = 0
+    while it < max_iter and not time_up(deadline):
+        it += 1
+        v_long, base_mk, others = _longest(plan)
 
-        r = cur[v_long]
+        r = plan.routes[v_long]
         if len(r) < 4:
             break
 
-        best_route = r
-        best_mk = base_mk
-        improved = False
-
-        for i in range(0, len(r) - 2):
-            for j in range(i + 1, len(r) - 1):
-                for k in range(j + 1, len(r)):
-                    A, B, C, D = r[:i], r[i:j], r[j:k], r[k:]
-                    candidates = [
-                        A + B[::-1] + C + D,
-                        A + B + C[::-1] + D,
-                        A + C + B + D,
-                        A + C[::-1] + B + D,
-                        A + B[::-1] + C[::-1] + D,
-                    ]
-                    for cand in candidates:
-                        new_costs = costs[:]
-                        new_costs[v_long] = route_cost(matrix, depot_idxs[v_long], cand)
-
-                        if _accept_if_safe(costs, new_costs) and _makespan(new_costs) < best_mk:
-                            best_mk = _makespan(new_costs)
-                            best_route = cand
-                            improved = True
-
-        if improved:
-            cur[v_long] = best_route
+        delta, move, ev = _best_three_opt(matrix, *_paths(plan, v_long), deadline)
+        evals += ev
+        new_cost = plan.costs[v_long] + delta
+        if move is not None and max(others, new_cost) < base_mk - _eps(base_mk):
+            plan.set_route(v_long, _apply_three_opt(r, *move), new_cost)
+            moves += 1
         else:
             break
 
-    return cur
+    _tally("3opt", evals, moves)
+    return plan.routes
@@ -0,0 +1,62 @@
+# services/matrix.py
+"""
+Tüm çözücülerin paylaştığı matris tipi ve vektörel rota maliyeti çekirdeği.
+
+Matris bitişik (C-contiguous) bir NumPy dizisidir; rota maliyeti
+fancy-indexing ile kenarları toplar.
+"""
+import os
+import numpy as np
+
+MATRIX_DTYPE = np.dtype(os.environ.get("MATRIX_DTYPE", "float64"))
+
+def as_matrix(matrix, dtype=None):
+    """Liste-listesi ya da dizi -> bitişik NumPy matrisi. Zaten uygunsa kopyalamaz."""
+    dtype = MATRIX_DTYPE if dtype is None else np.dtype(dtype)
+    if isinstance(matrix, np.ndarray) and matrix.dtype == dtype and matrix.flags.c_contiguous:
+        return matrix
+    arr = np.ascontiguousarray(np.asarray(matrix, dtype=dtype))
+    if arr.ndim != 2 or arr.shape[0] != arr.shape[1]:
+        raise ValueError("matris kare olmalı")
+    if not np.isfinite(arr).all():
+        raise ValueError("matriste ulaşılamayan (null) çift var")
+    return arr
+
+def route_cost(matrix, start_idx, stop_idxs):
+    """Tek bir aracın rota maliyeti: start -> stop_idxs[0] -> ... (dönüş yok)."""
+    n = len(stop_idxs)
+    if n == 0:
+        return 0.0
+    seq = np.empty(n + 1, dtype=np.intp)
+    seq[0] = start_idx
+    seq[1:] = stop_idxs
+    return float(matrix[seq[:-1], seq[1:]].sum())
+
+def route_costs(matrix, start_idxs, routes):
+    """
+    Birçok rotanın maliyetini tek çağrıda hesaplar.
+    start_idxs[r] -> routes[r] rotası; dönüş: float dizisi (len(routes)).
+    """
+    R = len(routes)
+    lens = np.fromiter((len(r) for r in routes), dtype=np.intp, count=R)
+    total = int(lens.sum())
+    if total == 0:
+        return np.zeros(R)
+    # Her rota için [start, s0, s1, ...] dizilerini uç uca ekle
+    seqs = np.empty(total + R, dtype=np.intp)
+    heads = np.concatenate(([0], np.cumsum(lens + 1)[:-1]))
+    seqs[heads] = start_idxs
+    mask = np.ones(total + R, dtype=bool)
+    mask[heads] = False
+    seqs[mask] = np.fromiter((j for r in routes for j in r), dtype=np.intp, count=total)
+    # Ardışık çiftler; rota sınırını aşan çiftleri at
+    frm, to = seqs[:-1], seqs[1:]
+    owner = np.repeat(np.arange(R), lens + 1)[1:]
+    keep = mask[1:]
+    return np.bincount(owner[keep], weights=matrix[frm[keep], to[keep]], minlength=R)
+
+def makespan(matrix, start_idxs, routes):
+    """Amaç fonksiyonu: en uzun rota süresi."""
+    if not routes:
+        return 0.0
+    return float(route_costs(matrix, start_idxs, routes).max())
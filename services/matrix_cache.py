@@ -0,0 +1,361 @@
+# services/matrix_cache.py
+"""
+Koordinat çifti anahtarlı süre matrisi önbelleği (osrm_table önünde).
+
+Koordinatlar yuvarlanmış anahtarla tam sayı kimliğe çevrilir; süreler
+kaynak satırı başına NumPy blokları olarak tutulur (hedef kimlikleri sıralı,
+süreler ve zaman damgaları yanında). Bir n x n okuma n satır araması ve
+satır başına tek searchsorted'dır.
+
+İki katman:
+- bellek içi LRU (satır bazında; sınır çift sayısı, ama en az o anki isteğin
+  n x n'i: bir istek kendi satırlarını düşürmez)
+- disk (SQLite), süreç yeniden başlasa da korunur: satır parçaları (her
+  OSRM isteğinin satırları ayrı kayıt); okunurken birleştirilir, parça
+  sayısı DISK_MAX_FRAGMENTS'i aşan satır tek kayda sıkıştırılır
+
+Yalnızca eksik satır/sütunlar OSRM'den istenir ve yalnızca alınanlar yazılır.
+Matrisi zaten bilinen bir nokta kümesine eklenen noktalar için extend
+yalnızca yeni satır ve sütunlara bakar (eklenen nokta sayısıyla ölçeklenir).
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from services import osrm_service
+
+CACHE_PATH = os.environ.get(
+    "MATRIX_CACHE_PATH", os.path.join(tempfile.gettempdir(), "osrm_matrix_cache.sqlite3")
+)
+CACHE_TTL = float(os.environ.get("MATRIX_CACHE_TTL", 7 * 24 * 3600))  # saniye
+CACHE_MAX_PAIRS = int(os.environ.get("MATRIX_CACHE_MAX_PAIRS", 2_000_000))
+COORD_DIGITS = int(os.environ.get("MATRIX_CACHE_DIGITS", 5))
+DISK_MAX_FRAGMENTS = 8
+SQL_CHUNK = 500  # IN (...) başına parametre
+
+
+def coord_key(c, digits=COORD_DIGITS):
+    """[enlem, boylam] -> yuvarlanmış metin anahtar."""
+    return f"{round(float(c[0]), digits):.{digits}f},{round(float(c[1]), digits):.{digits}f}"
+
+
+def _durations(rows):
+    """osrm_table satırları -> float64 dizi (null -> nan; as_matrix reddeder)."""
+    return np.asarray(rows, dtype=np.float64).reshape(len(rows), -1)
+
+
+class _Row:
+    """Bir kaynağın bilinen hedefleri: ids (sıralı), dur, ts."""
+    __slots__ = ("ids", "dur", "ts")
+
+    def __init__(self, ids, dur, ts):
+        self.ids, self.dur, self.ts = ids, dur, ts
+
+    def get(self, q, now, ttl):
+        """q hedefleri için (süreler, bulundu maskesi)."""
+        if self.ids.size == 0:
+            return np.full(q.size, np.nan), np.zeros(q.size, dtype=bool)
+        p = np.searchsorted(self.ids, q)
+        p[p >= self.ids.size] = 0
+        ok = self.ids[p] == q
+        if ttl > 0:
+            ok &= now - self.ts[p] < ttl
+        return self.dur[p], ok
+
+    def merge(self, ids, dur, ts):
+        """Aynı hedefte en yeni değer kalır. Dönüş: eklenen girdi sayısı."""
+        n0 = self.ids.size
+        self.ids, self.dur, self.ts = _merged((self.ids, ids), (self.dur, dur), (self.ts, ts))
+        return self.ids.size - n0
+
+
+def _merged(ids, durs, tss):
+    ids, dur, ts = np.concatenate(ids), np.concatenate(durs), np.concatenate(tss)
+    order = np.lexsort((-ts, ids))  # kimliğe göre, eşitte en yeni önce
+    ids, dur, ts = ids[order], dur[order], ts[order]
+    first = np.ones(ids.size, dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    return ids[first], dur[first], ts[first]
+
+
+class MatrixCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_pairs=CACHE_MAX_PAIRS,
+                 digits=COORD_DIGITS, fetch=None):
+        self.ttl = ttl
+        self.max_pairs = max_pairs
+        self.digits = digits
+        # fetch(coords, sources=None, destinations=None) -> satır listesi
+        self._fetch = fetch or (lambda *a, **kw: osrm_service.osrm_table(*a, **kw))
+        self._ids = {}              # koordinat anahtarı -> kimlik
+        self._next_id = 0
+        self._rows = OrderedDict()  # kaynak kimliği -> _Row (LRU)
+        self._size = 0              # bellekteki çift sayısı
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS coords (key TEXT PRIMARY KEY, id INTEGER NOT NULL UNIQUE)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS frags ("
+                " src INTEGER NOT NULL, dst BLOB NOT NULL, dur BLOB NOT NULL, ts REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS frags_src ON frags (src)")
+            self._db.commit()
+            self._next_id = self._db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM coords").fetchone()[0]
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    # ---- kimlikler ----
+    def _intern(self, keys):
+        """Anahtarlar -> int64 kimlik dizisi (kilit altında; yeniler diske de yazılır)."""
+        unknown = [k for k in keys if k not in self._ids]
+        if unknown and self._db is not None:
+            for i in range(0, len(unknown), SQL_CHUNK):
+                part = unknown[i:i + SQL_CHUNK]
+                q = "SELECT key, id FROM coords WHERE key IN (%s)" % ",".join("?" * len(part))
+                self._ids.update(self._db.execute(q, part))
+            unknown = [k for k in unknown if k not in self._ids]
+        if unknown:
+            new = {k: self._next_id + i for i, k in enumerate(unknown)}
+            self._next_id += len(new)
+            self._ids.update(new)
+            if self._db is not None:
+                self._db.executemany("INSERT INTO coords (key, id) VALUES (?, ?)", new.items())
+                self._db.commit()
+        return np.fromiter((self._ids[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    # ---- katmanlar ----
+    def _read(self, ids, now):
+        """Bellekteki satırlardan ids x ids: (süreler, bulundu maskesi) (kilit altında)."""
+        n = ids.size
+        sub = np.full((n, n), np.nan)
+        ok = np.zeros((n, n), dtype=bool)
+        for i, a in enumerate(ids.tolist()):
+            row = self._rows.get(a)
+            if row is not None:
+                self._rows.move_to_end(a)
+                sub[i], ok[i] = row.get(ids, now, self.ttl)
+        return sub, ok
+
+    def _mem_put(self, src, ids, dur, ts):
+        row = self._rows.get(src)
+        if row is None:
+            self._rows[src] = _Row(ids.copy(), dur.copy(), ts)
+            self._size += ids.size
+        else:
+            self._size += row.merge(ids, dur, ts)
+            self._rows.move_to_end(src)
+
+    def _trim(self, keep):
+        """LRU satırları atar; sınır en az keep çift (o anki istek)."""
+        limit = max(self.max_pairs, keep)
+        while self._size > limit and self._rows:
+            self._size -= self._rows.popitem(last=False)[1].ids.size
+
+    def _disk_load(self, srcs, now):
+        """srcs satırlarının disk parçalarını belleğe birleştirir (kilit altında)."""
+        if self._db is None or not srcs:
+            return
+        frags = {}
+        for i in range(0, len(srcs), SQL_CHUNK):
+            part = srcs[i:i + SQL_CHUNK]
+            q = "SELECT src, dst, dur, ts FROM frags WHERE src IN (%s)" % ",".join("?" * len(part))
+            for src, dst, dur, ts in self._db.execute(q, part):
+                frags.setdefault(src, []).append((dst, dur, ts))
+        compact = []
+        for src, parts in frags.items():
+            ids = [np.frombuffer(d, dtype=np.int64) for d, _, _ in parts]
+            durs = [np.frombuffer(d, dtype=np.float64) for _, d, _ in parts]
+            tss = [np.full(x.size, t) for x, (_, _, t) in zip(ids, parts)]
+            ids, dur, ts = _merged(ids, durs, tss)
+            if self.ttl > 0:
+                fresh = now - ts < self.ttl
+                ids, dur, ts = ids[fresh], dur[fresh], ts[fresh]
+            self._mem_put(src, ids, dur, ts)
+            if len(parts) > DISK_MAX_FRAGMENTS:
+                compact.append((src, ids, dur, ts))
+        if compact:
+            self._db.executemany("DELETE FROM frags WHERE src = ?", [(src,) for src, *_ in compact])
+            # tek kayıt, en eski zaman damgasıyla (süresi erken dolabilir, geç değil)
+            rows = [(src, ids.tobytes(), dur.tobytes(), float(ts.min())) for src, ids, dur, ts in compact if ids.size]
+            self._db.executemany("INSERT INTO frags (src, dst, dur, ts) VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def _store(self, ids, blocks, ts, keep):
+        """
+        Alınan bloklar [(satır konumları, sütun konumları, süreler), ...] iki
+        katmana (kilit altında). Diske yalnızca bu bloklar yazılır.
+        """
+        disk = []
+        for S, D, vals in blocks:
+            dst = ids[D]
+            order = np.argsort(dst, kind="stable")
+            dst = dst[order]
+            dst_blob = dst.tobytes()
+            tsa = np.full(dst.size, ts)
+            for r, i in enumerate(S):
+                dur = np.ascontiguousarray(vals[r][order])
+                self._mem_put(int(ids[i]), dst, dur, tsa)
+                disk.append((int(ids[i]), dst_blob, dur.tobytes(), ts))
+        self._trim(keep)
+        if self._db is not None and disk:
+            self._db.executemany("INSERT INTO frags (src, dst, dur, ts) VALUES (?, ?, ?, ?)", disk)
+            self._db.commit()
+
+    # ---- ana giriş ----
+    def table(self, coords):
+        """
+        osrm_table ile aynı içerik: len(coords) x len(coords) float64 NumPy
+        matrisi (null süreler nan).
+        """
+        if not coords:
+            return np.empty((0, 0))
+        keys = [coord_key(c, self.digits) for c in coords]
+        first = {}
+        for c, k in zip(coords, keys):
+            first.setdefault(k, c)
+        uniq = list(first)
+        ucoords = list(first.values())
+        n = len(uniq)
+        now = time.time()
+
+        with self._lock:
+            ids = self._intern(uniq)
+            sub, ok = self._read(ids, now)
+            need = np.flatnonzero(~ok.all(axis=1))
+            if need.size and self._db is not None:
+                before = int(ok.sum())
+                self._disk_load(ids[need].tolist(), now)
+                for i in need.tolist():
+                    row = self._rows.get(int(ids[i]))
+                    if row is not None:
+                        sub[i], ok[i] = row.get(ids, now, self.ttl)
+                self.disk_hits += int(ok.sum()) - before
+            missing = n * n - int(ok.sum())
+            self.hits += n * n - missing
+            self.misses += missing
+            self._trim(n * n)
+
+        if missing:
+            self._fill_missing(ucoords, ids, sub, ok)
+
+        if n == len(keys):
+            return sub
+        pos = {k: i for i, k in enumerate(uniq)}
+        idx = np.fromiter((pos[k] for k in keys), dtype=np.intp, count=len(keys))
+        return np.ascontiguousarray(sub[np.ix_(idx, idx)])
+
+    def extend(self, mat, coords, new_coords):
+        """
+        mat (coords için bilinen matris) + new_coords -> (n+k) x (n+k) NumPy
+        matrisi. Yeni çiftler bellek katmanında yoksa OSRM'den iki istekle
+        (sources=yeni, destinations=yeni) alınır ve iki katmana yazılır.
+        """
+        n, k = len(coords), len(new_coords)
+        allc = list(coords) + list(new_coords)
+        out = np.empty((n + k, n + k), dtype=np.float64)
+        out[:n, :n] = mat
+        if k == 0:
+            return out
+        now = time.time()
+        new = np.arange(n, n + k)
+        with self._lock:
+            ids = self._intern([coord_key(c, self.digits) for c in allc])
+            rows, ok_r = np.full((k, n + k), np.nan), np.zeros((k, n + k), dtype=bool)
+            cols, ok_c = np.full((n + k, k), np.nan), np.zeros((n + k, k), dtype=bool)
+            for i, a in enumerate(ids.tolist()):
+                row = self._rows.get(a)
+                if row is None:
+                    continue
+                if i >= n:
+                    rows[i - n], ok_r[i - n] = row.get(ids, now, self.ttl)
+                cols[i], ok_c[i] = row.get(ids[new], now, self.ttl)
+            missing = ok_r.size + ok_c.size - int(ok_r.sum()) - int(ok_c.sum())
+            self.hits += ok_r.size + ok_c.size - missing
+            self.misses += missing
+        if missing:
+            rows = _durations(self._fetch(allc, sources=new.tolist()))
+            cols = _durations(self._fetch(allc, destinations=new.tolist()))
+            everything = np.arange(n + k)
+            with self._lock:
+                self.fetches += 2
+                self._store(ids, [(new, everything, rows), (everything, new, cols)], time.time(), 2 * k * (n + k))
+        out[n:, :] = rows
+        out[:, n:] = cols
+        return out
+
+    def _fill_missing(self, ucoords, ids, sub, ok):
+        n = ids.size
+        everything = np.arange(n)
+        blocks = []  # alınan bloklar: (satırlar, sütunlar, süreler)
+        calls = 0
+        # Yeni noktaların neredeyse tüm satır/sütunu eksiktir; bunları ayır.
+        miss = ~ok
+        P = np.flatnonzero(miss.sum(axis=1) + miss.sum(axis=0) > n)
+        if 2 * P.size >= n:
+            sub[:] = _durations(self._fetch(ucoords))
+            calls += 1
+            blocks.append((everything, everything, sub))
+        else:
+            if P.size:
+                rows = _durations(self._fetch(ucoords, sources=P.tolist()))
+                cols = _durations(self._fetch(ucoords, destinations=P.tolist()))
+                calls += 2
+                sub[P, :] = rows
+                sub[:, P] = cols
+                ok[P, :] = True
+                ok[:, P] = True
+                blocks += [(P, everything, rows), (everything, P, cols)]
+            # Süresi dolmuş dağınık çiftler: kalan satırları tek seferde iste
+            rest = np.flatnonzero(~ok.all(axis=1))
+            if rest.size:
+                rows = _durations(self._fetch(ucoords, sources=rest.tolist()))
+                calls += 1
+                sub[rest, :] = rows
+                blocks.append((rest, everything, rows))
+
+        with self._lock:
+            self.fetches += calls
+            self._store(ids, blocks, time.time(), n * n)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "fetches": self.fetches,
+                "mem_pairs": self._size,
+                "ttl": self.ttl,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._size = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM frags")
+                self._db.commit()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_matrix_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MatrixCache()
+        return _default_cache
+
+def cached_osrm_table(coords):
+    """osrm_table yerine geçer (NumPy matris döner); önbellekten okur, eksikleri OSRM'den tamamlar."""
+    return get_matrix_cache().table(coords)
@@ -0,0 +1,216 @@
+# services/metrics.py
+"""
+Aşama süreleri, sayaçlar ve isteğe bağlı profil.
+
+- stage(ad)      : bloğun süresi; istek kaydına ve süreç geneli özete
+- count(ad, n)   : sayaç (en fazla bir etiket: service=, method=, kind=, status=)
+- recording()    : iş parçacığına yeni istek kaydı bağlar (run_plan başına bir)
+- bind(fn)       : fn'yi çağıranın kaydıyla çalıştırır (iş parçacığı havuzları)
+- merge(snap)    : süreç havuzu işçisinden dönen kaydı ekler
+- render(gauges) : Prometheus metin biçimi (/alns/metrics)
+- profiling(on)  : cProfile; yalnızca istek iş parçacığı görülür
+
+Kayıt yoksa (ör. benchmark) stage/count yalnızca süreç geneline yazar.
+İşçilerdeki aşamalar gruplar boyunca toplanır; duvar süresini aşabilir.
+"""
+import os
+import time
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", 25))
+PREFIX = "alns_"
+
+_local = threading.local()
+_lock = threading.Lock()
+_counters = {}  # (ad, etiketler) -> değer
+_stages = {}    # aşama -> [saniye, adet]
+_profile_lock = threading.Lock()  # aynı anda tek profil (cProfile süreç geneli olabilir)
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+class Recorder:
+    """Tek isteğin aşama süreleri ve sayaçları (iş parçacıkları arasında paylaşılabilir)."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds, n=1):
+        with self._lock:
+            s = self.stages.setdefault(name, [0.0, 0])
+            s[0] += seconds
+            s[1] += n
+
+    def add(self, key, n):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def snapshot(self):
+        """Pickle edilebilir kopya (merge ile eklenir)."""
+        with self._lock:
+            return os.getpid(), {k: list(v) for k, v in self.stages.items()}, dict(self.counters)
+
+    def to_dict(self):
+        """Yanıttaki timings bloğu: stages_ms ve sayaçlar (etiketliler etiket değerine göre)."""
+        with self._lock:
+            counters = {}
+            for (name, labels), n in sorted(self.counters.items()):
+                if labels:
+                    counters.setdefault(name, {})[",".join(str(v) for _, v in labels)] = n
+                else:
+                    counters[name] = n
+            return {"stages_ms": {k: round(v[0] * 1000.0, 3) for k, v in self.stages.items()},
+                    "counters": counters}
+
+def current():
+    return getattr(_local, "rec", None)
+
+@contextmanager
+def recording():
+    prev = current()
+    rec = _local.rec = Recorder()
+    try:
+        yield rec
+    finally:
+        _local.rec = prev
+
+def bind(fn):
+    rec = current()
+
+    def run(*args, **kwargs):
+        prev = current()
+        _local.rec = rec
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.rec = prev
+    return run
+
+def _add_stage(name, seconds, n=1):
+    with _lock:
+        s = _stages.setdefault(name, [0.0, 0])
+        s[0] += seconds
+        s[1] += n
+
+def _add(key, n):
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+@contextmanager
+def stage(name):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t
+        _add_stage(name, dt)
+        rec = current()
+        if rec is not None:
+            rec.add_stage(name, dt)
+
+def count(name, n=1, **labels):
+    key = (name, _labels(labels))
+    _add(key, n)
+    rec = current()
+    if rec is not None:
+        rec.add(key, n)
+
+def merge(snap):
+    """
+    Recorder.snapshot çıktısını geçerli kayda ekler; başka süreçten geldiyse
+    süreç geneline de (aynı süreçte stage/count oraya zaten yazdı).
+    """
+    pid, stages, counters = snap
+    rec = current()
+    other = pid != os.getpid()
+    for name, (seconds, n) in stages.items():
+        if other:
+            _add_stage(name, seconds, n)
+        if rec is not None:
+            rec.add_stage(name, seconds, n)
+    for key, n in counters.items():
+        if other:
+            _add(key, n)
+        if rec is not None:
+            rec.add(key, n)
+
+# ---- Prometheus ----
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                          for k, v in labels) + "}"
+
+def render(gauges=()):
+    """gauges: [(ad, {etiket: değer}, sayı), ...] anlık değerler (önbellek, kuyruk)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        stages = sorted(_stages.items())
+    lines = []
+    typed = set()
+    for (name, labels), n in counters:
+        metric = PREFIX + name + "_total"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append("# TYPE %s counter" % metric)
+        lines.append("%s%s %s" % (metric, _fmt_labels(labels), n))
+    if stages:
+        lines.append("# TYPE %sstage_seconds summary" % PREFIX)
+        for name, (seconds, n) in stages:
+            lb = _fmt_labels((("stage", name),))
+            lines.append("%sstage_seconds_sum%s %.6f" % (PREFIX, lb, seconds))
+            lines.append("%sstage_seconds_count%s %d" % (PREFIX, lb, n))
+    for name, labels, value in gauges:
+        metric = PREFIX + name
+        if metric not in typed:
+            typed.add(metric)
+            lines.append("# TYPE %s gauge" % metric)
+        lines.append("%s%s %s" % (metric, _fmt_labels(_labels(labels)), value))
+    return "\n".join(lines) + "\n"
+
+# ---- Profil ----
+class Profile:
+    def __init__(self):
+        self.prof = cProfile.Profile()
+        self.error = None
+
+    def summary(self, top=PROFILE_TOP):
+        """Kümülatif süreye göre ilk `top` fonksiyon."""
+        if self.error is not None:
+            return {"error": self.error}
+        rows = []
+        for (path, line, func), (_, calls, tt, ct, _) in pstats.Stats(self.prof).stats.items():
+            rows.append({"function": "%s:%d(%s)" % (os.path.basename(path), line, func),
+                         "calls": calls, "tottime_ms": round(tt * 1000.0, 3), "cumtime_ms": round(ct * 1000.0, 3)})
+        rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+        return {"top": rows[:top]}
+
+@contextmanager
+def profiling(enabled):
+    """enabled ise Profile (başka profil sürüyorsa error alanlı), değilse None verir."""
+    if not enabled:
+        yield None
+        return
+    prof = Profile()
+    if not _profile_lock.acquire(blocking=False):
+        prof.error = "profiler meşgul"
+        yield prof
+        return
+    try:
+        try:
+            prof.prof.enable()
+        except ValueError as e:  # başka bir profil aracı etkin
+            prof.error = str(e)
+            yield prof
+            return
+        try:
+            yield prof
+        finally:
+            prof.prof.disable()
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,47 @@
+# services/neighbors.py
+"""
+K-en yakın komşu indeksi (aday listeleri).
+
+İndeks matris başına bir kez kurulur ve matris yaşadığı sürece
+çağrılar arasında paylaşılır. nodes verilirse yalnızca o düğümler
+arasındaki komşuluklar tutulur (ör. bir rotanın durakları).
+"""
+import weakref
+import numpy as np
+
+DEFAULT_K = 20
+
+_cache = {}  # (id(matrix), k, nodes) -> (weakref, indeks)
+
+def _build(matrix, k, nodes):
+    if nodes is None:
+        sub = matrix
+        ids = None
+    else:
+        ids = np.asarray(nodes, dtype=np.intp)
+        sub = matrix[np.ix_(ids, ids)]
+    n = sub.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.intp)
+    d = np.array(sub, dtype=np.float64)
+    np.fill_diagonal(d, np.inf)  # kendisi komşu değil
+    part = np.argpartition(d, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(d, part, axis=1).argsort(axis=1)
+    nn = np.take_along_axis(part, order, axis=1)
+    return nn if ids is None else ids[nn]
+
+def knn_index(matrix, k=DEFAULT_K, nodes=None):
+    """
+    Satır bazında (çıkış yönü) en yakın k komşu.
+    nodes=None: (n, k) global düğüm indeksleri.
+    nodes verilirse: (len(nodes), k); satır t, nodes[t] düğümüne aittir.
+    """
+    key = (id(matrix), k, None if nodes is None else tuple(nodes))
+    hit = _cache.get(key)
+    if hit is not None and hit[0]() is matrix:
+        return hit[1]
+    idx = _build(matrix, k, nodes)
+    # matris toplanınca girdiyi de at
+    _cache[key] = (weakref.ref(matrix, lambda _, key=key: _cache.pop(key, None)), idx)
+    return idx
@@ -1,45 +1,69 @@
 from typing import List, Tuple
+import numpy as np
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+from services.matrix import as_matrix, route_cost
+from services.budget import cancelled
+
+DEFAULT_TIME_LIMIT_MS = 10000
+
+def _solve(routing, params, initial=None):
+    """
+    initial: araç başına düğüm (manager node) listeleri. Geçerli bir atamaya
+    çevrilebilirse arama oradan başlar (sıcak başlangıç); değilse soğuk çözülür.
+    İş iptal edilirse arama bir sonraki çözümde bitirilir (o ana kadarki en iyi döner).
+    """
+    def on_solution():
+        if cancelled():
+            routing.solver().FinishCurrentSearch()
+    routing.AddAtSolutionCallback(on_solution)
+    if initial is not None:
+        routing.CloseModelWithParameters(params)
+        start = routing.ReadAssignmentFromRoutes(initial, True)
+        if start is not None:
+            return routing.SolveFromAssignmentWithParameters(start, params)
+    return routing.SolveWithParameters(params)
+
+def _stop_slots(stop_idxs, first):
+    """Matris indeksi -> model düğümleri; aynı indeksli (yinelenen koordinatlı) duraklar ayrı düğümdür."""
+    slots = {}
+    for k, j in enumerate(stop_idxs):
+        slots.setdefault(j, []).append(first + k)
+    for nodes in slots.values():
+        nodes.reverse()
+    return slots
+
+def _take(slots, seq):
+    """Başlangıç sırasını düğümlere çevirir: her indeks için sıradaki boş düğüm (yineleme yok)."""
+    return [slots[j].pop() for j in seq if slots.get(j)]
 
 def ortools_optimize(matrix: List[List[float]], depot_idxs: List[int], stop_idxs: List[int],
-                     demands: List[float]=None, vehicle_caps: List[float]=None) -> Tuple[List[List[int]], float]:
+                     demands: List[float]=None, vehicle_caps: List[float]=None,
+                     time_limit_ms: int=None, initial_routes: List[List[int]]=None) -> Tuple[List[List[int]], float]:
+    # initial_routes: başlangıç çözümü (global indeksli durak sırası); verilirse
+    # arama PATH_CHEAPEST_ARC yerine bu atamadan başlar.
     # Bu fonksiyon tek depo/tek araç listesi ile çağrılıyor: depot_idxs uzunluğu == 1 varsayımı
     num_vehicles = len(depot_idxs)
     if num_vehicles != 1:
         # mevcut çağrı kalıbında her alt-tur için tek araç geliyor
         pass
 
+    matrix = as_matrix(matrix)
     nodes = depot_idxs + stop_idxs
-    index_map = {n:i for i,n in enumerate(nodes)}
-    tm = [[matrix[a][b] for b in nodes] for a in nodes]
-
-    data = {
-        "time_matrix": tm,
-        "num_vehicles": 1,
-        "starts": [0],
-        "ends": [0],
-        "demands": [0.0] + [0.0 if demands is None else float(demands[i]) for i in range(len(stop_idxs))],
-        "vehicle_caps": [10**12 if vehicle_caps is None else float(vehicle_caps[0])],
-    }
-
-    manager = pywrapcp.RoutingIndexManager(len(data["time_matrix"]), data["num_vehicles"], data["starts"], data["ends"])
-    routing = pywrapcp.RoutingModel(manager)
+    ids = np.asarray(nodes, dtype=np.intp)
+    # tam sayı matris ve talep vektörü C++ tarafında: arama Python'a geri çağrı yapmaz
+    tm = np.rint(matrix[np.ix_(ids, ids)]).astype(np.int64)
+    dem = [0] + [0 if demands is None else int(demands[i]) for i in range(len(stop_idxs))]
+    cap = 10**12 if vehicle_caps is None else int(vehicle_caps[0])
 
-    def time_cb(from_index, to_index):
-        a = manager.IndexToNode(from_index); b = manager.IndexToNode(to_index)
-        return int(data["time_matrix"][a][b])
+    manager = pywrapcp.RoutingIndexManager(len(nodes), 1, [0], [0])
+    routing = pywrapcp.RoutingModel(manager)
 
-    tcb = routing.RegisterTransitCallback(time_cb)
+    tcb = routing.RegisterTransitMatrix(tm.tolist())
     routing.SetArcCostEvaluatorOfAllVehicles(tcb)
 
     # Kapasite boyutu
-    def demand_cb(index):
-        node = manager.IndexToNode(index)
-        return int(data["demands"][node])
-    dcb = routing.RegisterUnaryTransitCallback(demand_cb)
-    routing.AddDimensionWithVehicleCapacity(
-        dcb, 0, [int(data["vehicle_caps"][0])], True, "Capacity"
-    )
+    dcb = routing.RegisterUnaryTransitVector(dem)
+    routing.AddDimensionWithVehicleCapacity(dcb, 0, [cap], True, "Capacity")
 
     # Zaman boyutu ve makespan finalizer
     routing.AddDimension(tcb, 0, 10**12, True, "Time")
@@ -50,11 +74,16 @@ def ortools_optimize(matrix: List[List[float]], depot_idxs: List[int], stop_idxs
     params = pywrapcp.DefaultRoutingSearchParameters()
     params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
     params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-    params.time_limit.seconds = 10
+    # süre dolunca arama o ana kadarki en iyi çözümü döndürür
+    params.time_limit.FromMilliseconds(DEFAULT_TIME_LIMIT_MS if time_limit_ms is None
+                                       else max(1, int(time_limit_ms)))
 
-    sol = routing.SolveWithParameters(params)
+    sol = _solve(routing, params, None if not initial_routes else
+                 [_take(_stop_slots(stop_idxs, 1), initial_routes[0])])
     if not sol:
-        return [[]], 0.0
+        # süre ilk çözüme bile yetmedi: gelen sırayı koru
+        route = list(stop_idxs)
+        return [route], route_cost(matrix, depot_idxs[0], route)
 
     # çözümü topla
     route = []
@@ -67,9 +96,144 @@ def ortools_optimize(matrix: List[List[float]], depot_idxs: List[int], stop_idxs
         idx = sol.Value(routing.NextVar(idx))
 
     # makespan
-    def _rc(start_idx, seq):
-        if not seq: return 0.0
-        c = matrix[start_idx][seq[0]]
-        for i in range(len(seq)-1): c += matrix[seq[i]][seq[i+1]]
-        return float(c)
-    return [route], _rc(depot_idxs[0], route)
+    return [route], route_cost(matrix, depot_idxs[0], route)
+
+# -------- Tek modelde tüm filo (çok depolu, çok seferli) --------
+DEMAND_SCALE = 1000        # kesirli talepler tam sayıya ölçeklenir
+SPAN_COST_COEFFICIENT = 100
+
+def ortools_fleet_optimize(matrix, depot_idxs: List[int], stop_idxs: List[int], demands: List[float],
+                           vehicle_caps: List[float], depot_stock: List[float],
+                           time_limit_ms: int=None,
+                           initial_routes: List[List[List[int]]]=None) -> Tuple[List[List[List[int]]], float]:
+    """
+    Tüm araçlar tek RoutingModel'de: araç v, depot_idxs[v]'den başlar. Seferler
+    açıktır: depoya dönüş sayılmaz (yanıttaki makespan ile aynı amaç).
+    - Kapasite: rota boyunca yük <= vehicle_caps[v]. Araç, depoda yeniden
+      yükleme düğümlerinden (depo kopyaları, isteğe bağlı) geçerek yeni sefere
+      başlar; böylece araç süresi seferlerinin toplamıdır.
+    - Stok: aracın toplam teslimatı <= depot_stock[v] (sıfırlanmayan ikinci boyut).
+    - Amaç: global span (makespan) + toplam süre (eşitlik bozucu).
+    Geçiş maliyeti, önceden hesaplanmış tam sayı matristen (RegisterTransitMatrix).
+    initial_routes: araç başına sefer listeleri (dönüşle aynı biçim); verilirse
+    seferler yeniden yükleme düğümleriyle birleştirilip sıcak başlangıç yapılır.
+    Dönüş: (araç başına sefer listeleri [[seq, ...], ...], makespan) ya da
+    çözüm yoksa (None, inf).
+    """
+    matrix = as_matrix(matrix)
+    V, N = len(depot_idxs), len(stop_idxs)
+    dem = [int(round(float(d) * DEMAND_SCALE)) for d in demands]
+    caps = [int(round(float(c) * DEMAND_SCALE)) for c in vehicle_caps]
+    stock = [int(round(float(s) * DEMAND_SCALE)) for s in depot_stock]
+
+    # araç başına sefer sayısının üst sınırı - 1 kadar yeniden yükleme düğümü.
+    # Aracın taşıyabileceği yük: stoğa (en küçük talepler önce) sığan, araca
+    # tek tek sığan pozitif talepler. Kapasite bu yükü alıyorsa tek sefer;
+    # değilse en iyi bölmede en fazla bir sefer yarıdan az dolu olduğundan
+    # sefer <= ceil(2 * yük / kapasite) (talepler araca tam dolmasa da yeter),
+    # ve durak sayısını aşmaz.
+    positive = sorted(d for d in dem if d > 0)
+    reload_of = []  # yeniden yükleme düğümü -> araç
+    for v in range(V):
+        if caps[v] <= 0:
+            continue
+        served, load = 0, 0
+        for d in positive:
+            if load + d > stock[v]:
+                break
+            if d <= caps[v]:
+                served += 1
+                load += d
+        trips = 1 if load <= caps[v] else min(served, -(-2 * load // caps[v]))
+        reload_of.extend([v] * (trips - 1))
+
+    nodes = list(depot_idxs) + list(stop_idxs) + [depot_idxs[v] for v in reload_of]
+    first_reload = V + N
+    ids = np.asarray(nodes, dtype=np.intp)
+    tm = np.rint(matrix[np.ix_(ids, ids)]).astype(np.int64)
+    # açık seferler (route_cost, OSRM trip roundtrip=false gibi): bitişe ve
+    # yeniden yükleme düğümlerine (depoya dönüş) geçiş bedava
+    tm[:, :V] = 0
+    tm[:, first_reload:] = 0
+    horizon = int(tm.max()) * (len(nodes) + 1) + 1
+
+    manager = pywrapcp.RoutingIndexManager(len(nodes), V, list(range(V)), list(range(V)))
+    routing = pywrapcp.RoutingModel(manager)
+
+    transit = routing.RegisterTransitMatrix(tm.tolist())
+    routing.SetArcCostEvaluatorOfAllVehicles(transit)
+    routing.AddDimension(transit, 0, horizon, True, "Time")
+    routing.GetDimensionOrDie("Time").SetGlobalSpanCostCoefficient(SPAN_COST_COEFFICIENT)
+
+    # Kapasite: yeniden yükleme düğümünde yük, slack ile sıfırlanır
+    load = [0] * V + dem + [-caps[v] for v in reload_of]
+    lcb = routing.RegisterUnaryTransitVector(load)
+    routing.AddDimensionWithVehicleCapacity(lcb, max(caps, default=0), caps, True, "Capacity")
+    cap_dim = routing.GetDimensionOrDie("Capacity")
+
+    # Stok: teslim edilen toplam
+    scb = routing.RegisterUnaryTransitVector([0] * V + dem + [0] * len(reload_of))
+    routing.AddDimensionWithVehicleCapacity(scb, 0, stock, True, "Stock")
+
+    for node in range(V, len(nodes)):
+        idx = manager.NodeToIndex(node)
+        if node >= first_reload:
+            v = reload_of[node - first_reload]
+            routing.VehicleVar(idx).SetValues([-1, v])
+            routing.AddDisjunction([idx], 0)
+            cap_dim.SlackVar(idx).SetRange(0, caps[v])
+        else:
+            cap_dim.SlackVar(idx).SetValue(0)
+
+    params = pywrapcp.DefaultRoutingSearchParameters()
+    # yeniden yükleme düğümleriyle PATH_CHEAPEST_ARC çoğu zaman ilk çözümü bulamıyor
+    params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
+    params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    params.time_limit.FromMilliseconds(DEFAULT_TIME_LIMIT_MS if time_limit_ms is None
+                                       else max(1, int(time_limit_ms)))
+
+    sol = _solve(routing, params, _fleet_initial(initial_routes, V, N, reload_of, stop_idxs))
+    if not sol:
+        return None, float("inf")
+
+    groups = []
+    for v in range(V):
+        trips, cur = [], []
+        idx = sol.Value(routing.NextVar(routing.Start(v)))
+        while not routing.IsEnd(idx):
+            node = manager.IndexToNode(idx)
+            if node >= first_reload:
+                if cur:
+                    trips.append(cur)
+                cur = []
+            else:
+                cur.append(nodes[node])
+            idx = sol.Value(routing.NextVar(idx))
+        if cur:
+            trips.append(cur)
+        groups.append(trips)
+
+    mk = max((sum(route_cost(matrix, depot_idxs[v], seq) for seq in groups[v]) for v in range(V)), default=0.0)
+    return groups, mk
+
+def _fleet_initial(initial_routes, V, N, reload_of, stop_idxs):
+    """Sefer listelerini, araç başına yeniden yükleme düğümleriyle ayrılmış tek rotaya çevirir."""
+    if not initial_routes or len(initial_routes) != V:
+        return None
+    slots = _stop_slots(stop_idxs, V)
+    free = {}
+    for k, v in enumerate(reload_of):
+        free.setdefault(v, []).append(V + N + k)
+    out = []
+    for v, trips in enumerate(initial_routes):
+        trips = [_take(slots, seq) for seq in trips]
+        trips = [t for t in trips if t]
+        if len(trips) - 1 > len(free.get(v, [])):
+            return None  # yeterli yeniden yükleme düğümü yok
+        route = []
+        for t, seq in enumerate(trips):
+            if t:
+                route.append(free[v][t - 1])
+            route.extend(seq)
+        out.append(route)
+    return out
@@ -1,16 +1,129 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services import metrics
+
+OSRM_URL = os.environ.get("OSRM_URL", "https://router.project-osrm.org")
+OSRM_TABLE_TILE = int(os.environ.get("OSRM_TABLE_TILE", 100))    # sunucu max-table-size
+OSRM_MAX_WORKERS = int(os.environ.get("OSRM_MAX_WORKERS", 8))
+OSRM_TIMEOUT = float(os.environ.get("OSRM_TIMEOUT", 30))
+OSRM_RETRIES = int(os.environ.get("OSRM_RETRIES", 3))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Keep-alive bağlantı havuzlu ve yeniden denemeli ortak oturum."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=OSRM_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+            )
+            adapter = HTTPAdapter(pool_connections=OSRM_MAX_WORKERS, pool_maxsize=OSRM_MAX_WORKERS,
+                                  max_retries=retry)
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+def _count(service, r):
+    metrics.count("osrm_requests", service=service)
+    metrics.count("osrm_bytes", len(r.content), service=service)
 
-OSRM_URL = "https://router.project-osrm.org"
+def _coord_str(coords):
+    return ";".join([f"{c[1]},{c[0]}" for c in coords])
 
-def osrm_table(coords):
-    coord_str = ";".join([f"{c[1]},{c[0]}" for c in coords])
-    url = f"{OSRM_URL}/table/v1/driving/{coord_str}"
-    r = requests.get(url); r.raise_for_status()
+def _table_request(coords, sources=None, destinations=None):
+    url = f"{OSRM_URL}/table/v1/driving/{_coord_str(coords)}"
+    params = {}
+    if sources is not None:
+        params["sources"] = ";".join(str(i) for i in sources)
+    if destinations is not None:
+        params["destinations"] = ";".join(str(i) for i in destinations)
+    r = get_session().get(url, params=params or None, timeout=OSRM_TIMEOUT); r.raise_for_status()
+    _count("table", r)
     return r.json()["durations"]
 
+def _fetch_tile(coords, src, dst):
+    """src x dst bloğu; URL'ye yalnızca bloğun kendi koordinatları girer."""
+    local = list(dict.fromkeys(src + dst))
+    at = {g: i for i, g in enumerate(local)}
+    return _table_request(
+        [coords[g] for g in local],
+        sources=[at[g] for g in src],
+        destinations=[at[g] for g in dst],
+    )
+
+def osrm_table(coords, sources=None, destinations=None, tile=None, max_workers=None):
+    """
+    OSRM table servisi. sources/destinations verilirse yalnızca o satır/sütunlar
+    döner (len(sources) x len(destinations)).
+
+    Büyük istekler tile x tile bloklara bölünür, bloklar paralel çekilip
+    tek bir matriste birleştirilir.
+    """
+    tile = tile or OSRM_TABLE_TILE
+    src = list(range(len(coords))) if sources is None else list(sources)
+    dst = list(range(len(coords))) if destinations is None else list(destinations)
+    if not src or not dst:
+        return [[] for _ in src]
+    if len(coords) <= tile:
+        return _table_request(coords, sources, destinations)
+
+    src_blocks = [src[i:i + tile] for i in range(0, len(src), tile)]
+    dst_blocks = [dst[i:i + tile] for i in range(0, len(dst), tile)]
+    jobs = [(bi, bj) for bi in range(len(src_blocks)) for bj in range(len(dst_blocks))]
+
+    out = [[None] * len(dst) for _ in src]
+    workers = max(1, min(max_workers or OSRM_MAX_WORKERS, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        blocks = ex.map(metrics.bind(lambda ij: _fetch_tile(coords, src_blocks[ij[0]], dst_blocks[ij[1]])), jobs)
+        for (bi, bj), block in zip(jobs, blocks):
+            r0, c0 = bi * tile, bj * tile
+            for r, row in enumerate(block):
+                out[r0 + r][c0:c0 + len(row)] = row
+    return out
+
 def osrm_trip(start, stops):
     coords = [start] + stops
-    coord_str = ";".join([f"{c[1]},{c[0]}" for c in coords])
+    coord_str = _coord_str(coords)
     url = f"{OSRM_URL}/trip/v1/driving/{coord_str}?source=first&roundtrip=false&overview=full&geometries=geojson"
-    r = requests.get(url); r.raise_for_status()
+    r = get_session().get(url, timeout=OSRM_TIMEOUT); r.raise_for_status()
+    _count("trip", r)
     return r.json()
+
+def osrm_trips(jobs, max_workers=None, on_result=None):
+    """
+    Birden çok trip isteğini ortak oturum üzerinden eşzamanlı gönderir.
+    jobs: [(start, stops), ...] -> aynı sırada trip yanıtları.
+    on_result(i, yanıt): her yanıt gelir gelmez (geliş sırasıyla) çağrılır.
+    """
+    if not jobs:
+        return []
+    workers = max(1, min(max_workers or OSRM_MAX_WORKERS, len(jobs)))
+    results = [None] * len(jobs)
+    if workers == 1:
+        for i, (start, stops) in enumerate(jobs):
+            results[i] = osrm_trip(start, stops)
+            if on_result is not None:
+                on_result(i, results[i])
+        return results
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        trip = metrics.bind(osrm_trip)
+        futs = {ex.submit(trip, *job): i for i, job in enumerate(jobs)}
+        for f in as_completed(futs):
+            i = futs[f]
+            results[i] = f.result()
+            if on_result is not None:
+                on_result(i, results[i])
+    return results
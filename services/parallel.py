@@ -0,0 +1,214 @@
+# services/parallel.py
+"""
+Bağımsız alt-tur gruplarının süreç havuzunda paralel çözümü.
+
+- Havuz kalıcıdır (spawn), ilk kullanımda kurulur ve istekler arasında paylaşılır.
+- Matris her görevde pickle edilmez: istek başına bir kez SharedMemory'e
+  kopyalanır, işçiler adıyla bağlanıp kopyasız okur.
+- Sonuçlar görev sırasıyla döner (deterministik sıra).
+- İstek başına işçi bütçesi: aynı anda en fazla `workers` görev havuzda.
+- İptal: çağıran iş parçacığı iptal edilirse (services/budget.py) paylaşılan
+  bellekteki bayrak kalkar; işçilerdeki çözücüler time_up ile durur.
+- İşçideki aşama süreleri ve sayaçlar sonuçla döner, çağıranın kaydına eklenir.
+- SOLVER_ISOLATE=1: tek görev de havuzda çözülür; istek iş parçacıkları
+  GIL'i çözücüyle paylaşmaz (/ping ve diğer istekler yanıt vermeye devam eder).
+  inline=True (profil) ve havuz işçilerinin kendi çağrıları yine yerinde koşar.
+- CPU yuvaları: aynı anda en fazla SOLVE_SLOTS çözüm (cpu_slot); fazlası
+  SOLVE_SLOT_WAIT_S kadar bekler, sonra Busy (HTTP 503).
+"""
+import os
+import atexit
+import threading
+from contextlib import contextmanager
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+import numpy as np
+
+from services.group_solver import solve_group
+from services.budget import cancelled, check_cancelled, set_cancel_check
+from services import metrics
+
+POOL_SIZE = int(os.getenv("SOLVER_POOL_SIZE", str(os.cpu_count() or 1)))
+MAX_WORKERS_PER_REQUEST = int(os.getenv("SOLVER_MAX_WORKERS_PER_REQUEST", str(POOL_SIZE)))
+CANCEL_POLL_S = 0.2  # havuz beklerken iptal kontrol aralığı
+SOLVER_ISOLATE = os.getenv("SOLVER_ISOLATE", "0") == "1"
+SOLVE_SLOTS = int(os.getenv("SOLVE_SLOTS", str(POOL_SIZE)))
+SOLVE_SLOT_WAIT_S = float(os.getenv("SOLVE_SLOT_WAIT_S", 30))
+
+_slots = threading.BoundedSemaphore(max(1, SOLVE_SLOTS))
+
+class Busy(Exception):
+    """Boş çözüm yuvası yok."""
+
+def acquire_slot(timeout=SOLVE_SLOT_WAIT_S):
+    """Çözüm yuvası alır (timeout=None: süresiz bekler); alınamazsa Busy."""
+    if not _slots.acquire(timeout=timeout):
+        raise Busy()
+
+def release_slot():
+    _slots.release()
+
+@contextmanager
+def cpu_slot(timeout=SOLVE_SLOT_WAIT_S):
+    acquire_slot(timeout)
+    try:
+        yield
+    finally:
+        release_slot()
+
+@contextmanager
+def cancellable_slot(poll=CANCEL_POLL_S):
+    """
+    Yuvayı süresiz bekler, her poll saniyede iptali denetler (kuyruk işleri);
+    yuva alınmadan ya da alındığı anda iptal edildiyse Cancelled.
+    """
+    while not _slots.acquire(timeout=poll):
+        check_cancelled()
+    try:
+        check_cancelled()
+        yield
+    finally:
+        release_slot()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Süreç havuzu (tekil, tembel kurulum)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_SIZE, mp_context=mp.get_context("spawn"))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_pool)
+
+def worker_budget(requested=None):
+    """İstenen işçi sayısını [1, MAX_WORKERS_PER_REQUEST] aralığına sıkıştırır."""
+    cap = max(1, min(MAX_WORKERS_PER_REQUEST, POOL_SIZE))
+    if requested is None:
+        return cap
+    return max(1, min(int(requested), cap))
+
+class SharedMatrix:
+    """
+    Matrisin SharedMemory kopyası; with bloğu bitince serbest bırakılır.
+    Matristen sonraki tek bayt iptal bayrağıdır.
+    """
+
+    def __init__(self, mat):
+        mat = np.ascontiguousarray(mat)
+        self._shm = shared_memory.SharedMemory(create=True, size=mat.nbytes + 1)
+        np.ndarray(mat.shape, dtype=mat.dtype, buffer=self._shm.buf)[...] = mat
+        self._flag = mat.nbytes
+        self._shm.buf[self._flag] = 0
+        self.handle = (self._shm.name, mat.shape, mat.dtype.str)
+
+    def cancel(self):
+        self._shm.buf[self._flag] = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._shm.close()
+        self._shm.unlink()
+
+def _run(handle, args):
+    """İşçi tarafı: paylaşılan matrise bağlan, grubu çöz, bağlantıyı kapat. Dönüş: (sonuç, kayıt)."""
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        mat = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        mat.flags.writeable = False
+        flag = mat.nbytes
+        set_cancel_check(lambda: shm.buf[flag] != 0)
+        with metrics.recording() as rec:
+            out = solve_group(mat, *args)
+        del mat
+        return out, rec.snapshot()
+    finally:
+        set_cancel_check(None)
+        shm.close()
+
+def _use_pool(w, n, inline):
+    """Havuz mu? Havuz işçisi içinden (ör. /solve_batch örneği) iç içe havuz kurulmaz."""
+    if n == 0 or inline or mp.parent_process() is not None:
+        return False
+    return SOLVER_ISOLATE or (w > 1 and n > 1)
+
+def solve_groups(mat, tasks, workers=None, on_result=None, inline=False):
+    """
+    tasks: solve_group'un konumsal argümanları (mat hariç).
+    Dönüş: aynı sırada [(seq, stats), ...].
+    on_result(i, sonuç): her grup biter bitmez (bitiş sırasıyla) çağrılır.
+    Tek görev ya da tek işçide havuz kullanılmaz (kopyalama maliyeti yok);
+    SOLVER_ISOLATE ile kullanılır. inline=True: her zaman çağıran iş
+    parçacığında (profil için).
+    """
+    w = worker_budget(workers)
+    if not _use_pool(w, len(tasks), inline):
+        return _inline(solve_group, [(mat,) + tuple(t) for t in tasks], on_result)
+    def done(i, out):
+        metrics.merge(out[1])
+        if on_result is not None:
+            on_result(i, out[0])
+
+    with SharedMatrix(mat) as shm:
+        return [out for out, _ in _window(_run, [(shm.handle, t) for t in tasks], w, done, shm.cancel)]
+
+def pool_map(fn, tasks, workers=None, on_result=None, inline=False):
+    """
+    fn(*t) her görev için (fn ve argümanlar pickle edilebilir olmalı);
+    solve_groups ile aynı kurallar: sıra korunur, tek işçide havuz yok.
+    """
+    w = worker_budget(workers)
+    if not _use_pool(w, len(tasks), inline):
+        return _inline(fn, tasks, on_result)
+    return _window(fn, tasks, w, on_result)
+
+def _inline(fn, tasks, on_result):
+    results = []
+    for i, t in enumerate(tasks):
+        results.append(fn(*t))
+        if on_result is not None:
+            on_result(i, results[-1])
+    return results
+
+def _window(fn, tasks, w, on_result, on_cancel=None):
+    """Havuzda aynı anda en fazla w görev; biten yerine sıradaki gönderilir."""
+    results = [None] * len(tasks)
+    pool = get_pool()
+    pending = {}
+    todo = iter(enumerate(tasks))
+    for i, t in todo:
+        pending[pool.submit(fn, *t)] = i
+        if len(pending) >= w:
+            break
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+            if on_cancel is not None and cancelled():
+                on_cancel()
+            for f in done:
+                i = pending.pop(f)
+                results[i] = f.result()
+                if on_result is not None:
+                    on_result(i, results[i])
+                nxt = next(todo, None)
+                if nxt is not None:
+                    pending[pool.submit(fn, *nxt[1])] = nxt[0]
+    except BaseException:
+        for f in pending:
+            f.cancel()
+        wait(pending)
+        raise
+    return results
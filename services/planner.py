@@ -0,0 +1,406 @@
+# services/planner.py
+"""
+/solve boru hattı (HTTP'den bağımsız).
+
+parse_request : istek gövdesini doğrular, varsayılanları doldurur (PlanError)
+run_plan      : 1) matris  2) depo ataması  3) kapasite grupları
+                4) grup çözümü  4b) rotalar arası  5) OSRM trip + metrikler
+solve_plan    : 2-4b (yalnızca matris; toplu çözümde süreç havuzunda koşar)
+finish_plan   : 5
+
+emit(olay, veri) verilirse ara sonuçlar oluştukça bildirilir:
+  matrix   : matris hazır
+  group    : bir grup (sefer) çözüldü
+  makespan : çözüm/iyileştirme sonrası matris makespan'i
+  trip     : bir seferin OSRM geometrisi geldi
+
+İş kuyruğundan (services/jobs.py) çalışırken iptal, çözücülerde time_up ile,
+aşamalar arasında check_cancelled (Cancelled) ile işlenir.
+
+Aşama süreleri ve sayaçlar services/metrics.py'ye yazılır; timings=true ise
+yanıtta "timings", profile=true ise "profile" (cProfile özeti) döner.
+"""
+from math import isfinite
+
+from services.osrm_service import osrm_trips
+from services.matrix_cache import cached_osrm_table
+from services.alns_operators import merge_stats
+from services.inter_route import inter_route_search
+from services.matrix import as_matrix, route_cost
+from services.parallel import solve_groups, worker_budget
+from services.group_solver import improve_seq
+from services.ortools_solver import ortools_fleet_optimize
+from services.solution_store import get_solution_store, project
+from services.assignment import ASSIGNMENTS, assign_stops, nn_order
+from services.budget import Cancelled, deadline_after, remaining_ms, split_budget, check_cancelled
+from services import metrics
+
+# time_limit_ms verilirse kalan sürenin çözüm aşamalarına ayrılan payı;
+# geri kalanı OSRM trip ve yanıt için ayrılır
+GROUP_SHARE = 0.9
+INTER_GROUP_SHARE = 0.6
+WARM_SHARE = 0.3  # ortools_fleet: başlangıç çözümüne ayrılan pay
+# auto: grup bazlı ortools greedy'den başlar; ortools_fleet yalnızca kayıtlı
+# plandan (boru hattı ataması filo modelinde çoğu zaman daha kötü havza)
+WARM_STARTS = ("auto", "greedy", "alns", "none")
+
+class PlanError(Exception):
+    """İstemci hatası (HTTP 400): mesaj yanıtta "error" alanına yazılır."""
+
+# ---- Yardımcılar ----
+def _ok_point(p):
+    return (
+        isinstance(p, (list, tuple))
+        and len(p) == 2
+        and isinstance(p[0], (int, float))
+        and isinstance(p[1], (int, float))
+    )
+
+def _ok_num(x):
+    return isinstance(x, (int, float)) and isfinite(x)
+
+def _makespan_by_vehicle(trips_json):
+    """Aynı araç birden çok alt-trip yapabilir. Araç sürelerini topla, sonra maksimumu al."""
+    if not trips_json:
+        return 0
+    per = {}
+    for t in trips_json:
+        v = int(t["vehicle"])
+        dur = t["trip"]["trips"][0]["duration"]
+        per[v] = per.get(v, 0) + dur
+    return max(per.values()) if per else 0
+
+def _totals_from_trips(trips_json):
+    if not trips_json:
+        return {"duration": 0, "distance": 0}
+    return {
+        "duration": sum(t["trip"]["trips"][0]["duration"] for t in trips_json),
+        "distance": sum(t["trip"]["trips"][0]["distance"] for t in trips_json),
+    }
+
+def _plan_groups(mat, depot_idxs, stop_idxs, demands, depot_stock, vehicle_caps,
+                 method, improve, neighbors, workers, stage_ms, alns_stats,
+                 warm_start=None, prior_order=None, on_group=None, assignment="nearest",
+                 inline=False):
+    """
+    2) stoğa saygılı depo ataması, 3) kapasiteye göre alt-turlar,
+    4) grupların (paralel) çözümü. Dönüş: (assign, groups_by_vehicle) ya da
+    stok yetersizse None. on_group(v, seq, i, toplam): grup bitince.
+    inline: gruplar süreç havuzu yerine çağıran iş parçacığında (profil).
+    """
+    V = len(depot_idxs)
+    # 2) Talep–stok uyumlu depo ataması
+    with metrics.stage("assign"):
+        assign = assign_stops(mat, depot_idxs, stop_idxs, demands, depot_stock, assignment)
+    if assign is None:
+        return None
+
+    # 3) Depo başına kapasiteye göre alt-turlar
+    routed_groups = []  # (vehicle_index, [global_stop_idx,...])
+    with metrics.stage("split"):
+        for v in range(V):
+            custs = assign[v]
+            cur_load = 0.0
+            cur_group = []
+            for j in nn_order(mat, depot_idxs[v], custs):
+                dem = demands[j - V]
+                if cur_group and cur_load + dem > vehicle_caps[v]:
+                    routed_groups.append((v, cur_group))
+                    cur_group, cur_load = [], 0.0
+                cur_group.append(j)
+                cur_load += dem
+            if cur_group:
+                routed_groups.append((v, cur_group))
+
+    # 4) Her grup için iç sıralama + local search (gruplar bağımsız: süreç havuzunda)
+    budgets = split_budget(stage_ms, [len(grp) for _, grp in routed_groups], worker_budget(workers))
+    tasks = []
+    for (v, grp), ms in zip(routed_groups, budgets):
+        initial = None
+        if prior_order is not None:
+            members = set(grp)
+            initial = [j for j in prior_order if j in members]
+        tasks.append((method, depot_idxs[v], grp, improve, neighbors, ms, warm_start, initial))
+
+    def done(i, result):
+        if on_group is not None:
+            on_group(routed_groups[i][0], result[0], i, len(tasks))
+
+    groups_by_vehicle = {v: [] for v in range(V)}  # v -> [seq1, seq2, ...]
+    with metrics.stage("groups"):
+        solved = solve_groups(mat, tasks, workers, on_result=done, inline=inline)
+    for (v, _), (seq, grp_stats) in zip(routed_groups, solved):
+        if grp_stats is not None:
+            merge_stats(alns_stats, grp_stats)
+        groups_by_vehicle[v].append(seq)
+    return assign, groups_by_vehicle
+
+def _vehicle_costs(mat, depot_idxs, groups_by_vehicle):
+    return [sum(route_cost(mat, depot_idxs[v], seq) for seq in groups_by_vehicle[v])
+            for v in range(len(depot_idxs))]
+
+# ---- İstek ----
+def parse_request(data):
+    """Gövdeyi doğrular; hatada PlanError. Dönüş: run_plan'e verilecek istek sözlüğü."""
+    depots = data.get("depots", [])
+    stops = data.get("stops", [])
+    demands = data.get("demands", [])
+    depot_stock = data.get("depot_stock", [])
+    vehicle_caps = data.get("vehicle_caps", [])
+    method = str(data.get("method", "alns")).lower()
+    improve = data.get("improve")  # "", None, "2opt", "3opt", "inter"
+    geometry = data.get("geometry", True) is not False  # False: OSRM trip çağrılmaz
+    neighbors = data.get("neighbors", 0)  # local search aday listesi (k, ör. 20); 0 = tam tarama
+    workers = data.get("workers")  # istek başına işçi bütçesi (None: sunucu üst sınırı)
+    time_limit_ms = data.get("time_limit_ms")  # istek süresi bütçesi (None: sınırsız)
+    warm_start = str(data.get("warm_start", "auto")).lower()  # OR-Tools başlangıcı
+    reuse = data.get("reuse", True) is not False  # önceki benzer plandan başla / planı sakla
+    profile = data.get("profile", False) is True  # cProfile özeti (çözücü istek iş parçacığında)
+    timings = profile or data.get("timings", False) is True  # aşama süreleri ve sayaçlar
+    assignment = str(data.get("assignment", "nearest")).lower()  # depo ataması
+
+    # --- doğrulamalar ---
+    if not isinstance(depots, list) or not isinstance(stops, list):
+        raise PlanError("depots ve stops list olmalı")
+    if len(depots) == 0:
+        raise PlanError("En az bir depo gerekir")
+    if not all(_ok_point(p) for p in depots):
+        raise PlanError("depots elemanları [enlem, boylam] olmalı")
+    if not all(_ok_point(p) for p in stops):
+        raise PlanError("stops elemanları [enlem, boylam] olmalı")
+
+    N, V = len(stops), len(depots)
+    if demands and len(demands) != N:
+        raise PlanError("demands uzunluğu stops ile aynı olmalı")
+    if depot_stock and len(depot_stock) != V:
+        raise PlanError("depot_stock uzunluğu depots ile aynı olmalı")
+    if vehicle_caps and len(vehicle_caps) != V:
+        raise PlanError("vehicle_caps uzunluğu depots ile aynı olmalı")
+
+    # varsayılanlar
+    if not demands:
+        demands = [1.0] * N
+    if not depot_stock:
+        depot_stock = [sum(demands)] * V
+    if not vehicle_caps:
+        vehicle_caps = [sum(demands)] * V
+
+    if any((not _ok_num(x) or x < 0) for x in demands + depot_stock + vehicle_caps):
+        raise PlanError("negatif olmayan sayısal değerler beklenir")
+    if neighbors is not None and (not isinstance(neighbors, int) or isinstance(neighbors, bool) or neighbors < 0):
+        raise PlanError("neighbors negatif olmayan tam sayı olmalı")
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 1):
+        raise PlanError("workers pozitif tam sayı olmalı")
+    if time_limit_ms is not None and (not _ok_num(time_limit_ms) or time_limit_ms <= 0):
+        raise PlanError("time_limit_ms pozitif sayı olmalı")
+    if warm_start not in WARM_STARTS:
+        raise PlanError("warm_start: " + " | ".join(WARM_STARTS))
+    if assignment not in ASSIGNMENTS:
+        raise PlanError("assignment: " + " | ".join(ASSIGNMENTS))
+    if profile:
+        workers = 1  # süreç havuzu işçileri profilde görünmez; solve_plan yerinde çözer
+
+    return {
+        "depots": depots, "stops": stops, "demands": demands, "depot_stock": depot_stock,
+        "vehicle_caps": vehicle_caps, "method": method, "improve": improve, "geometry": geometry,
+        "neighbors": neighbors, "workers": workers, "time_limit_ms": time_limit_ms,
+        "warm_start": warm_start, "reuse": reuse, "assignment": assignment,
+        "timings": timings, "profile": profile,
+    }
+
+# ---- Boru hattı ----
+def _noop(event, payload):
+    pass
+
+def run_plan(req, emit=None):
+    """parse_request çıktısını çözer; /solve yanıt sözlüğünü döner (hatada PlanError)."""
+    emit = emit or _noop
+    deadline = deadline_after(req["time_limit_ms"])
+    status = "failed"
+    with metrics.recording() as rec, metrics.profiling(req["profile"]) as prof:
+        try:
+            with metrics.stage("total"):
+                # 1) OSRM TABLE (önbellekli; yalnızca eksik satır/sütunlar istenir)
+                with metrics.stage("matrix"):
+                    mat = as_matrix(cached_osrm_table(req["depots"] + req["stops"]))
+                emit("matrix", {"size": len(mat)})
+                check_cancelled()
+
+                plan = solve_plan(req, mat, prior_plan(req, mat), deadline, emit)
+                resp = finish_plan(req, mat, plan, emit)
+            status = "ok"
+        except PlanError:
+            status = "rejected"
+            raise
+        except Cancelled:
+            status = "cancelled"
+            raise
+        finally:
+            metrics.count("plans", status=status)
+    if req["timings"]:
+        resp["timings"] = rec.to_dict()
+    if prof is not None:
+        resp["profile"] = prof.summary()
+    return resp
+
+def prior_plan(req, mat):
+    """Depodaki önceki benzer plan güncel duraklara izdüşürülür (yalnızca OR-Tools için)."""
+    if not req["reuse"] or req["method"] not in ("ortools", "ortools_fleet"):
+        return None
+    V = len(req["depots"])
+    hit = get_solution_store().lookup(req["depots"], req["stops"], V)
+    return None if hit is None else project(mat, list(range(V)), *hit)
+
+def solve_plan(req, mat, prior=None, deadline=None, emit=None):
+    """
+    2-4b) Atama, gruplar, çözüm ve rotalar arası iyileştirme. Yalnızca matrisle
+    çalışır (OSRM ve depo yok); süreç havuzunda da çağrılabilir.
+    Dönüş: {"assign", "groups_by_vehicle", "alns_stats"}.
+    """
+    emit = emit or _noop
+    depots, stops = req["depots"], req["stops"]
+    demands, depot_stock, vehicle_caps = req["demands"], req["depot_stock"], req["vehicle_caps"]
+    method, improve = req["method"], req["improve"]
+    neighbors, workers, warm_start = req["neighbors"], req["workers"], req["warm_start"]
+
+    N, V = len(stops), len(depots)
+    depot_idxs = list(range(V))
+    stop_idxs = [V + i for i in range(N)]
+
+    groups_by_vehicle = {v: [] for v in range(V)}  # v -> [seq1, seq2, ...]
+    alns_stats = {}
+    # süre bütçesi: kalan sürenin çözüm aşamasına ayrılan payı
+    stage_ms = remaining_ms(deadline)
+    if stage_ms is not None:
+        stage_ms *= INTER_GROUP_SHARE if improve == "inter" else GROUP_SHARE
+
+    def on_group(v, seq, i, total):
+        emit("group", {"vehicle": v, "seq": seq, "index": i, "total": total})
+
+    if method == "ortools_fleet":
+        # 2-4) Tek modelde tüm filo: atama, sefer bölme ve sıralama OR-Tools'ta
+        stage_deadline = deadline_after(stage_ms)
+        initial = prior
+        if initial is None and warm_start in ("greedy", "alns"):
+            # başlangıç: normal boru hattı warm_start yöntemiyle (bütçenin bir kısmı)
+            warm = _plan_groups(mat, depot_idxs, stop_idxs, demands, depot_stock, vehicle_caps,
+                                warm_start, None, neighbors, workers,
+                                None if stage_ms is None else stage_ms * WARM_SHARE, {},
+                                assignment=req["assignment"], inline=req["profile"])
+            if warm is not None:
+                initial = [warm[1][v] for v in range(V)]
+        with metrics.stage("fleet"):
+            fleet, _ = ortools_fleet_optimize(mat, depot_idxs, stop_idxs, demands, vehicle_caps,
+                                              depot_stock, time_limit_ms=remaining_ms(stage_deadline),
+                                              initial_routes=initial)
+        if fleet is None:
+            raise PlanError("ortools_fleet çözüm bulamadı (stok, kapasite ya da süre yetersiz)")
+        total = sum(len(trips) for trips in fleet)
+        for v in range(V):
+            for seq in fleet[v]:
+                seq = improve_seq(mat, depot_idxs[v], seq, improve, neighbors)
+                on_group(v, seq, sum(len(g) for g in groups_by_vehicle.values()), total)
+                groups_by_vehicle[v].append(seq)
+        assign = [[j for seq in groups_by_vehicle[v] for j in seq] for v in range(V)]
+    else:
+        prior_order = None if prior is None else [j for trips in prior for seq in trips for j in seq]
+        planned = _plan_groups(mat, depot_idxs, stop_idxs, demands, depot_stock, vehicle_caps,
+                               method, improve, neighbors, workers, stage_ms, alns_stats,
+                               warm_start={"auto": "greedy", "none": None}.get(warm_start, warm_start),
+                               prior_order=prior_order, on_group=on_group,
+                               assignment=req["assignment"], inline=req["profile"])
+        if planned is None:
+            raise PlanError("stok yetersiz. talepler depolara dağıtılamadı")
+        assign, groups_by_vehicle = planned
+    check_cancelled()
+    emit("makespan", {"stage": "groups",
+                      "makespan_matrix": max(_vehicle_costs(mat, depot_idxs, groups_by_vehicle), default=0)})
+
+    # 4b) Rotalar arası iyileştirme (darboğaz araçtan iş taşıma)
+    if improve == "inter":
+        flat = [(v, seq) for v in range(V) for seq in groups_by_vehicle[v]]
+        node_demand = [0.0] * V + [float(d) for d in demands]
+        with metrics.stage("inter"):
+            new_seqs = inter_route_search(
+                [seq for _, seq in flat], mat,
+                [depot_idxs[v] for v, _ in flat],
+                route_owner=[v for v, _ in flat],
+                node_demand=node_demand,
+                route_caps=[vehicle_caps[v] for v, _ in flat],
+                owner_stock=depot_stock,
+                time_limit_ms=None if deadline is None else remaining_ms(deadline) * GROUP_SHARE,
+            )
+        groups_by_vehicle = {v: [] for v in range(V)}
+        for (v, _), seq in zip(flat, new_seqs):
+            groups_by_vehicle[v].append(seq)
+        assign = [[j for seq in groups_by_vehicle[v] for j in seq] for v in range(V)]
+        emit("makespan", {"stage": "inter",
+                          "makespan_matrix": max(_vehicle_costs(mat, depot_idxs, groups_by_vehicle), default=0),
+                          "groups": {str(v): groups_by_vehicle[v] for v in range(V)}})
+        check_cancelled()
+    return {"assign": assign, "groups_by_vehicle": groups_by_vehicle, "alns_stats": alns_stats}
+
+def finish_plan(req, mat, plan, emit=None):
+    """5) OSRM trip geometrileri, metrikler, plan deposu; /solve yanıt sözlüğü."""
+    emit = emit or _noop
+    depots, stops, method, improve, geometry = (req["depots"], req["stops"], req["method"],
+                                                req["improve"], req["geometry"])
+    assign, groups_by_vehicle, alns_stats = plan["assign"], plan["groups_by_vehicle"], plan["alns_stats"]
+    V = len(depots)
+    all_coords = depots + stops
+    depot_idxs = list(range(V))
+
+    # 5) OSRM TRIP ve metrikler
+    final_routes = [[] for _ in range(V)]
+    trip_jobs, trip_vehicles = [], []
+    for v in range(V):
+        for seq in groups_by_vehicle[v]:
+            if not seq:
+                continue
+            final_routes[v].extend(seq)
+            if geometry:
+                trip_jobs.append((depots[v], [all_coords[j] for j in seq]))
+                trip_vehicles.append(v)
+
+    def on_trip(i, trip):
+        emit("trip", {"vehicle": trip_vehicles[i], "index": i, "total": len(trip_jobs), "trip": trip})
+
+    with metrics.stage("trips"):
+        base_trips = [
+            {"vehicle": v, "trip": t} for v, t in zip(trip_vehicles, osrm_trips(trip_jobs, on_result=on_trip))
+        ]
+
+    vehicle_costs = _vehicle_costs(mat, depot_idxs, groups_by_vehicle)
+    base_mk_matrix = max(vehicle_costs, default=0)
+    if geometry:
+        # Araç bazında toplam sürelerden makespan
+        base_mk_real = _makespan_by_vehicle(base_trips)
+        totals = _totals_from_trips(base_trips)
+    else:
+        # Geometri istenmedi: metrikler matristen
+        base_mk_real = base_mk_matrix
+        totals = {"duration": sum(vehicle_costs), "distance": None}
+
+    plan_id = None
+    if req["reuse"]:
+        plan_id = get_solution_store().put(depots, stops, groups_by_vehicle, V, req=req, mat=mat)
+
+    resp = {
+        "method": method,
+        "improve": improve,
+        "geometry": geometry,
+        "improve_accepted": True,
+        "routes": final_routes,
+        "assign": {str(v): assign[v] for v in range(V)},
+        "groups": {str(v): groups_by_vehicle[v] for v in range(V)},
+        "makespan_real": base_mk_real,
+        "makespan_matrix": base_mk_matrix,
+        "trips": base_trips,
+        "totals": totals,
+        "vehicle_caps": req["vehicle_caps"],
+    }
+    if plan_id is not None:
+        resp["plan_id"] = plan_id  # /reoptimize için
+    if alns_stats:
+        resp["alns_stats"] = alns_stats
+    return resp
@@ -0,0 +1,258 @@
+# services/reoptimize.py
+"""
+Çözülmüş plana artımlı değişiklik (/reoptimize): gün içinde eklenen ve
+iptal edilen duraklar.
+
+Gövde:
+  plan_id     : /solve yanıtındaki plan_id (plan deposunda)   -- ya da --
+  plan        : /solve gövdesi + yanıttaki "groups"
+  add         : [[enlem, boylam], ...] yeni duraklar
+  add_demands : yeni durakların talepleri (varsayılan 1)
+  remove      : iptal edilen duraklar: önceki plandaki durak indeksi (0..N-1)
+                ya da [enlem, boylam]
+  depot_stock, vehicle_caps : verilirse plandakilerin yerine (ör. gün içi
+                stok); verilmezse plandakiler, varsayılan (toplam talep)
+                değerler yeni toplamla
+  improve     : "2opt" (varsayılan) | "3opt" | "none"; neighbors,
+                time_limit_ms (varsayılan REOPT_TIME_LIMIT_MS), geometry,
+                reuse, timings /solve'daki gibi
+
+Adımlar (iş miktarı değişiklikle ölçeklenir):
+  1) matris: plan matrisi depodaysa yalnızca yeni durakların satır/sütunu
+     (MatrixCache.extend); değilse önbellekli tam tablo
+  2) iptal edilenler seferlerinden çıkarılır
+  3) yeni (ve plana girmemiş) duraklar kapasite ve stoğa uyan en ucuz
+     konuma eklenir; hiçbir sefere sığmazsa stoğu yeten en yakın depoya
+     yeni sefer açılır
+  4) yalnızca değişen seferlerde süre sınırlı 2opt/3opt
+  5) finish_plan (geometri yalnızca değişen seferler için)
+
+Yanıt /solve yanıtıdır; ek olarak yeni durak listesi (stops, demands),
+changed ([araç, sefer sırası]) ve yeni plan_id. Sıralar yeni stops'a göredir:
+korunan duraklar eski sırayla, ardından eklenenler.
+"""
+import os
+import numpy as np
+
+from services.matrix import as_matrix
+from services.matrix_cache import cached_osrm_table, coord_key, get_matrix_cache
+from services.osrm_service import osrm_trips
+from services.group_solver import improve_seq
+from services.solution_store import get_solution_store
+from services.budget import deadline_after, remaining_ms, split_budget
+from services.planner import PlanError, _ok_num, _ok_point, finish_plan, parse_request
+from services import metrics
+
+REOPT_TIME_LIMIT_MS = float(os.environ.get("REOPT_TIME_LIMIT_MS", 2000))
+IMPROVES = ("2opt", "3opt", "none")
+
+class PlanNotFound(PlanError):
+    """plan_id depoda yok (HTTP 404)."""
+
+def parse_reoptimize(data):
+    """Dönüş: (önceki plan isteği, önceki matris ya da None, seçenekler); hatada PlanError."""
+    if data.get("plan_id") is not None:
+        hit = get_solution_store().get(str(data["plan_id"]))
+        if hit is None:
+            raise PlanNotFound("plan bulunamadı: %s" % data["plan_id"])
+        record, mat = hit
+        base = parse_request(dict(record, reuse=False))
+        groups = record["groups"]
+    elif isinstance(data.get("plan"), dict):
+        mat = None
+        base = parse_request(dict(data["plan"], reuse=False))
+        groups = _parse_groups(data["plan"].get("groups"), len(base["depots"]), len(base["stops"]))
+    else:
+        raise PlanError("plan_id ya da plan gerekir")
+
+    add = data.get("add", [])
+    add_demands = data.get("add_demands", [])
+    remove = data.get("remove", [])
+    improve = str(data.get("improve", "2opt")).lower()
+    time_limit_ms = data.get("time_limit_ms", REOPT_TIME_LIMIT_MS)
+    neighbors = data.get("neighbors", 0)
+    if not isinstance(add, list) or not all(_ok_point(p) for p in add):
+        raise PlanError("add elemanları [enlem, boylam] olmalı")
+    if not isinstance(add_demands, list) or (add_demands and len(add_demands) != len(add)):
+        raise PlanError("add_demands uzunluğu add ile aynı olmalı")
+    if any(not _ok_num(x) or x < 0 for x in add_demands):
+        raise PlanError("negatif olmayan sayısal değerler beklenir")
+    if not isinstance(remove, list):
+        raise PlanError("remove list olmalı")
+    V, total = len(base["depots"]), sum(base["demands"])
+    new_total = total + sum(add_demands or [1.0] * len(add))
+    for key in ("depot_stock", "vehicle_caps"):
+        if key in data:
+            xs = data[key]
+            if not isinstance(xs, list) or len(xs) != V or any(not _ok_num(x) or x < 0 for x in xs):
+                raise PlanError("%s depots uzunluğunda negatif olmayan sayılar olmalı" % key)
+            base[key] = [float(x) for x in xs]
+        elif all(x == total for x in base[key]):
+            base[key] = [new_total] * V  # parse_request varsayılanı: toplam talep
+    if improve not in IMPROVES:
+        raise PlanError("improve: " + " | ".join(IMPROVES))
+    if not _ok_num(time_limit_ms) or time_limit_ms <= 0:
+        raise PlanError("time_limit_ms pozitif sayı olmalı")
+    if not isinstance(neighbors, int) or isinstance(neighbors, bool) or neighbors < 0:
+        raise PlanError("neighbors negatif olmayan tam sayı olmalı")
+
+    opts = {
+        "groups": groups,
+        "add": add,
+        "add_demands": [float(x) for x in add_demands] or [1.0] * len(add),
+        "remove": _removed(remove, base["stops"]),
+        "improve": None if improve == "none" else improve,
+        "neighbors": neighbors,
+        "time_limit_ms": time_limit_ms,
+        "geometry": data.get("geometry", True) is not False,
+        "reuse": data.get("reuse", True) is not False,
+        "timings": data.get("timings", False) is True,
+    }
+    return base, mat, opts
+
+def _parse_groups(groups, V, N):
+    """/solve yanıtındaki groups ({"v": [[...]]} ya da liste) -> araç başına seferler."""
+    if isinstance(groups, dict):
+        groups = [groups.get(str(v), []) for v in range(V)]
+    if not isinstance(groups, list) or len(groups) != V:
+        raise PlanError("plan.groups araç başına sefer listesi olmalı")
+    seen = set()
+    for trips in groups:
+        if not isinstance(trips, list) or not all(isinstance(seq, list) for seq in trips):
+            raise PlanError("plan.groups araç başına sefer listesi olmalı")
+        for seq in trips:
+            for j in seq:
+                if not isinstance(j, int) or isinstance(j, bool) or not V <= j < V + N or j in seen:
+                    raise PlanError("plan.groups geçersiz ya da yinelenen durak indeksi içeriyor")
+                seen.add(j)
+    return groups
+
+def _removed(remove, stops):
+    """remove -> önceki durak indeksleri (0..N-1) kümesi."""
+    by_key = {}
+    for k, c in enumerate(stops):
+        by_key.setdefault(coord_key(c), []).append(k)
+    out = set()
+    for r in remove:
+        if isinstance(r, int) and not isinstance(r, bool):
+            if not 0 <= r < len(stops):
+                raise PlanError("remove: durak indeksi aralık dışında: %d" % r)
+            out.add(r)
+        elif _ok_point(r):
+            ks = [k for k in by_key.get(coord_key(r), []) if k not in out]
+            if not ks:
+                raise PlanError("remove: planda olmayan durak: %s" % (r,))
+            out.add(ks[0])
+        else:
+            raise PlanError("remove elemanları durak indeksi ya da [enlem, boylam] olmalı")
+    return out
+
+def _matrix(base, prev, kept, add):
+    """1) Yeni plan matrisi: depolar + korunan duraklar + eklenenler."""
+    V = len(base["depots"])
+    if prev is None:
+        return as_matrix(cached_osrm_table(base["depots"] + [base["stops"][k] for k in kept] + add))
+    ext = get_matrix_cache().extend(prev, base["depots"] + base["stops"], add)
+    N = len(base["stops"])
+    ids = np.asarray(list(range(V)) + [V + k for k in kept] + list(range(V + N, V + N + len(add))),
+                     dtype=np.intp)
+    return as_matrix(ext[np.ix_(ids, ids)])
+
+def _insert(mat, depot_idxs, trips, changed, loads, own_load, j, dem, caps, stock):
+    """3) j'yi kapasite ve stoğa uyan en ucuz konuma ekler; gerekirse yeni sefer."""
+    best = (np.inf, None, None, None)
+    for v, vt in enumerate(trips):
+        if own_load[v] + dem > stock[v]:
+            continue
+        for t, seq in enumerate(vt):
+            if loads[v][t] + dem > caps[v]:
+                continue
+            p = np.asarray([depot_idxs[v]] + seq, dtype=np.intp)
+            d = mat[p, j].astype(np.float64)
+            d[:-1] += mat[j, p[1:]] - mat[p[:-1], p[1:]]
+            pos = int(d.argmin())
+            if d[pos] < best[0]:
+                best = (float(d[pos]), v, t, pos)
+    _, v, t, pos = best
+    if v is None:
+        # hiçbir sefere sığmadı: stoğu ve kapasitesi yeten en yakın depodan yeni sefer
+        ok = [v for v in range(len(depot_idxs)) if own_load[v] + dem <= stock[v] and dem <= caps[v]]
+        if not ok:
+            return False
+        v = min(ok, key=lambda u: mat[depot_idxs[u], j])
+        trips[v].append([])
+        changed[v].append(True)
+        loads[v].append(0.0)
+        t, pos = len(trips[v]) - 1, 0
+    trips[v][t].insert(pos, j)
+    changed[v][t] = True
+    loads[v][t] += dem
+    own_load[v] += dem
+    return True
+
+def run_reoptimize(base, prev, opts):
+    """parse_reoptimize çıktısını uygular; /solve biçiminde yanıt (hatada PlanError)."""
+    with metrics.recording() as rec:
+        deadline = deadline_after(opts["time_limit_ms"])
+        V, N = len(base["depots"]), len(base["stops"])
+        removed = opts["remove"]
+        kept = [k for k in range(N) if k not in removed]
+        new_idx = {V + k: V + i for i, k in enumerate(kept)}  # eski global -> yeni global
+        stops = [base["stops"][k] for k in kept] + opts["add"]
+        demands = [base["demands"][k] for k in kept] + opts["add_demands"]
+        depot_idxs = list(range(V))
+
+        with metrics.stage("matrix"):
+            mat = _matrix(base, prev, kept, opts["add"])
+
+        # 2) iptaller; değişen seferler işaretlenir
+        trips, changed = [], []
+        routed = set()
+        for v in range(V):
+            vt, ch = [], []
+            for seq in opts["groups"][v]:
+                new = [new_idx[j] for j in seq if j in new_idx]
+                routed.update(new)
+                if new:
+                    vt.append(new)
+                    ch.append(len(new) != len(seq))
+            trips.append(vt)
+            changed.append(ch)
+
+        # 3) eklenenler ve plana girmemiş korunan duraklar
+        todo = [j for j in range(V, V + len(kept)) if j not in routed] + list(range(V + len(kept), V + len(stops)))
+        caps, stock = base["vehicle_caps"], base["depot_stock"]
+        loads = [[sum(demands[j - V] for j in seq) for seq in vt] for vt in trips]
+        own_load = [sum(lv) for lv in loads]
+        with metrics.stage("insert"):
+            for j in todo:
+                if not _insert(mat, depot_idxs, trips, changed, loads, own_load, j, demands[j - V], caps, stock):
+                    raise PlanError("stok ya da kapasite yetersiz: durak %d eklenemedi" % (j - V))
+
+        # 4) yalnızca değişen seferlerde sınırlı local search
+        touched = [(v, t) for v in range(V) for t in range(len(trips[v])) if changed[v][t]]
+        if opts["improve"]:
+            budgets = split_budget(remaining_ms(deadline), [len(trips[v][t]) for v, t in touched])
+            for (v, t), ms in zip(touched, budgets):
+                trips[v][t] = improve_seq(mat, depot_idxs[v], trips[v][t], opts["improve"], opts["neighbors"], ms)
+
+        # 5) yanıt: metrikler matristen; geometri yalnızca değişen seferler için
+        req = dict(base, stops=stops, demands=demands, improve=opts["improve"], geometry=False,
+                   reuse=opts["reuse"], method="reoptimize")
+        groups_by_vehicle = {v: trips[v] for v in range(V)}
+        plan = {"assign": [[j for seq in trips[v] for j in seq] for v in range(V)],
+                "groups_by_vehicle": groups_by_vehicle, "alns_stats": {}}
+        resp = finish_plan(req, mat, plan)
+        resp["stops"], resp["demands"] = stops, demands
+        resp["changed"] = [[v, t] for v, t in touched]
+        resp["removed"], resp["added"] = len(removed), len(opts["add"])
+        if opts["geometry"] and touched:
+            all_coords = base["depots"] + stops
+            jobs = [(base["depots"][v], [all_coords[j] for j in trips[v][t]]) for v, t in touched]
+            with metrics.stage("trips"):
+                resp["trips"] = [{"vehicle": v, "index": t, "trip": trip}
+                                 for (v, t), trip in zip(touched, osrm_trips(jobs))]
+            resp["geometry"] = "changed"
+    if opts["timings"]:
+        resp["timings"] = rec.to_dict()
+    return resp
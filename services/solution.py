@@ -0,0 +1,230 @@
+# services/solution.py
+"""
+Ortak rota planı ve değiştirilebilir çözüm temsili.
+
+RoutePlan (çözücüler ve local search ortak kullanır):
+- routes[k] düğüm sırası (Python listesi: yerinde ekle/çıkar ucuz)
+- path(k) -> p=[start]+rota (NumPy); prefix(k) -> (p, F), F kenar maliyeti öneki;
+  reverse_prefix(k) ters yön öneki, load_prefix(k) talep öneki.
+  Rota değişene kadar önbellekte; segment maliyeti F[j]-F[i] ile O(1).
+- costs/loads rota başına, own_cost/own_load araç (owner) başına hamle
+  başına O(1) güncellenir; toplam süre de öyle.
+- makespan (en büyük araç toplamı) tembel max-yığından O(log V); değişen
+  araçlar yığına ancak sorgu anında yazılır.
+
+Solution, RoutePlan'e geri alma kaydı ekler (ALNS ve benzeri yıkım/onarım
+döngüleri için): reddedilen hamleler kopyalamak yerine rollback ile geri alınır.
+"""
+import heapq
+import numpy as np
+from services.matrix import route_cost, route_costs
+
+class RoutePlan:
+    def __init__(self, matrix, starts, routes, node_demand=None, owner=None):
+        self.matrix = matrix
+        self.starts = list(starts)
+        self.routes = [list(r) for r in routes]
+        self.dem = None if node_demand is None else np.asarray(node_demand, dtype=np.float64)
+        self.owner = list(range(len(self.routes))) if owner is None else list(owner)
+        n_own = max(self.owner) + 1 if self.owner else 0
+        self.costs = route_costs(matrix, self.starts, self.routes).tolist()
+        self.loads = [self._full_load(k) for k in range(len(self.routes))]
+        self.own_cost = [0.0] * n_own
+        self.own_load = [0.0] * n_own
+        for k, o in enumerate(self.owner):
+            self.own_cost[o] += self.costs[k]
+            self.own_load[o] += self.loads[k]
+        self._total = sum(self.costs)
+        self._paths = {}  # k -> [p, F, Bk, Q] (tembel)
+        self._ver = [0] * n_own
+        self._heap = []
+        self._dirty = set()  # yığın girdisi eskimiş araçlar
+        self._rebuild_heap()
+
+    def _full_cost(self, k):
+        return route_cost(self.matrix, self.starts[k], self.routes[k])
+
+    def _full_load(self, k):
+        if self.dem is None or not self.routes[k]:
+            return 0.0
+        return float(self.dem[self.routes[k]].sum())
+
+    # ---- makespan yığını ----
+    def _rebuild_heap(self):
+        self._dirty.clear()
+        self._heap = [(-c, self._ver[o], o) for o, c in enumerate(self.own_cost)]
+        heapq.heapify(self._heap)
+
+    def _flush(self):
+        """Değişen araçların eski girdileri geçersizleşir, yenileri eklenir."""
+        if len(self._heap) + len(self._dirty) > 4 * len(self.own_cost) + 16:
+            for o in self._dirty:
+                self._ver[o] += 1
+            self._rebuild_heap()
+            return
+        for o in self._dirty:
+            self._ver[o] += 1
+            heapq.heappush(self._heap, (-self.own_cost[o], self._ver[o], o))
+        self._dirty.clear()
+
+    def _top(self):
+        if self._dirty:
+            self._flush()
+        h = self._heap
+        while h and h[0][1] != self._ver[h[0][2]]:
+            heapq.heappop(h)
+        return h[0] if h else None
+
+    def _account(self, k, dc, dq=0.0):
+        """k rotasının maliyeti dc, yükü dq kadar değişti."""
+        o = self.owner[k]
+        self.costs[k] += dc
+        self.loads[k] += dq
+        self.own_cost[o] += dc
+        self.own_load[o] += dq
+        self._total += dc
+        self._paths.pop(k, None)
+        self._dirty.add(o)
+
+    # ---- sorgular ----
+    def makespan(self):
+        t = self._top()
+        return -t[0] if t is not None else 0.0
+
+    def longest(self):
+        """En büyük toplamlı araç (owner); plan boşsa None."""
+        t = self._top()
+        return None if t is None else t[2]
+
+    def makespan_without(self, *owners):
+        """Verilen araçlar dışındaki en büyük toplam."""
+        popped, out = [], 0.0
+        while True:
+            t = self._top()
+            if t is None:
+                break
+            if t[2] not in owners:
+                out = -t[0]
+                break
+            popped.append(heapq.heappop(self._heap))
+        for t in popped:
+            heapq.heappush(self._heap, t)
+        return out
+
+    def total(self):
+        return self._total
+
+    def _path(self, k):
+        c = self._paths.get(k)
+        if c is None:
+            c = self._paths[k] = [np.asarray([self.starts[k]] + self.routes[k], dtype=np.intp), None, None, None]
+        return c
+
+    def path(self, k):
+        """p=[start]+rota (düğüm dizisi)."""
+        return self._path(k)[0]
+
+    def prefix(self, k):
+        """(p, F): p=[start]+rota, F[t] = p[0] -> p[t] maliyeti."""
+        c = self._path(k)
+        if c[1] is None:
+            p = c[0]
+            c[1] = np.concatenate(([0.0], np.cumsum(self.matrix[p[:-1], p[1:]])))
+        return c[0], c[1]
+
+    def reverse_prefix(self, k):
+        """Bk[t]: aynı kenarların ters yönde (p[t] -> p[0]) maliyeti."""
+        c = self._path(k)
+        if c[2] is None:
+            p = c[0]
+            c[2] = np.concatenate(([0.0], np.cumsum(self.matrix[p[1:], p[:-1]])))
+        return c[2]
+
+    def load_prefix(self, k):
+        """Q[t]: p[1..t] talepleri toplamı (node_demand gerekir)."""
+        c = self._path(k)
+        if c[3] is None:
+            c[3] = np.concatenate(([0.0], np.cumsum(self.dem[c[0][1:]])))
+        return c[3]
+
+    # ---- hamleler ----
+    def _edge_delta(self, k, pos, node):
+        """node, routes[k][pos] konumuna eklenirse maliyet farkı."""
+        r, m = self.routes[k], self.matrix
+        prev = self.starts[k] if pos == 0 else r[pos - 1]
+        d = m[prev, node]
+        if pos < len(r):
+            nxt = r[pos]
+            d += m[node, nxt] - m[prev, nxt]
+        return float(d)
+
+    def insert(self, k, pos, node):
+        d = self._edge_delta(k, pos, node)
+        self.routes[k].insert(pos, node)
+        self._account(k, d, 0.0 if self.dem is None else float(self.dem[node]))
+
+    def remove(self, k, pos):
+        node = self.routes[k].pop(pos)
+        d = self._edge_delta(k, pos, node)
+        self._account(k, -d, 0.0 if self.dem is None else -float(self.dem[node]))
+        return node
+
+    def set_route(self, k, r, cost=None):
+        """
+        Rotayı değiştirir. cost (ör. önek farkından bilinen yeni maliyet)
+        verilirse rota yeniden yürünmez.
+        """
+        old_c, old_q = self.costs[k], self.loads[k]
+        self.routes[k] = r
+        c = self._full_cost(k) if cost is None else float(cost)
+        self._account(k, c - old_c, self._full_load(k) - old_q)
+
+    def snapshot(self):
+        """Rotaların düz kopyası."""
+        return [list(r) for r in self.routes]
+
+class Solution(RoutePlan):
+    """
+    Rotalar yerinde değiştirilir; her insert/remove geri alma kaydına yazılır.
+    depot_idxs[v]: v rotasının başlangıcı (araç = rota).
+    """
+    def __init__(self, matrix, depot_idxs, routes, node_demand=None):
+        super().__init__(matrix, depot_idxs, routes, node_demand)
+        self.depot_idxs = self.starts
+        self._log = []          # (işlem, v, konum, düğüm, eski maliyet, eski yük, eski toplam)
+        self.touched = set()    # son mark'tan beri değişen rotalar
+
+    def insert(self, v, pos, node):
+        self._log.append(("ins", v, pos, node, self.costs[v], self.loads[v], self._total))
+        super().insert(v, pos, node)
+        self.touched.add(v)
+
+    def remove(self, v, pos):
+        old = (self.costs[v], self.loads[v], self._total)
+        node = super().remove(v, pos)
+        self._log.append(("rem", v, pos, node) + old)
+        self.touched.add(v)
+        return node
+
+    # ---- geri alma kaydı ----
+    def mark(self):
+        """Kayıt noktası; rollback(mark) bu noktaya döner."""
+        self.touched = set()
+        return len(self._log)
+
+    def rollback(self, mark):
+        while len(self._log) > mark:
+            op, v, pos, node, cost, load, total = self._log.pop()
+            if op == "ins":
+                self.routes[v].pop(pos)
+            else:
+                self.routes[v].insert(pos, node)
+            # kayıtlı değerler aynen geri yazılır (kayan nokta birikimi yok)
+            self._total = total
+            self.costs[v] = self.own_cost[v] = cost
+            self.loads[v] = self.own_load[v] = load
+            self._paths.pop(v, None)
+            self._dirty.add(v)
+
+    def commit(self):
+        self._log.clear()
@@ -0,0 +1,192 @@
+# services/solution_store.py
+"""
+Önceki çözümler deposu (sıcak başlangıç için).
+
+Anahtar: örnek parmak izi = depo ve durak koordinatlarının (yuvarlanmış)
+sıralı kümesi. Birebir eşleşme yoksa aynı depolara sahip, durak kümesi
+Jaccard benzerliği eşiği geçen en yakın kayıt kullanılır; kayıttaki
+rotalar güncel duraklara izdüşürülür (olmayanlar atılır, yeniler en ucuz
+konuma eklenir).
+
+/reoptimize için plan kaydı (istek alanları: koordinatlar, talepler, stok,
+kapasite ve plan sırası) ayrıca plan_id ile saklanır. plan_id tüm bu
+alanların (durak sırası dahil) özetidir: aynı noktalı ama farklı talepli
+planlar birbirinin yerine geçmez. Son PLAN_MATRICES planın matrisi bellekte
+tutulur; toplamı SOLUTION_STORE_MAX_MB'ı aşmaz (daha büyük matris hiç
+saklanmaz, /reoptimize onu matris önbelleğinden kurar).
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from services.matrix_cache import coord_key
+
+STORE_SIZE = int(os.environ.get("SOLUTION_STORE_SIZE", 256))
+MIN_JACCARD = float(os.environ.get("SOLUTION_STORE_MIN_JACCARD", 0.8))
+PLAN_MATRICES = int(os.environ.get("SOLUTION_STORE_MATRICES", 8))
+PLAN_MATRIX_BYTES = int(float(os.environ.get("SOLUTION_STORE_MAX_MB", 64)) * 2**20)
+PLAN_FIELDS = ("depots", "stops", "demands", "depot_stock", "vehicle_caps")
+
+def fingerprint(depots, stops):
+    """Depo sırası önemli (araç = depo), durak sırası değil."""
+    h = hashlib.sha1()
+    h.update("|".join(coord_key(c) for c in depots).encode())
+    h.update(b"#")
+    h.update("|".join(sorted(coord_key(c) for c in stops)).encode())
+    return h.hexdigest()
+
+def plan_key(req):
+    """plan_id: PLAN_FIELDS'in sıralı özeti (koordinatlar yuvarlanmış)."""
+    h = hashlib.sha1()
+    for k in PLAN_FIELDS:
+        if k in ("depots", "stops"):
+            vals = (coord_key(c) for c in req[k])
+        else:
+            vals = (repr(float(x)) for x in req[k])
+        h.update(("%s:%s#" % (k, "|".join(vals))).encode())
+    return h.hexdigest()
+
+class SolutionStore:
+    def __init__(self, size=STORE_SIZE, min_jaccard=MIN_JACCARD, matrices=PLAN_MATRICES,
+                 matrix_bytes=PLAN_MATRIX_BYTES):
+        self.size = size
+        self.min_jaccard = min_jaccard
+        self.matrices = matrices
+        self.matrix_bytes = matrix_bytes
+        self._mat_bytes = 0
+        # parmak izi -> (depo anahtarları, durak kümesi, seferler)
+        self._items = OrderedDict()
+        self._plans = OrderedDict()  # plan_id -> plan kaydı
+        self._mats = OrderedDict()   # plan_id -> matris
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def put(self, depots, stops, groups_by_vehicle, V, req=None, mat=None):
+        """
+        groups_by_vehicle: araç -> [seq, ...] (global indeks; duraklar V'den başlar).
+        req verilirse plan kaydı (PLAN_FIELDS + groups), mat verilirse matris
+        da saklanır. Dönüş: plan_id (req yoksa None).
+        """
+        dkeys = tuple(coord_key(c) for c in depots)
+        skeys = [coord_key(c) for c in stops]
+        trips = [[[skeys[j - V] for j in seq] for seq in groups_by_vehicle[v]] for v in range(len(depots))]
+        pid = record = None
+        if req is not None:
+            pid = plan_key(req)
+            record = {k: list(req[k]) for k in PLAN_FIELDS}
+            record["groups"] = [[list(seq) for seq in groups_by_vehicle[v]] for v in range(len(depots))]
+        with self._lock:
+            fp = fingerprint(depots, stops)
+            self._items[fp] = (dkeys, frozenset(skeys), trips)
+            self._items.move_to_end(fp)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+            if record is not None:
+                self._plans[pid] = record
+                self._plans.move_to_end(pid)
+                while len(self._plans) > self.size:
+                    self._drop_matrix(self._plans.popitem(last=False)[0])
+                self._drop_matrix(pid)
+                # sınırı tek başına aşan matris saklanmaz (/reoptimize önbellekten kurar)
+                if mat is not None and self.matrices > 0 and mat.nbytes <= self.matrix_bytes:
+                    self._mats[pid] = mat
+                    self._mat_bytes += mat.nbytes
+                    while len(self._mats) > self.matrices or self._mat_bytes > self.matrix_bytes:
+                        self._drop_matrix(next(iter(self._mats)))
+        return pid
+
+    def _drop_matrix(self, pid):
+        mat = self._mats.pop(pid, None)
+        if mat is not None:
+            self._mat_bytes -= mat.nbytes
+
+    def get(self, plan_id):
+        """plan_id -> (plan kaydı, matris ya da None); kayıt yoksa None."""
+        with self._lock:
+            record = self._plans.get(plan_id)
+            if record is None:
+                return None
+            self._plans.move_to_end(plan_id)
+            return record, self._mats.get(plan_id)
+
+    def lookup(self, depots, stops, V):
+        """
+        Dönüş: (araç -> [seq, ...] güncel global indekslerle, kapsanmayan duraklar)
+        ya da None. Aynı koordinatlı birden çok durak varsa ilki eşlenir.
+        """
+        dkeys = tuple(coord_key(c) for c in depots)
+        skeys = [coord_key(c) for c in stops]
+        sset = frozenset(skeys)
+        with self._lock:
+            hit = self._items.get(fingerprint(depots, stops))
+            if hit is not None:
+                self.hits += 1
+            else:
+                best, score = None, self.min_jaccard
+                for item in self._items.values():
+                    if item[0] != dkeys:
+                        continue
+                    j = len(item[1] & sset) / max(1, len(item[1] | sset))
+                    if j >= score:
+                        best, score = item, j
+                if best is None:
+                    self.misses += 1
+                    return None
+                self.near_hits += 1
+                hit = best
+        idx = {}
+        for k, key in enumerate(skeys):
+            idx.setdefault(key, V + k)
+        used = set()
+        groups = []
+        for trips in hit[2]:
+            vt = []
+            for seq in trips:
+                s = [idx[k] for k in seq if k in idx and idx[k] not in used]
+                used.update(s)
+                if s:
+                    vt.append(s)
+            groups.append(vt)
+        rest = [V + k for k in range(len(stops)) if V + k not in used]
+        return groups, rest
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "plans": len(self._plans), "matrices": len(self._mats),
+                    "matrix_mb": round(self._mat_bytes / 2**20, 1),
+                    "hits": self.hits,
+                    "near_hits": self.near_hits, "misses": self.misses}
+
+def project(mat, depot_idxs, groups, new_stops):
+    """Yeni durakları mevcut seferlere en ucuz konumdan ekler (yerinde)."""
+    for j in new_stops:
+        best = (np.inf, None, None, None)
+        for v, trips in enumerate(groups):
+            if not trips:
+                trips.append([])
+            for t, seq in enumerate(trips):
+                p = np.asarray([depot_idxs[v]] + seq, dtype=np.intp)
+                d = mat[p, j].copy()
+                d[:-1] += mat[j, p[1:]] - mat[p[:-1], p[1:]]
+                pos = int(d.argmin())
+                if d[pos] < best[0]:
+                    best = (float(d[pos]), v, t, pos)
+        _, v, t, pos = best
+        groups[v][t].insert(pos, j)
+    for trips in groups:
+        trips[:] = [seq for seq in trips if seq]
+    return groups
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_solution_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SolutionStore()
+        return _store
@@ -0,0 +1,107 @@
+# tests/test_inter_route.py
+"""
+inter_route_search: kapasite/stok sınırları ve yerel en iyilik, rota
+maliyetleri route_cost ile baştan hesaplanarak (kaba kuvvet) denetlenir.
+
+    python -m pytest -q tests
+"""
+import random
+import unittest
+
+import numpy as np
+
+from services.matrix import route_cost
+from services.inter_route import inter_route_search
+
+def instance(seed, V=3, n_stops=24):
+    rng = np.random.default_rng(seed)
+    pts = rng.uniform(0.0, 100.0, (V + n_stops, 2))
+    mat = np.sqrt(((pts[:, None, :] - pts[None, :, :]) ** 2).sum(-1))
+    dem = np.concatenate([np.zeros(V), rng.integers(1, 6, n_stops).astype(np.float64)])
+    return mat, dem
+
+def owner_costs(mat, starts, owner, routes):
+    out = [0.0] * (max(owner) + 1)
+    for k, r in enumerate(routes):
+        out[owner[k]] += route_cost(mat, starts[k], r)
+    return out
+
+class InterRouteLimitsTest(unittest.TestCase):
+    def setUp(self):
+        self.V = 3
+        # araç başına iki sefer; araç 0'ın seferleri uzun (darboğaz)
+        self.owner = [0, 0, 1, 1, 2, 2]
+        self.starts = [self.owner[k] for k in range(len(self.owner))]
+
+    def split(self, stops, sizes):
+        out, i = [], 0
+        for s in sizes:
+            out.append(stops[i:i + s])
+            i += s
+        return out
+
+    def run_case(self, seed):
+        mat, dem = instance(seed)
+        stops = list(range(self.V, len(dem)))
+        random.Random(seed).shuffle(stops)
+        routes = self.split(stops, [7, 7, 3, 2, 3, 2])
+        loads = [float(dem[r].sum()) for r in routes]
+        # sınırlar başlangıçta tam dolu ya da az boşluklu: sınırsız arama bunları aşar
+        caps = [l + 2.0 for l in loads]
+        own = [loads[0] + loads[1], loads[2] + loads[3], loads[4] + loads[5]]
+        stock = [own[0], own[1] + 3.0, own[2] + 1.0]
+        stats = {}
+        out = inter_route_search(routes, mat, self.starts, route_owner=self.owner, node_demand=dem,
+                                 route_caps=caps, owner_stock=stock, max_iter=500, stats=stats)
+        return mat, dem, routes, caps, stock, out, stats
+
+    def test_limits_and_makespan(self):
+        for seed in range(6):
+            mat, dem, routes, caps, stock, out, stats = self.run_case(seed)
+            self.assertEqual(len(out), len(routes))
+            self.assertEqual(sorted(j for r in out for j in r), sorted(j for r in routes for j in r))
+            for k, r in enumerate(out):
+                self.assertLessEqual(float(dem[r].sum()), caps[k] + 1e-9)
+            own_load = [0.0] * self.V
+            for k, r in enumerate(out):
+                own_load[self.owner[k]] += float(dem[r].sum())
+            for o in range(self.V):
+                self.assertLessEqual(own_load[o], stock[o] + 1e-9)
+            before = max(owner_costs(mat, self.starts, self.owner, routes))
+            after = owner_costs(mat, self.starts, self.owner, out)
+            self.assertLessEqual(max(after), before + 1e-9)
+            self.assertAlmostEqual(stats["makespan"], max(after), places=6)
+
+    def test_no_improving_feasible_relocate_left(self):
+        """Arama durduğunda darboğaz araçtan uygun, iyileştiren tek durak taşıma kalmaz."""
+        for seed in range(4):
+            mat, dem, routes, caps, stock, out, stats = self.run_case(seed)
+            self.assertLess(stats["iterations"], 500)
+            costs = owner_costs(mat, self.starts, self.owner, out)
+            mk, tot = max(costs), sum(costs)
+            o_star = int(np.argmax(costs))
+            loads = [float(dem[r].sum()) for r in out]
+            own_load = [0.0] * self.V
+            for k in range(len(out)):
+                own_load[self.owner[k]] += loads[k]
+            eps = 1e-6 * max(1.0, mk)
+            for a, ra in enumerate(out):
+                if self.owner[a] != o_star:
+                    continue
+                for i, node in enumerate(ra):
+                    for b, rb in enumerate(out):
+                        if b == a or loads[b] + dem[node] > caps[b] + 1e-9:
+                            continue
+                        ob = self.owner[b]
+                        if ob != o_star and own_load[ob] + dem[node] > stock[ob] + 1e-9:
+                            continue
+                        for j in range(len(rb) + 1):
+                            new = [list(r) for r in out]
+                            new[a] = ra[:i] + ra[i + 1:]
+                            new[b] = rb[:j] + [node] + rb[j:]
+                            c = owner_costs(mat, self.starts, self.owner, new)
+                            better = max(c) < mk - eps or (max(c) <= mk + eps and sum(c) < tot - eps)
+                            self.assertFalse(better, (seed, a, i, b, j))
+
+if __name__ == "__main__":
+    unittest.main()
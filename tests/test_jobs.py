@@ -0,0 +1,100 @@
+# tests/test_jobs.py
+"""
+JobQueue kapasite sayımı: iptal edilen bekleyen iş yer açar, iki kez
+sayılmaz; işçi iptal edilmiş işi çalıştırmaz.
+
+    python -m pytest -q tests
+"""
+import threading
+import time
+import unittest
+
+from services.jobs import JobQueue, QueueFull, QUEUED, RUNNING, DONE, CANCELLED
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            raise AssertionError("zaman aşımı")
+        time.sleep(0.005)
+
+class JobQueueSlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.q = JobQueue(workers=1, size=2, retention=64)
+        self.gate = threading.Event()
+        self.ran = []
+
+    def tearDown(self):
+        self.gate.set()
+        self.q.drain(timeout=5)
+
+    def blocker(self, emit=None):
+        self.gate.wait(5)
+        return "blocked"
+
+    def work(self, name, emit=None):
+        self.ran.append(name)
+        return name
+
+    def start_blocker(self):
+        job = self.q.submit(self.blocker)
+        wait_for(lambda: job.status == RUNNING)
+        return job
+
+    def test_running_job_does_not_take_a_slot(self):
+        self.start_blocker()
+        self.q.submit(self.work, "a")
+        self.q.submit(self.work, "b")
+        self.assertEqual(self.q.stats()["queued"], 2)
+        with self.assertRaises(QueueFull):
+            self.q.submit(self.work, "c")
+
+    def test_cancel_queued_frees_slot_once(self):
+        self.start_blocker()
+        a = self.q.submit(self.work, "a")
+        b = self.q.submit(self.work, "b")
+        self.assertIs(self.q.cancel(a.id), a)
+        self.assertEqual(a.status, CANCELLED)
+        self.assertEqual(self.q.stats()["queued"], 1)
+        # bitmiş işi yeniden iptal: kayıt silinir, sayım değişmez
+        self.assertIs(self.q.cancel(a.id), a)
+        self.assertIsNone(self.q.get(a.id))
+        self.assertEqual(self.q.stats()["queued"], 1)
+        c = self.q.submit(self.work, "c")
+        self.assertEqual(self.q.stats()["queued"], 2)
+        with self.assertRaises(QueueFull):
+            self.q.submit(self.work, "d")
+
+        self.gate.set()
+        wait_for(lambda: b.status == DONE and c.status == DONE)
+        self.assertEqual(self.ran, ["b", "c"])  # iptal edilen iş çalışmadı
+        self.assertEqual(self.q.stats()["queued"], 0)
+        # kuyrukta kalan iptal kaydı işçi tarafından atlandı: kapasite tam
+        d = self.q.submit(self.work, "d")
+        e = self.q.submit(self.work, "e")
+        wait_for(lambda: d.status == DONE and e.status == DONE)
+        self.assertEqual(self.q.stats()["queued"], 0)
+
+    def test_cancel_running_job(self):
+        job = self.start_blocker()
+        a = self.q.submit(self.work, "a")
+        self.q.cancel(job.id)
+        self.assertEqual(self.q.stats()["queued"], 1)  # çalışan iş sayımda değildi
+        self.gate.set()
+        wait_for(lambda: a.status == DONE)
+        self.assertEqual(job.status, CANCELLED)
+        self.assertIsNone(job.result)
+        self.assertEqual(self.q.stats()["queued"], 0)
+
+    def test_drain_cancels_queued(self):
+        self.start_blocker()
+        a = self.q.submit(self.work, "a")
+        self.assertEqual(a.status, QUEUED)
+        self.gate.set()
+        self.assertTrue(self.q.drain(timeout=5))
+        self.assertEqual(self.q.stats()["queued"], 0)
+        with self.assertRaises(QueueFull):
+            self.q.submit(self.work, "b")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# tests/test_osrm_tiles.py
+"""
+Bloklu osrm_table: yerel sahte OSRM sunucusuna karşı.
+
+Sahte sunucu süreleri koordinatlardan üretir: durak i = (enlem i, boylam 0),
+süre(i, j) = 1000 * i + j. Böylece birleştirilen matriste her hücrenin
+doğru kaynak/hedefe gittiği doğrudan denetlenir.
+
+    python -m pytest -q tests    (ya da python -m unittest discover tests)
+"""
+import json
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+
+from services import osrm_service
+
+class FakeOSRM(BaseHTTPRequestHandler):
+    """table/v1 alt kümesi; fail_first: her URL'nin ilk istekleri 503."""
+    log = []  # (koordinat, kaynak, hedef sayısı)
+    fail_first = 0
+    seen = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        u = urlsplit(self.path)
+        ids = [int(round(float(p.split(",")[1]))) for p in u.path.split("/")[4].split(";")]
+        q = parse_qs(u.query)
+        src = [int(x) for x in q["sources"][0].split(";")] if "sources" in q else range(len(ids))
+        dst = [int(x) for x in q["destinations"][0].split(";")] if "destinations" in q else range(len(ids))
+        with self.lock:
+            FakeOSRM.log.append((len(ids), len(src), len(dst)))
+            n = FakeOSRM.seen[self.path] = FakeOSRM.seen.get(self.path, 0) + 1
+        if n <= FakeOSRM.fail_first:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"code": "Ok", "durations": [[1000.0 * ids[i] + ids[j] for j in dst] for i in src]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def expected(src, dst):
+    return [[1000.0 * i + j for j in dst] for i in src]
+
+class OsrmTableTilesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOSRM)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = osrm_service.OSRM_URL
+        osrm_service.OSRM_URL = "http://127.0.0.1:%d" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        osrm_service.OSRM_URL = cls.url
+
+    def setUp(self):
+        FakeOSRM.log = []
+        FakeOSRM.seen = {}
+        FakeOSRM.fail_first = 0
+        self.coords = [(float(i), 0.0) for i in range(11)]
+
+    def test_single_request_below_tile(self):
+        out = osrm_service.osrm_table(self.coords[:4], tile=4)
+        self.assertEqual(out, expected(range(4), range(4)))
+        self.assertEqual(len(FakeOSRM.log), 1)
+
+    def test_full_table_assembled_from_tiles(self):
+        out = osrm_service.osrm_table(self.coords, tile=4)
+        self.assertEqual(out, expected(range(11), range(11)))
+        self.assertEqual(len(FakeOSRM.log), 9)  # 3 x 3 blok
+        for n, s, d in FakeOSRM.log:
+            self.assertLessEqual(s, 4)
+            self.assertLessEqual(d, 4)
+            self.assertLessEqual(n, 8)  # URL'de yalnızca bloğun koordinatları
+
+    def test_sources_destinations_offsets(self):
+        src, dst = [9, 0, 5, 10, 3], [2, 7, 7, 1, 8, 4, 6]
+        out = osrm_service.osrm_table(self.coords, sources=src, destinations=dst, tile=3)
+        self.assertEqual(out, expected(src, dst))
+        self.assertEqual(len(FakeOSRM.log), 2 * 3)
+
+    def test_retry_on_server_error(self):
+        FakeOSRM.fail_first = 1
+        out = osrm_service.osrm_table(self.coords, tile=4)
+        self.assertEqual(out, expected(range(11), range(11)))
+        self.assertEqual(len(FakeOSRM.log), 2 * 9)
+
+    def test_persistent_failure_raises(self):
+        FakeOSRM.fail_first = 10
+        retries, session = osrm_service.OSRM_RETRIES, osrm_service._session
+        osrm_service.OSRM_RETRIES, osrm_service._session = 1, None
+        try:
+            with self.assertRaises(requests.RequestException):
+                osrm_service.osrm_table(self.coords, tile=4)
+        finally:
+            osrm_service.OSRM_RETRIES, osrm_service._session = retries, session
+
+if __name__ == "__main__":
+    unittest.main()
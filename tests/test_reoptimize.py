@@ -0,0 +1,102 @@
+# tests/test_reoptimize.py
+"""
+/reoptimize: değişmeyen seferler aynen korunur, yalnızca iptal/ekleme
+görenler changed'de listelenir. Matris, OSRM yerine koordinatlardan süre
+üreten bir MatrixCache ile kurulur (geometry=False: trip çağrısı yok).
+plan_id yolu (saklı matris + extend) satır içi plan yoluyla karşılaştırılır.
+
+    python -m pytest -q tests
+"""
+import math
+import unittest
+
+from services import matrix_cache, solution_store
+from services.matrix_cache import MatrixCache
+from services.solution_store import SolutionStore
+from services.planner import finish_plan, parse_request
+from services.reoptimize import parse_reoptimize, run_reoptimize
+
+def euclid(coords, sources=None, destinations=None):
+    src = range(len(coords)) if sources is None else sources
+    dst = range(len(coords)) if destinations is None else destinations
+    return [[100.0 * math.dist(coords[i], coords[j]) for j in dst] for i in src]
+
+DEPOTS = [[0.0, 0.0], [10.0, 10.0]]
+STOPS = [[1.0, 0.5], [2.0, 1.0], [3.0, 0.0], [0.5, 3.0], [1.5, 4.0],
+         [9.0, 9.5], [8.0, 9.0], [9.5, 7.0], [7.0, 8.0]]
+DEMANDS = [1, 1, 1, 1, 1, 1, 1, 1, 1]
+# global indeksler: depolar 0..1, duraklar 2..10
+GROUPS = [[[2, 3, 4], [5, 6]], [[7, 8], [9, 10]]]
+
+class ReoptimizeTest(unittest.TestCase):
+    def setUp(self):
+        self.cache, self.store = matrix_cache._default_cache, solution_store._store
+        matrix_cache._default_cache = MatrixCache(path=None, fetch=euclid)
+        solution_store._store = SolutionStore()
+        self.plan = {"depots": DEPOTS, "stops": STOPS, "demands": DEMANDS,
+                     "vehicle_caps": [4, 4], "depot_stock": [9, 9]}
+
+    def tearDown(self):
+        matrix_cache._default_cache, solution_store._store = self.cache, self.store
+
+    def reopt(self, **body):
+        body.setdefault("geometry", False)
+        body.setdefault("reuse", False)
+        return run_reoptimize(*parse_reoptimize(body))
+
+    def check_untouched(self, resp, removed):
+        """Değişmeyen seferler: eski seferin yeni indekslerle aynısı."""
+        V, N = len(DEPOTS), len(STOPS)
+        kept = [k for k in range(N) if k not in removed]
+        new_idx = {V + k: V + i for i, k in enumerate(kept)}
+        changed = {tuple(x) for x in resp["changed"]}
+        for v in range(V):
+            old = [[new_idx[j] for j in seq if j in new_idx] for seq in GROUPS[v]]
+            for t, seq in enumerate(resp["groups"][str(v)]):
+                if (v, t) in changed:
+                    continue
+                self.assertEqual(seq, old[t], (v, t))
+        served = sorted(j for v in range(V) for seq in resp["groups"][str(v)] for j in seq)
+        self.assertEqual(served, list(range(V, V + len(resp["stops"]))))
+        return changed
+
+    def test_remove_and_add_touch_only_their_trips(self):
+        resp = self.reopt(plan=dict(self.plan, groups=GROUPS), remove=[1], add=[[9.0, 8.0]])
+        changed = self.check_untouched(resp, {1})
+        # durak 1 (global 3) v0/t0'dan çıktı; yeni durak araç 1'e yakın
+        self.assertIn((0, 0), changed)
+        self.assertNotIn((0, 1), changed)
+        self.assertEqual(len(changed), 2)
+        self.assertEqual(resp["stops"], [s for k, s in enumerate(STOPS) if k != 1] + [[9.0, 8.0]])
+
+    def test_no_change_keeps_plan(self):
+        resp = self.reopt(plan=dict(self.plan, groups=GROUPS))
+        self.assertEqual(resp["changed"], [])
+        self.assertEqual(resp["groups"], {str(v): GROUPS[v] for v in range(len(DEPOTS))})
+
+    def test_capacity_opens_new_trip(self):
+        resp = self.reopt(plan=dict(self.plan, groups=GROUPS), add=[[0.2, 0.2], [0.3, 0.1]],
+                          vehicle_caps=[3, 3], depot_stock=[11, 4])
+        changed = self.check_untouched(resp, set())
+        for v in range(len(DEPOTS)):
+            for seq in resp["groups"][str(v)]:
+                self.assertLessEqual(sum(resp["demands"][j - len(DEPOTS)] for j in seq), 3)
+        self.assertEqual(len(resp["groups"]["0"]), 3)
+        self.assertIn((0, 2), changed)
+
+    def test_stored_plan_matches_inline_plan(self):
+        req = parse_request(dict(self.plan, method="greedy", geometry=False))
+        mat = matrix_cache.cached_osrm_table(DEPOTS + STOPS)
+        plan = {"assign": [[j for seq in trips for j in seq] for trips in GROUPS],
+                "groups_by_vehicle": dict(enumerate(GROUPS)), "alns_stats": {}}
+        pid = finish_plan(req, mat, plan)["plan_id"]
+        body = {"remove": [[3.0, 0.0]], "add": [[0.2, 2.5]]}
+        stored = self.reopt(plan_id=pid, **body)
+        inline = self.reopt(plan=dict(self.plan, groups=GROUPS), **body)
+        self.assertEqual(stored["groups"], inline["groups"])
+        self.assertEqual(stored["changed"], inline["changed"])
+        self.assertAlmostEqual(stored["makespan_matrix"], inline["makespan_matrix"], places=6)
+        self.check_untouched(stored, {2})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# tests/test_solution.py
+"""
+Solution geri alma kaydı ve regret onarımı: rastgele matrislerde
+route_cost ile baştan hesaplanan değerlere ve kaba kuvvet bir regret-k
+uygulamasına karşı.
+
+    python -m pytest -q tests
+"""
+import random
+import unittest
+
+import numpy as np
+
+from services.matrix import route_cost
+from services.solution import Solution
+from services.alns_operators import InsertionCache, regret_repair
+
+def random_matrix(n, seed):
+    return np.random.default_rng(seed).uniform(1.0, 100.0, (n, n))
+
+def state(sol):
+    return ([list(r) for r in sol.routes], list(sol.costs), list(sol.loads),
+            list(sol.own_cost), list(sol.own_load), sol.total(), sol.makespan())
+
+def brute_regret(mat, depot_idxs, routes, removed, k):
+    """Her adımda tüm ekleme maliyetleri route_cost ile baştan hesaplanır."""
+    routes = [list(r) for r in routes]
+    todo = list(removed)
+    kk = min(k, len(routes))
+    while todo:
+        rows = []
+        for node in todo:
+            per_route = []
+            for v, r in enumerate(routes):
+                base = route_cost(mat, depot_idxs[v], r)
+                d = [route_cost(mat, depot_idxs[v], r[:p] + [node] + r[p:]) - base for p in range(len(r) + 1)]
+                p = int(np.argmin(d))
+                per_route.append((d[p], p))
+            srt = sorted(c for c, _ in per_route)
+            rows.append((-sum(s - srt[0] for s in srt[1:kk]), srt[0], node, per_route))
+        _, _, node, per_route = min(rows, key=lambda x: (x[0], x[1]))
+        v = min(range(len(routes)), key=lambda u: per_route[u][0])
+        routes[v].insert(per_route[v][1], node)
+        todo.remove(node)
+    return routes
+
+class SolutionRollbackTest(unittest.TestCase):
+    def setUp(self):
+        self.V, self.n = 3, 20
+        self.mat = random_matrix(self.n, 7)
+        self.dem = np.arange(self.n, dtype=np.float64) % 4 + 1
+        self.depots = list(range(self.V))
+        stops = list(range(self.V, self.n))
+        self.routes = [stops[0:6], stops[6:10], stops[10:]]
+
+    def random_ops(self, sol, rng, count):
+        for _ in range(count):
+            v = rng.randrange(self.V)
+            if sol.routes[v] and rng.random() < 0.5:
+                node = sol.remove(v, rng.randrange(len(sol.routes[v])))
+                u = rng.randrange(self.V)
+                sol.insert(u, rng.randrange(len(sol.routes[u]) + 1), node)
+            elif sol.routes[v]:
+                sol.remove(v, rng.randrange(len(sol.routes[v])))
+
+    def test_rollback_restores_exact_state(self):
+        rng = random.Random(3)
+        sol = Solution(self.mat, self.depots, self.routes, self.dem)
+        for _ in range(20):
+            before = state(sol)
+            m = sol.mark()
+            self.random_ops(sol, rng, rng.randint(1, 8))
+            sol.rollback(m)
+            self.assertEqual(state(sol), before)
+            # kalıcı adım: sonraki turun başlangıcı değişsin
+            self.random_ops(sol, rng, 1)
+            sol.commit()
+
+    def test_nested_marks(self):
+        rng = random.Random(5)
+        sol = Solution(self.mat, self.depots, self.routes, self.dem)
+        s0 = state(sol)
+        m0 = sol.mark()
+        self.random_ops(sol, rng, 4)
+        s1 = state(sol)
+        m1 = sol.mark()
+        self.random_ops(sol, rng, 4)
+        sol.rollback(m1)
+        self.assertEqual(state(sol), s1)
+        sol.rollback(m0)
+        self.assertEqual(state(sol), s0)
+
+    def test_incremental_costs_match_recomputed(self):
+        rng = random.Random(11)
+        sol = Solution(self.mat, self.depots, self.routes, self.dem)
+        self.random_ops(sol, rng, 40)
+        for v, r in enumerate(sol.routes):
+            self.assertAlmostEqual(sol.costs[v], route_cost(self.mat, v, r), places=6)
+            self.assertAlmostEqual(sol.loads[v], float(self.dem[r].sum()), places=9)
+        self.assertAlmostEqual(sol.total(), sum(sol.costs), places=6)
+        self.assertAlmostEqual(sol.makespan(), max(sol.costs), places=6)
+
+class RegretRepairTest(unittest.TestCase):
+    def check(self, seed, k):
+        V, n = 3, 22
+        mat = random_matrix(n, seed)
+        depots = list(range(V))
+        rng = random.Random(seed)
+        stops = list(range(V, n))
+        rng.shuffle(stops)
+        routes = [stops[0:4], stops[4:7], []]
+        removed = stops[7:]
+        sol = Solution(mat, depots, routes)
+        regret_repair(sol, removed, InsertionCache(mat, depots), k=k)
+        self.assertEqual(sol.routes, brute_regret(mat, depots, routes, removed, k))
+        for v, r in enumerate(sol.routes):
+            self.assertAlmostEqual(sol.costs[v], route_cost(mat, v, r), places=6)
+
+    def test_regret2_matches_brute_force(self):
+        for seed in range(5):
+            self.check(seed, 2)
+
+    def test_regret3_matches_brute_force(self):
+        for seed in range(5):
+            self.check(seed, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,10 @@
+# wsgi.py
+"""
+Üretim giriş noktası: gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app ile ana süreçte bir kez içe aktarılır (OR-Tools, NumPy ve
+çözücü modülleri); işçiler fork ile hazır devralır.
+"""
+from app import create_app
+
+app = create_app()